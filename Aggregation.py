@@ -0,0 +1,270 @@
+# Aggregation.py
+import numpy as np
+from Formations import POSITIONS, POSITION_INDEX
+
+# Available aggregators for turning votes into a position's min/max rating
+AGGREGATORS = ["mean", "median", "trimmed", "weighted"]
+# Fraction of votes dropped from each end by the trimmed mean
+TRIM_FRACTION = 0.2
+# Rounds of consensus re-estimation used to compute voter reliability
+RELIABILITY_ITERATIONS = 5
+
+
+class VoteColumns:
+    """
+    Every vote of a team as parallel NumPy columns.
+
+    Attributes:
+        player_names (list): Player name of each player id
+        voter_names (list): Voter name of each voter id
+        player_ids, position_ids, voter_ids (np.ndarray): Vote owners
+        mins, maxs (np.ndarray): Vote ratings
+        groups (np.ndarray): player_id * len(POSITIONS) + position_id of each vote
+    """
+
+    def __init__(self, player_names, voter_names, player_ids, position_ids, voter_ids, mins, maxs):
+        self.player_names = player_names
+        self.voter_names = voter_names
+        self.player_ids = np.asarray(player_ids, dtype=np.int64)
+        self.position_ids = np.asarray(position_ids, dtype=np.int64)
+        self.voter_ids = np.asarray(voter_ids, dtype=np.int64)
+        self.mins = np.asarray(mins, dtype=float)
+        self.maxs = np.asarray(maxs, dtype=float)
+        self.groups = self.player_ids * len(POSITIONS) + self.position_ids
+        self.n_groups = len(player_names) * len(POSITIONS)
+
+    def __len__(self):
+        return len(self.mins)
+
+    @classmethod
+    def from_players(cls, players):
+        """
+        Collect the votes of Player objects, in vote list order. Votes still
+        held in a VoteStore (see Player.stored_votes) are copied column-wise
+        without building their dicts.
+        """
+        player_names = []
+        voter_lookup = {}
+        player_ids, position_ids, voter_ids, mins, maxs = [], [], [], [], []
+        chunks = []
+        remaps = {}  # id(store) -> store voter id -> voter id, -1 until seen
+        run = None  # [store, first stored id, last stored id, first player id] of consecutive stored players
+
+        def flush():
+            nonlocal run
+            if mins:
+                chunks.append((player_ids[:], position_ids[:], voter_ids[:], mins[:], maxs[:]))
+                for column in (player_ids, position_ids, voter_ids, mins, maxs):
+                    column.clear()
+            if run is not None:
+                store, first, last, first_player = run
+                run = None
+                rows = store.vote_rows(first, last)
+                ids = rows[2]
+                if not len(ids):
+                    return
+                remap = remaps.get(id(store))
+                if remap is None:
+                    remap = remaps[id(store)] = np.full(len(store.voter_names), -1, dtype=np.int64)
+                # Intern new voters in order of first appearance, like the dict path
+                unique, first_seen = np.unique(ids, return_index=True)
+                for voter in unique[np.argsort(first_seen)].tolist():
+                    if remap[voter] < 0:
+                        remap[voter] = voter_lookup.setdefault(store.voter_names[voter], len(voter_lookup))
+                chunks.append((rows[0] - first + first_player, rows[1], remap[ids], rows[3], rows[4]))
+
+        for player_id, player in enumerate(players):
+            player_names.append(player.name)
+            stored = getattr(player, 'stored_votes', None)
+            if stored is not None:
+                store, stored_id = stored
+                if run is not None and run[0] is store and run[2] + 1 == stored_id:
+                    run[2] = stored_id
+                else:
+                    flush()
+                    run = [store, stored_id, stored_id, player_id]
+                continue
+            if run is not None:
+                flush()
+            for pos, rating in player.positions.items():
+                position_id = POSITION_INDEX[pos]
+                for vote in rating['votes']:
+                    voter_id = voter_lookup.setdefault(vote['voter'], len(voter_lookup))
+                    player_ids.append(player_id)
+                    position_ids.append(position_id)
+                    voter_ids.append(voter_id)
+                    mins.append(vote['min'])
+                    maxs.append(vote['max'])
+        flush()
+
+        if len(chunks) <= 1:
+            return cls(player_names, list(voter_lookup), *(chunks[0] if chunks else [[]] * 5))
+        return cls(player_names, list(voter_lookup), *[np.concatenate(column) for column in zip(*chunks)])
+
+
+def round_ratings(values):
+    """
+    Round to one decimal exactly like Python's round(value, 1).
+
+    np.round scales by ten first, which can turn values just below a half
+    into an exact half, so those rare cases are rounded one by one.
+    """
+    rounded = np.round(values, 1)
+    scaled = values * 10
+    ambiguous = np.nonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)[0]
+    for i in ambiguous:
+        rounded[i] = round(float(values[i]), 1)
+    return rounded
+
+
+def _group_mean(groups, values, n_groups, weights=None):
+    totals = np.bincount(groups, weights=values if weights is None else values * weights,
+                         minlength=n_groups)
+    counts = np.bincount(groups, weights=weights, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return totals / counts
+
+
+def _sorted_by_group(groups, values):
+    """Sort values within each group and return them with each vote's rank and group size"""
+    order = np.lexsort((values, groups))
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    counts = np.bincount(sorted_groups)
+    starts = np.cumsum(counts) - counts
+    ranks = np.arange(len(order)) - starts[sorted_groups]
+    return sorted_groups, sorted_values, ranks, counts, starts
+
+
+def _group_median(groups, values, n_groups):
+    result = np.full(n_groups, np.nan)
+    if len(values) == 0:
+        return result
+    _, sorted_values, _, counts, starts = _sorted_by_group(groups, values)
+    present = np.nonzero(counts)[0]
+    low = sorted_values[starts[present] + (counts[present] - 1) // 2]
+    high = sorted_values[starts[present] + counts[present] // 2]
+    result[present] = (low + high) / 2
+    return result
+
+
+def _group_trimmed_mean(groups, values, n_groups, trim=TRIM_FRACTION):
+    if len(values) == 0:
+        return np.full(n_groups, np.nan)
+    sorted_groups, sorted_values, ranks, counts, _ = _sorted_by_group(groups, values)
+    cut = np.floor(counts * trim).astype(np.int64)
+    keep = (ranks >= cut[sorted_groups]) & (ranks < counts[sorted_groups] - cut[sorted_groups])
+    return _group_mean(sorted_groups[keep], sorted_values[keep], n_groups)
+
+
+def voter_reliability(columns, iterations=RELIABILITY_ITERATIONS):
+    """
+    Weight every voter by how well they agree with everyone else.
+
+    A voter's error is their mean absolute distance from the leave-one-out
+    weighted consensus of the other votes on the same player and position;
+    the weight is 1 / (1 + error), normalised to a mean of one. Positions with
+    a single vote say nothing about agreement and are ignored, and voters
+    without any comparable vote keep a weight of one.
+
+    Returns:
+        np.ndarray: Weight of each voter id
+    """
+    n_voters = len(columns.voter_names)
+    weights = np.ones(n_voters)
+    if len(columns) == 0:
+        return weights
+
+    ratings = (columns.mins + columns.maxs) / 2
+    groups = columns.groups
+    counts = np.bincount(groups, minlength=columns.n_groups)
+    comparable = counts[groups] > 1
+
+    for _ in range(iterations):
+        vote_weights = weights[columns.voter_ids]
+        totals = np.bincount(groups, weights=ratings * vote_weights, minlength=columns.n_groups)
+        weight_sums = np.bincount(groups, weights=vote_weights, minlength=columns.n_groups)
+        # Consensus of the other voters on the same player and position
+        other_weight = weight_sums[groups] - vote_weights
+        with np.errstate(invalid='ignore', divide='ignore'):
+            consensus = (totals[groups] - ratings * vote_weights) / other_weight
+        errors = np.where(comparable, np.abs(ratings - consensus), 0.0)
+
+        error_totals = np.bincount(columns.voter_ids, weights=errors, minlength=n_voters)
+        error_counts = np.bincount(columns.voter_ids, weights=comparable.astype(float), minlength=n_voters)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_errors = np.where(error_counts > 0, error_totals / error_counts, 0.0)
+        weights = 1 / (1 + mean_errors)
+        weights /= weights.mean()
+
+    return weights
+
+
+def aggregate(columns, method="mean", voter_weights=None, trim=TRIM_FRACTION):
+    """
+    Aggregate every player's votes in one batched pass.
+
+    Args:
+        columns (VoteColumns): The team's votes
+        method (str): One of AGGREGATORS
+        voter_weights (np.ndarray): Weight per voter id, used by "weighted"
+        trim (float): Fraction dropped from each end by "trimmed"
+
+    Returns:
+        (mins, maxs): Arrays of shape (players, len(POSITIONS)), NaN where a
+        position has no votes, rounded to one decimal
+    """
+    if method not in AGGREGATORS:
+        raise ValueError(f"Invalid aggregator: {method}")
+
+    groups, n_groups = columns.groups, columns.n_groups
+    results = []
+    for values in (columns.mins, columns.maxs):
+        if method == "mean":
+            result = _group_mean(groups, values, n_groups)
+        elif method == "median":
+            result = _group_median(groups, values, n_groups)
+        elif method == "trimmed":
+            result = _group_trimmed_mean(groups, values, n_groups, trim)
+        else:
+            if voter_weights is None:
+                voter_weights = voter_reliability(columns)
+            result = _group_mean(groups, values, n_groups, voter_weights[columns.voter_ids])
+        results.append(round_ratings(result).reshape(-1, len(POSITIONS)))
+    return results[0], results[1]
+
+
+def aggregate_votes(votes, method="mean", voter_weights=None, trim=TRIM_FRACTION):
+    """
+    Aggregate a single position's votes with the same rules as aggregate().
+
+    Args:
+        votes (list): Vote dicts with 'voter', 'min' and 'max'
+        voter_weights (dict): Weight per voter name for "weighted" (missing voters weigh 1)
+
+    Returns:
+        (min, max) rounded to one decimal, or None if there are no votes
+    """
+    if not votes:
+        return None
+    if method not in AGGREGATORS:
+        raise ValueError(f"Invalid aggregator: {method}")
+
+    results = []
+    for field in ('min', 'max'):
+        values = [v[field] for v in votes]
+        if method == "mean":
+            result = sum(values) / len(values)
+        elif method == "median":
+            values.sort()
+            result = (values[(len(values) - 1) // 2] + values[len(values) // 2]) / 2
+        elif method == "trimmed":
+            values.sort()
+            cut = int(len(values) * trim)
+            kept = values[cut:len(values) - cut]
+            result = sum(kept) / len(kept)
+        else:
+            weights = [(voter_weights or {}).get(v['voter'], 1.0) for v in votes]
+            result = sum(w * v[field] for w, v in zip(weights, votes)) / sum(weights)
+        results.append(round(result, 1))
+    return results[0], results[1]
@@ -0,0 +1,212 @@
+# Anytime_Solver.py
+"""
+Anytime lineup optimization under an explicit time budget.
+
+The search starts from the greedy lineups of get_balanced_lineup and
+get_attack_focused_lineup and improves the better one with best-improvement
+local search (swap two starters' slots, or bring a bench player into a slot).
+At a local optimum it perturbs the best lineup found with a few random moves
+and searches again, until the deadline, the iteration budget or the target
+gap is reached. The best lineup so far can be returned at any moment, with an
+upper bound on the score any lineup could reach.
+"""
+import time
+import numpy as np
+from Formations import get_formation
+from Instrumentation import instrumented
+
+# Seconds spent searching when a call doesn't set its own budget
+DEFAULT_TIME_BUDGET = 0.2
+# Random moves applied to the best lineup when the search is stuck
+PERTURBATION_MOVES = 3
+# Improvements smaller than this are treated as no improvement
+EPSILON = 1e-9
+# Greedy strategies the search starts from
+START_STRATEGIES = ["get_balanced_lineup", "get_attack_focused_lineup"]
+
+
+class AnytimeResult:
+    """
+    Best lineup found by anytime_lineup.
+
+    Attributes:
+        lineup (dict): Slot -> (player, rating), "AI" for empty slots
+        score (float): Weighted sum of the lineup's slot ratings
+        bound (float): No lineup of this selection can score more
+        start (str): Greedy strategy the best lineup was improved from
+        start_score (float): Score of that greedy lineup
+        iterations (int): Local search moves and perturbations tried
+        elapsed (float): Seconds searched
+    """
+
+    def __init__(self, lineup, score, bound, start, start_score, iterations, elapsed):
+        self.lineup = lineup
+        self.score = score
+        self.bound = bound
+        self.start = start
+        self.start_score = start_score
+        self.iterations = iterations
+        self.elapsed = elapsed
+
+    @property
+    def gap(self):
+        """Most the score could still improve by"""
+        return max(self.bound - self.score, 0.0)
+
+    @property
+    def relative_gap(self):
+        return self.gap / self.bound if self.bound > 0 else 0.0
+
+    @property
+    def optimal(self):
+        """True when the bound proves no better lineup exists"""
+        return self.gap <= EPSILON
+
+    def __repr__(self):
+        return (f"AnytimeResult(score={self.score:.2f}, bound={self.bound:.2f}, "
+                f"gap={self.gap:.2f}, iterations={self.iterations}, elapsed={self.elapsed:.3f})")
+
+
+def upper_bound(weights):
+    """
+    Bound on the best assignment score of a slot x player weight matrix: the
+    smaller of every slot getting its best player and every slot getting one
+    of the players with the highest best rating.
+    """
+    if weights.size == 0:
+        return 0.0
+    by_slot = weights.max(axis=1).sum()
+    player_best = np.sort(weights.max(axis=0))[::-1]
+    by_player = player_best[:weights.shape[0]].sum()
+    return float(min(by_slot, by_player))
+
+
+def _assignment(lineup, slots, player_rows, n_players):
+    """Lineup dict -> column per slot; empty slots get their own AI column"""
+    assign = np.empty(len(slots), dtype=np.intp)
+    for i, slot in enumerate(slots):
+        player, _ = lineup.get(slot, ("AI", 0.0))
+        assign[i] = player_rows.get(player, n_players + i)
+    return assign
+
+
+def _improve(weights, assign, deadline, max_moves, cancel):
+    """
+    Best-improvement local search; returns (moves made, whether it stopped at a
+    local optimum).
+    """
+    n_slots = weights.shape[0]
+    slot_range = np.arange(n_slots)
+    on_pitch = np.zeros(weights.shape[1], dtype=bool)
+    moves = 0
+    while moves < max_moves:
+        if time.perf_counter() > deadline or (cancel and cancel.is_set()):
+            return moves, False
+        current = weights[slot_range, assign]
+        # swaps[i, j]: gain of exchanging the players of slots i and j
+        assigned = weights[:, assign]
+        swaps = assigned + assigned.T - current[:, None] - current[None, :]
+        # bench[i, b]: gain of bringing bench column b into slot i
+        on_pitch[:] = False
+        on_pitch[assign] = True
+        bench_columns = np.flatnonzero(~on_pitch)
+        bench = weights[:, bench_columns] - current[:, None]
+
+        best_swap = np.unravel_index(np.argmax(swaps), swaps.shape)
+        best_bench = np.unravel_index(np.argmax(bench), bench.shape) if bench.size else None
+        swap_gain = swaps[best_swap]
+        bench_gain = bench[best_bench] if best_bench is not None else -np.inf
+        if max(swap_gain, bench_gain) <= EPSILON:
+            return moves, True
+        if swap_gain >= bench_gain:
+            i, j = best_swap
+            assign[i], assign[j] = assign[j], assign[i]
+        else:
+            i, b = best_bench
+            assign[i] = bench_columns[b]
+        moves += 1
+    return moves, False
+
+
+def _perturb(assign, n_columns, rng, moves=PERTURBATION_MOVES):
+    """Apply random slot swaps and bench substitutions to a copy of assign"""
+    assign = assign.copy()
+    for _ in range(moves):
+        i = rng.integers(len(assign))
+        if rng.random() < 0.5:
+            j = rng.integers(len(assign))
+            assign[i], assign[j] = assign[j], assign[i]
+        else:
+            bench = np.setdiff1d(np.arange(n_columns), assign)
+            if bench.size:
+                assign[i] = bench[rng.integers(bench.size)]
+    return assign
+
+
+@instrumented
+def anytime_lineup(team, players_selected, formation, position_mapping, time_budget=DEFAULT_TIME_BUDGET,
+                   target_gap=0.0, max_iterations=None, slot_weights=None, seed=0,
+                   progress=None, cancel=None):
+    """
+    Improve the greedy lineups with local search until a budget runs out.
+
+    Args:
+        time_budget (float): Seconds to search after the greedy starts are built
+        target_gap (float): Stop once the best score is within this of the bound
+        max_iterations (int): Stop after this many moves and perturbations
+        slot_weights (sequence): Multiplier of each slot's rating in the score
+            (e.g. > 1 for attacking slots); every slot counts once by default
+        seed (int): Seed of the perturbations, so runs are reproducible
+        progress (callable): Called with (iterations, max_iterations or 0)
+        cancel (threading.Event): When set, return the best lineup so far
+
+    Returns:
+        AnytimeResult
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget
+    players = team.selected_players(players_selected)
+    compiled = get_formation(formation, position_mapping)
+    player_rows = {player.name: i for i, player in enumerate(players)}
+    n_slots, n_players = len(compiled.slots), len(players)
+
+    ratings = team.lineup_matrix(players)[:, compiled.slot_index].T
+    weights = ratings * (np.ones(n_slots) if slot_weights is None
+                         else np.asarray(slot_weights, dtype=float))[:, None]
+    # One zero column per slot stands for "AI" filling it
+    weights = np.hstack([weights, np.zeros((n_slots, n_slots))])
+    n_columns = weights.shape[1]
+    slot_range = np.arange(n_slots)
+    bound = upper_bound(weights[:, :n_players])
+
+    best, best_score, start, start_score = None, -np.inf, None, None
+    for strategy in START_STRATEGIES:
+        assign = _assignment(getattr(team, strategy)(players_selected, formation, position_mapping),
+                             compiled.slots, player_rows, n_players)
+        score = float(weights[slot_range, assign].sum())
+        if score > best_score:
+            best, best_score, start, start_score = assign, score, strategy, score
+
+    rng = np.random.default_rng(seed)
+    limit = max_iterations if max_iterations is not None else float('inf')
+    iterations = 0
+    current = best.copy()
+    while iterations < limit and bound - best_score > target_gap + EPSILON:
+        moves, local_optimum = _improve(weights, current, deadline, limit - iterations, cancel)
+        iterations += moves
+        score = float(weights[slot_range, current].sum())
+        if score > best_score + EPSILON:
+            best, best_score = current.copy(), score
+        if not local_optimum:
+            break
+        current = _perturb(best, n_columns, rng)
+        iterations += 1
+        if progress:
+            progress(iterations, max_iterations or 0)
+
+    lineup = {}
+    for slot, row, column in zip(compiled.slots, slot_range, best):
+        rating = float(ratings[row, column]) if column < n_players else 0.0
+        lineup[slot] = (players[column].name, rating) if rating > 0 else ("AI", 0.0)
+    return AnytimeResult(lineup, best_score, bound, start, start_score, iterations,
+                         time.perf_counter() - started)
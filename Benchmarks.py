@@ -0,0 +1,197 @@
+# Benchmarks.py
+"""
+Benchmark suite for the Team hot paths on synthetic rosters.
+
+Usage:
+    python Benchmarks.py --sizes 20 100 1000 --output bench.json
+    python Benchmarks.py --compare old.json new.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import scipy
+from Player_Stats import Team, LINEUP_STRATEGIES
+from Formations import POSITIONS, FORMATION_POSITIONS
+from Synthetic_Data import generate_team_data, write_team_file
+
+DEFAULT_SIZES = [20, 100, 1000, 10000, 100000]
+
+
+def _time_calls(func, repeat):
+    """Run func repeat times and return the individual timings in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _result(size, name, timings, calls_per_run=1):
+    per_call = [t / calls_per_run for t in timings]
+    return {
+        'size': size,
+        'benchmark': name,
+        'runs': len(timings),
+        'calls_per_run': calls_per_run,
+        'min': min(per_call),
+        'median': statistics.median(per_call),
+        'mean': statistics.fmean(per_call),
+    }
+
+
+def benchmark_size(size, repeat=3, seed=0, workdir=None):
+    """
+    Time every benchmarked Team method on one synthetic roster size.
+
+    Returns:
+        list: One result dict per benchmark
+    """
+    rng = random.Random(seed)
+    results = []
+    path = os.path.join(workdir, f"bench_{size}.json")
+    write_team_file(path, generate_team_data(size, seed=seed))
+
+    # Team methods print status messages; keep them out of the report
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    with quiet:
+        team = Team("Benchmark", filename=path)
+        results.append(_result(size, "load_players", _time_calls(team.load_players, repeat)))
+        results.append(_result(size, "save_players", _time_calls(team.save_players, repeat)))
+
+    names = list(team.players)
+    votes = [(rng.choice(names), rng.choice(POSITIONS), f"Bench Voter {rng.randrange(50)}",
+              rng.randint(0, 4)) for _ in range(1000)]
+
+    # Votes take the same path as in the app: history, change log, events and revision
+    with quiet:
+        team.enable_history()
+        team.enable_change_log()
+
+    def add_votes():
+        for name, pos, voter, low in votes:
+            team.add_rating_vote(name, pos, float(low), float(low + 1), voter)
+    results.append(_result(size, "add_rating_vote", _time_calls(add_votes, repeat), len(votes)))
+
+    batch = [(name, pos, float(low), float(low + 1), voter) for name, pos, voter, low in votes]
+    results.append(_result(size, "apply_votes", _time_calls(lambda: team.apply_votes(batch), repeat), len(votes)))
+
+    def top_players():
+        for pos in POSITIONS:
+            team.get_top_players_by_position(pos, limit=3)
+    results.append(_result(size, "get_top_players_by_position",
+                           _time_calls(top_players, repeat), len(POSITIONS)))
+
+    results.append(_result(size, "get_position_gaps", _time_calls(team.get_position_gaps, repeat)))
+
+    for strategy in LINEUP_STRATEGIES:
+        method = getattr(team, strategy)
+
+        def all_formations():
+            for formation, mapping in FORMATION_POSITIONS.items():
+                try:
+                    method(names, formation, mapping)
+                except ValueError:
+                    # The assignment solver rejects rosters that can't fill a formation
+                    pass
+        results.append(_result(size, strategy, _time_calls(all_formations, repeat),
+                               len(FORMATION_POSITIONS)))
+
+    team.change_log.close()
+    return results
+
+
+def run_benchmarks(sizes=None, repeat=3, seed=0, output=None):
+    """
+    Run the whole suite and optionally write the results as JSON.
+
+    Returns:
+        dict: {'meta': {...}, 'results': [...]}
+    """
+    sizes = sizes or DEFAULT_SIZES
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': []
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"Benchmarking {size} players...", file=sys.stderr)
+            report['results'].extend(benchmark_size(size, repeat, seed, workdir))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=4)
+    return report
+
+
+def compare_reports(old, new):
+    """Return rows of (size, benchmark, old median, new median, speedup)"""
+    old_results = {(r['size'], r['benchmark']): r for r in old['results']}
+    rows = []
+    for r in new['results']:
+        before = old_results.get((r['size'], r['benchmark']))
+        if before:
+            rows.append((r['size'], r['benchmark'], before['median'], r['median'],
+                         before['median'] / r['median'] if r['median'] else float('inf')))
+    return rows
+
+
+def _format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main(argv=None):
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser(description="Benchmark Team methods on synthetic rosters")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default="benchmark_results.json")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        rows = [(size, name, _format_seconds(a), _format_seconds(b), f"{speedup:.2f}x")
+                for size, name, a, b, speedup in compare_reports(old, new)]
+        print(tabulate(rows, headers=['Players', 'Benchmark', 'Old', 'New', 'Speedup'], tablefmt='grid'))
+        return
+
+    report = run_benchmarks(args.sizes, args.repeat, args.seed, args.output)
+    rows = [(r['size'], r['benchmark'], _format_seconds(r['median']), r['calls_per_run'])
+            for r in report['results']]
+    print(tabulate(rows, headers=['Players', 'Benchmark', 'Median per call', 'Calls'], tablefmt='grid'))
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
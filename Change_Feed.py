@@ -0,0 +1,149 @@
+# Change_Feed.py
+import json
+import os
+import time
+
+# Event kinds
+PLAYER_ADDED = "player_added"          # A new player was created
+VOTE_SET = "vote_set"                  # A voter's vote was added or replaced
+AGGREGATE_CHANGED = "aggregate_changed"  # A position's aggregate min/max changed
+RELOADED = "reloaded"                  # Every player was replaced (load_players)
+EVENT_KINDS = [PLAYER_ADDED, VOTE_SET, AGGREGATE_CHANGED, RELOADED]
+# Bytes read at a time when looking for the last record of a change log
+TAIL_BLOCK_SIZE = 4096
+
+
+class ChangeEvent:
+    """
+    One change to a team.
+
+    Attributes:
+        kind (str): One of EVENT_KINDS
+        player (str): Affected player name (None for RELOADED)
+        position (str): Affected position (None for player-wide events)
+        data (dict): Kind-specific details, e.g. voter/min/max/replaced for
+            VOTE_SET or old/new (min, max) for AGGREGATE_CHANGED
+    """
+    __slots__ = ('kind', 'player', 'position', 'data')
+
+    def __init__(self, kind, player=None, position=None, data=None):
+        self.kind = kind
+        self.player = player
+        self.position = position
+        self.data = data or {}
+
+    def to_dict(self):
+        return {'kind': self.kind, 'player': self.player, 'position': self.position, 'data': self.data}
+
+    def __repr__(self):
+        return f"ChangeEvent({self.kind!r}, {self.player!r}, {self.position!r}, {self.data!r})"
+
+
+class ChangeFeed:
+    """
+    Synchronous publish/subscribe hub for change events.
+
+    Subscribers are called in subscription order right after each change, on
+    the thread that made it. No event is built while nobody listens to its
+    kind, so callers can emit unconditionally.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def __bool__(self):
+        """True while anybody is subscribed"""
+        return bool(self._subscribers)
+
+    def subscribe(self, callback, kinds=None):
+        """
+        Call callback(event) for every event, or only for the given kinds.
+
+        Returns:
+            callable: Unsubscribes when called
+        """
+        entry = (callback, frozenset(kinds) if kinds else None)
+        self._subscribers.append(entry)
+        return lambda: self._subscribers.remove(entry) if entry in self._subscribers else None
+
+    def wants(self, kind):
+        """True if any subscriber listens to kind, so costly events can be skipped"""
+        return any(kinds is None or kind in kinds for _, kinds in self._subscribers)
+
+    def emit(self, kind, player=None, position=None, **data):
+        if not self.wants(kind):
+            return
+        event = ChangeEvent(kind, player, position, data)
+        for callback, kinds in list(self._subscribers):
+            if kinds is None or kind in kinds:
+                callback(event)
+
+
+class ChangeLog:
+    """
+    Subscriber appending every event to a JSONL file that other processes can
+    tail instead of re-reading the players file.
+
+    Each line is {"seq", "time", "kind", "player", "position", "data"}; seq
+    keeps counting across sessions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seq = self._last_seq()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @classmethod
+    def for_data_file(cls, filename):
+        """Change log next to a players data file"""
+        return cls(os.path.splitext(filename)[0] + "_changes.jsonl")
+
+    def _last_seq(self):
+        """seq of the last complete line, reading blocks backwards from the end"""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            tail = b""
+            while end > 0:
+                start = max(0, end - TAIL_BLOCK_SIZE)
+                f.seek(start)
+                tail = f.read(end - start) + tail
+                end = start
+                # The first line may be cut off until the start of the file is
+                # reached, and the last one may be partly written
+                lines = tail.split(b"\n")
+                for line in reversed(lines[1 if start else 0:-1]):
+                    if line.strip():
+                        return json.loads(line)['seq']
+        return 0
+
+    def __call__(self, event):
+        self.seq += 1
+        record = {'seq': self.seq, 'time': round(time.time(), 3), **event.to_dict()}
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def tail_changes(path, offset=0):
+    """
+    Read change records written after a byte offset.
+
+    Yields:
+        (record, next offset): Pass the last offset back in to continue later
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            line = f.readline()
+            # A partly written last line is left for the next call
+            if not line or not line.endswith(b"\n"):
+                return
+            offset += len(line)
+            if line.strip():
+                yield json.loads(line), offset
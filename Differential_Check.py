@@ -0,0 +1,485 @@
+# Differential_Check.py
+"""
+Differential checks of the optimized code paths against the original
+loop-based implementations.
+
+The references below are the pure-Python code the app ran before the
+optimizations (per-vote aggregation, the dict-based get_best_lineup and the
+sort-based position ranking), kept here verbatim so a regression in the
+rewritten Team methods is caught too. Every check builds seeded synthetic
+rosters, runs the reference and every registered candidate on the same
+team, compares the results and times both. A new engine only has to
+register itself with register_candidate() to be checked and benchmarked:
+
+    register_candidate("top_players", "my_engine", my_top_players)
+
+The original code has no out-of-position play or voter normalization, so
+both are turned off on the checked teams.
+
+Allowed differences:
+    aggregation   None: candidates must give exactly the same rounded
+                  (min, max) for every player, position and aggregator.
+    best_lineup   Lineups must be identical, except for genuine ties: a
+                  lineup that uses every player at most once, gives each
+                  player exactly the rating the original code gives them in
+                  that slot and reaches the same total (the assignment
+                  solver may break ties either way).
+    top_players   Ranks and ratings must be identical; players sharing a
+                  rank may be listed in any order, and when the limit cuts a
+                  tied group any of its players may fill the cut.
+
+Usage:
+    python Differential_Check.py --sizes 20 200 2000 --seeds 0 1 2
+    python Differential_Check.py --targets best_lineup --strict
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from Player_Stats import Team
+from Formations import POSITIONS, FORMATION_POSITIONS
+from Aggregation import AGGREGATORS, VoteColumns, aggregate, aggregate_votes, voter_reliability
+from Lineup_Cache import LineupCache
+from Lineup_Precompute import LineupPrecomputer
+from Synthetic_Data import generate_team_data, write_team_file
+
+DEFAULT_SIZES = [20, 200, 2000]
+DEFAULT_SEEDS = [0, 1, 2]
+# Players listed per position by the top_players check
+TOP_LIMIT = 5
+# Smallest difference treated as a real rating difference
+TOLERANCE = 1e-9
+
+MATCH, TIE, MISMATCH = "match", "tie", "mismatch"
+
+# ---------------------------------------------------------------------------
+# Reference implementations (the original loop-based code)
+# ---------------------------------------------------------------------------
+
+# Slots the original get_best_lineup weighted double, and its side pairs
+PRIORITY_POSITIONS = ['ST', 'LW', 'RW', 'CAM', 'LM', 'RM', 'CM', 'CDM', 'CB', 'LB', 'RB', 'GK']
+SIDE_PAIRS = [('LCM', 'RCM'), ('LM', 'RM'), ('LB', 'RB'), ('LCB', 'RCB'), ('LW', 'RW')]
+LEFT_SIDE_POSITIONS = ['LW', 'LM', 'LB']
+RIGHT_SIDE_POSITIONS = ['RW', 'RM', 'RB']
+
+
+def _reference_aggregate(votes, method, weights):
+    """
+    One position's votes aggregated the original way: a plain mean of the
+    vote dicts. Aggregators added later use their per-vote definition.
+    """
+    if not votes:
+        return None
+    if method == "mean":
+        return (round(sum(v['min'] for v in votes) / len(votes), 1),
+                round(sum(v['max'] for v in votes) / len(votes), 1))
+    return aggregate_votes(votes, method, weights)
+
+
+def _reference_aggregates(team, workdir):
+    """Method -> (mins, maxs) players x POSITIONS arrays, aggregated one position at a time"""
+    players = list(team.players.values())
+    columns = VoteColumns.from_players(players)
+    weights = dict(zip(columns.voter_names, voter_reliability(columns).tolist()))
+    results = {}
+    for method in AGGREGATORS:
+        mins = np.full((len(players), len(POSITIONS)), np.nan)
+        maxs = np.full_like(mins, np.nan)
+        for i, player in enumerate(players):
+            for j, pos in enumerate(POSITIONS):
+                result = _reference_aggregate(player.positions[pos]['votes'], method, weights)
+                if result:
+                    mins[i, j], maxs[i, j] = result
+        results[method] = (mins, maxs)
+    return results
+
+
+def _reference_slot_rating(player, slot, position):
+    """The rating the original get_best_lineup reports for a player in a slot"""
+    rating = player.positions[position]['min']
+    if slot in PRIORITY_POSITIONS:
+        rating *= 2
+    return rating / 2 if rating > 5 else rating
+
+
+def _reference_best_lineup(team, players_selected, position_mapping):
+    """The original get_best_lineup, working on the players' rating dicts"""
+    players = [team.players[name] for name in players_selected if name in team.players]
+    all_positions = list(position_mapping.keys())
+    check_positions = all_positions.copy()
+    player_names = [player.name for player in players]
+
+    cost_matrix = np.zeros((len(all_positions), len(players)))
+    for i, pos in enumerate(all_positions):
+        for j, player in enumerate(players):
+            rating = player.positions[position_mapping[pos]]['min']
+            cost_matrix[i, j] = -rating if rating > 0 else float('inf')
+        if pos in PRIORITY_POSITIONS:
+            cost_matrix[i] *= 2
+
+    if len(all_positions) > len(players):
+        cost_matrix = cost_matrix[:len(players), :]
+        all_positions = all_positions[:len(players)]
+
+    row_ind, col_ind = linear_sum_assignment(cost_matrix)
+    lineup = {}
+    for i, pos in enumerate(all_positions):
+        if i < len(row_ind):
+            lineup[pos] = (player_names[col_ind[i]], -cost_matrix[i, col_ind[i]])
+
+    for pos in check_positions:
+        if pos not in lineup:
+            lineup[pos] = ("AI", 0.0)
+        player, rating = lineup[pos]
+        if rating > 5:
+            lineup[pos] = (player, rating / 2)
+
+    def affinity(player, side):
+        return sum(player.positions[pos]['min'] for pos in side)
+
+    for left_pos, right_pos in SIDE_PAIRS:
+        if left_pos in lineup and right_pos in lineup:
+            left_player, left_rating = lineup[left_pos]
+            right_player, right_rating = lineup[right_pos]
+            left_obj = team.players.get(left_player) if left_player != "AI" else None
+            right_obj = team.players.get(right_player) if right_player != "AI" else None
+
+            if left_obj and right_obj:
+                current = affinity(left_obj, LEFT_SIDE_POSITIONS) + affinity(right_obj, RIGHT_SIDE_POSITIONS)
+                swapped = affinity(right_obj, LEFT_SIDE_POSITIONS) + affinity(left_obj, RIGHT_SIDE_POSITIONS)
+                if swapped > current:
+                    lineup[left_pos] = (right_player, right_rating)
+                    lineup[right_pos] = (left_player, left_rating)
+            elif left_obj:
+                if affinity(left_obj, RIGHT_SIDE_POSITIONS) > affinity(left_obj, LEFT_SIDE_POSITIONS):
+                    lineup[right_pos] = (left_player, left_rating)
+                    lineup[left_pos] = ("AI", 0.0)
+            elif right_obj:
+                if affinity(right_obj, LEFT_SIDE_POSITIONS) > affinity(right_obj, RIGHT_SIDE_POSITIONS):
+                    lineup[left_pos] = (right_player, right_rating)
+                    lineup[right_pos] = ("AI", 0.0)
+    return lineup
+
+
+def _reference_best_lineups(team, workdir):
+    """Formation -> the original get_best_lineup with every player, None if it can't be filled"""
+    names = list(team.players)
+    lineups = {}
+    for formation, mapping in FORMATION_POSITIONS.items():
+        try:
+            lineups[formation] = _reference_best_lineup(team, names, mapping)
+        except ValueError:
+            lineups[formation] = None
+    return lineups
+
+
+def _reference_top_players(team, workdir, limit=TOP_LIMIT):
+    """Position -> ranking by the original sort on (max, single value first, min)"""
+    rankings = {}
+    for position in POSITIONS:
+        players_ratings = []
+        for player in team.players.values():
+            rating = player.positions[position]
+            if rating['min'] > 0:
+                priority_flag = 0 if rating['min'] != rating['max'] else 1
+                players_ratings.append((player.name, rating['max'], priority_flag, rating['min']))
+        players_ratings.sort(key=lambda x: (x[1], x[2], x[3]), reverse=True)
+
+        ranked_players = []
+        current_rank = 1
+        last_rating = None
+        for name, max_rating, _, min_rating in players_ratings:
+            if last_rating is None or (max_rating, min_rating) != last_rating:
+                rank = current_rank
+                current_rank += 1
+            else:
+                rank = ranked_players[-1][1]
+            ranked_players.append((name, rank, max_rating, min_rating))
+            last_rating = (max_rating, min_rating)
+        rankings[position] = ranked_players[:limit]
+    return rankings
+
+
+REFERENCES = {
+    'aggregation': _reference_aggregates,
+    'best_lineup': _reference_best_lineups,
+    'top_players': _reference_top_players,
+}
+
+# ---------------------------------------------------------------------------
+# Candidates
+# ---------------------------------------------------------------------------
+
+def _batched_aggregates(team, workdir):
+    """Aggregation.aggregate over the whole team at once (used by recompute_aggregates)"""
+    columns = VoteColumns.from_players(team.players.values())
+    weights = voter_reliability(columns)
+    return {method: aggregate(columns, method, weights) for method in AGGREGATORS}
+
+
+def _team_best_lineups(team, workdir):
+    """Team.get_best_lineup, sliced from the rating matrix of the compiled formations"""
+    names = list(team.players)
+    lineups = {}
+    for formation, mapping in FORMATION_POSITIONS.items():
+        try:
+            lineups[formation] = team.get_best_lineup(names, formation, mapping)
+        except ValueError:
+            lineups[formation] = None
+    return lineups
+
+
+def _cached_best_lineups(team, workdir):
+    """LineupCache.get_or_solve; after the first run every lineup is read back from disk"""
+    cache = LineupCache(os.path.join(workdir, "lineup_cache"))
+    names = list(team.players)
+    lineups = {}
+    for formation, mapping in FORMATION_POSITIONS.items():
+        try:
+            lineups[formation] = cache.get_or_solve(team, "get_best_lineup", names, formation, mapping)
+        except ValueError:
+            lineups[formation] = None
+    return lineups
+
+
+def _precomputed_best_lineups(team, workdir):
+    """LineupPrecomputer results for the whole roster, computed on its worker thread"""
+    precomputer = LineupPrecomputer(team)
+    precomputer.schedule()
+    precomputer.wait()
+    names = list(team.players)
+    return {formation: precomputer.lookup("get_best_lineup", formation, mapping, names)
+            for formation, mapping in FORMATION_POSITIONS.items()}
+
+
+def _team_top_players(team, workdir, limit=TOP_LIMIT):
+    """Team.get_top_players_by_position"""
+    return {pos: team.get_top_players_by_position(pos, limit) for pos in POSITIONS}
+
+
+def _numpy_top_players(team, workdir, limit=TOP_LIMIT):
+    """Rankings from the rating matrices with one stable lexsort per position"""
+    players = list(team.players.values())
+    mins = team.rating_matrix(players, 'min')
+    maxs = team.rating_matrix(players, 'max')
+    rankings = {}
+    for j, pos in enumerate(POSITIONS):
+        rated = np.flatnonzero(mins[:, j] > 0)
+        low, high = mins[rated, j], maxs[rated, j]
+        # lexsort sorts by the last key first: max, then single values, then min
+        order = rated[np.lexsort((-low, low != high, -high))][:limit]
+        ranked, rank, last = [], 0, None
+        for i in order:
+            key = (float(maxs[i, j]), float(mins[i, j]))
+            if key != last:
+                rank, last = rank + 1, key
+            ranked.append((players[i].name, rank, key[0], key[1]))
+        rankings[pos] = ranked
+    return rankings
+
+
+# Target -> candidate label -> function(team, workdir)
+CANDIDATES = {
+    'aggregation': {'batched': _batched_aggregates},
+    'best_lineup': {'team': _team_best_lineups, 'lineup_cache': _cached_best_lineups,
+                    'precomputed': _precomputed_best_lineups},
+    'top_players': {'team': _team_top_players, 'numpy': _numpy_top_players},
+}
+
+
+def register_candidate(target, label, func):
+    """
+    Check func(team, workdir) against the reference of target on every run.
+
+    Raises:
+        ValueError: If target is unknown
+    """
+    if target not in REFERENCES:
+        raise ValueError(f"Unknown target: {target}")
+    CANDIDATES[target][label] = func
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+def _compare_aggregates(team, reference, candidate):
+    for method, (ref_mins, ref_maxs) in reference.items():
+        cand_mins, cand_maxs = candidate[method]
+        for field, ref, cand in (('min', ref_mins, cand_mins), ('max', ref_maxs, cand_maxs)):
+            if not np.array_equal(np.isnan(ref), np.isnan(cand)):
+                return MISMATCH, [f"{method} {field}: different positions rated"]
+            diff = np.abs(np.nan_to_num(ref) - np.nan_to_num(cand))
+            if diff.max(initial=0.0) > 0:
+                i, j = np.unravel_index(np.argmax(diff), diff.shape)
+                return MISMATCH, [f"{method} {field} player {i} {POSITIONS[j]}: {ref[i, j]} != {cand[i, j]}"]
+    return MATCH, []
+
+
+def _compare_best_lineups(team, reference, candidate):
+    status, details = MATCH, []
+    for formation, ref in reference.items():
+        cand = candidate.get(formation)
+        if ref is None or cand is None:
+            if (ref is None) != (cand is None):
+                return MISMATCH, [f"{formation}: only one side produced a lineup"]
+            continue
+        if ref == cand:
+            continue
+        mapping = FORMATION_POSITIONS[formation]
+        players = [player for player, _ in cand.values() if player != "AI"]
+        genuine = (
+            set(ref) == set(cand)
+            and len(players) == len(set(players))
+            and all(player == "AI" and rating == 0 or player in team.players
+                    and abs(rating - _reference_slot_rating(team.players[player], slot, mapping[slot])) <= TOLERANCE
+                    for slot, (player, rating) in cand.items())
+            and abs(sum(r for _, r in ref.values()) - sum(r for _, r in cand.values())) <= TOLERANCE
+        )
+        if not genuine:
+            return MISMATCH, [f"{formation}: {ref} != {cand}"]
+        status = TIE
+        details.append(f"{formation}: equally good assignment chosen")
+    return status, details
+
+
+def _compare_top_players(team, reference, candidate):
+    for pos, ref in reference.items():
+        cand = candidate.get(pos, [])
+        if [(r, a, b) for _, r, a, b in ref] != [(r, a, b) for _, r, a, b in cand]:
+            return MISMATCH, [f"{pos}: {ref} != {cand}"]
+        last_rank = ref[-1][1] if ref else None
+        for rank in {r for _, r, _, _ in ref}:
+            ref_names = {name for name, r, _, _ in ref if r == rank}
+            cand_names = {name for name, r, _, _ in cand if r == rank}
+            # The last group may be cut by the limit, so any tied player can fill it
+            if rank != last_rank and ref_names != cand_names:
+                return MISMATCH, [f"{pos} rank {rank}: {sorted(ref_names)} != {sorted(cand_names)}"]
+    # Ranks, ratings and tie groups agree; only the order inside ties can differ
+    return (MATCH if reference == candidate else TIE), []
+
+
+COMPARATORS = {
+    'aggregation': _compare_aggregates,
+    'best_lineup': _compare_best_lineups,
+    'top_players': _compare_top_players,
+}
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _timed_runs(func, team, workdir, repeat):
+    """(result of the last run, median seconds per run)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(team, workdir)
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+def check_team(team, workdir, targets=None, repeat=3):
+    """
+    Run every candidate of the targets against the reference on one team.
+
+    Returns:
+        list: Dicts with target, candidate, status, details and timings
+    """
+    results = []
+    for target in targets or REFERENCES:
+        reference, reference_time = _timed_runs(REFERENCES[target], team, workdir, repeat)
+        for label, func in CANDIDATES[target].items():
+            try:
+                candidate, candidate_time = _timed_runs(func, team, workdir, repeat)
+                status, details = COMPARATORS[target](team, reference, candidate)
+            except Exception as e:
+                candidate_time, status, details = float('nan'), MISMATCH, [f"raised {e!r}"]
+            results.append({
+                'target': target,
+                'candidate': label,
+                'status': status,
+                'details': details,
+                'reference_time': reference_time,
+                'candidate_time': candidate_time,
+                'speedup': reference_time / candidate_time if candidate_time else float('inf'),
+            })
+    return results
+
+
+def run_checks(sizes=None, seeds=None, targets=None, repeat=3):
+    """
+    Check every target on a synthetic roster for each size and seed.
+
+    Returns:
+        list: check_team results with the size and seed added
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes or DEFAULT_SIZES:
+            for seed in seeds if seeds is not None else DEFAULT_SEEDS:
+                print(f"Checking {size} players, seed {seed}...", file=sys.stderr)
+                path = os.path.join(workdir, f"check_{size}_{seed}.json")
+                write_team_file(path, generate_team_data(size, seed=seed))
+                run_dir = os.path.join(workdir, f"run_{size}_{seed}")
+                os.makedirs(run_dir)
+                # Team methods print status messages; keep them out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    team = Team("Differential Check", filename=path)
+                    # The original code knows neither of these
+                    team.set_out_of_position(False)
+                    team.set_normalization(False)
+                    for result in check_team(team, run_dir, targets, repeat):
+                        results.append({'size': size, 'seed': seed, **result})
+    return results
+
+
+def _format_seconds(seconds):
+    if seconds != seconds:
+        return "-"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main(argv=None):
+    from tabulate import tabulate
+
+    parser = argparse.ArgumentParser(description="Check the optimized code paths against the original implementations")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seeds', type=int, nargs='+', default=DEFAULT_SEEDS)
+    parser.add_argument('--targets', nargs='+', choices=list(REFERENCES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--strict', action='store_true', help="Fail on allowed tie-breaking differences too")
+    args = parser.parse_args(argv)
+
+    results = run_checks(args.sizes, args.seeds, args.targets, args.repeat)
+    rows = [(r['size'], r['seed'], r['target'], r['candidate'], r['status'],
+             _format_seconds(r['reference_time']), _format_seconds(r['candidate_time']),
+             f"{r['speedup']:.2f}x" if r['speedup'] == r['speedup'] else "-")
+            for r in results]
+    print(tabulate(rows, headers=['Players', 'Seed', 'Target', 'Candidate', 'Result',
+                                  'Reference', 'Candidate', 'Speedup'], tablefmt='grid'))
+
+    failing = {MISMATCH, TIE} if args.strict else {MISMATCH}
+    failures = [r for r in results if r['status'] in failing]
+    for r in results:
+        for detail in r['details'][:5]:
+            print(f"{r['size']}/{r['seed']} {r['target']} {r['candidate']}: {detail}")
+    if failures:
+        print(f"\n{len(failures)} of {len(results)} checks failed.")
+        return 1
+    print(f"\nAll {len(results)} checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
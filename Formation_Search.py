@@ -0,0 +1,208 @@
+# Formation_Search.py
+import time
+import itertools
+from collections import Counter
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from Formations import Formation, POSITION_INDEX
+
+# ---------------------------------------------------------------------------
+# Slot Library
+# ---------------------------------------------------------------------------
+
+# Each line of the pitch can be built from a few slot groups.
+# Slot: (slot name, position played, (row, column))
+GOALKEEPER_SLOTS = [("GK", "GK", (23, 36))]
+
+DEFENSE_SLOTS = {
+    3: [("LCB", "CB", (18, 25)), ("CB", "CB", (18, 36)), ("RCB", "CB", (18, 48))],
+    4: [("LB", "LB", (18, 10)), ("LCB", "CB", (18, 28)), ("RCB", "CB", (18, 42)), ("RB", "RB", (18, 65))],
+    5: [("LWB", "LB", (18, 8)), ("LCB", "CB", (18, 25)), ("CB", "CB", (18, 36)),
+        ("RCB", "CB", (18, 48)), ("RWB", "RB", (18, 62))],
+}
+
+# Midfield groups: holding, central, wide and attacking midfielders
+HOLDING_SLOTS = {
+    0: [],
+    1: [("CDM", "CDM", 35)],
+    2: [("CDM1", "CDM", 25), ("CDM2", "CDM", 45)],
+}
+CENTRAL_SLOTS = {
+    0: [],
+    1: [("CM", "CM", 35)],
+    2: [("LCM", "CM", 25), ("RCM", "CM", 45)],
+    3: [("LCM", "CM", 22), ("CM", "CM", 35), ("RCM", "CM", 48)],
+}
+WIDE_SLOTS = {
+    0: [],
+    2: [("LM", "LM", 10), ("RM", "RM", 60)],
+}
+ATTACKING_MID_SLOTS = {
+    0: [],
+    1: [("CAM", "CAM", 35)],
+    3: [("LAM", "CAM", 15), ("CAM", "CAM", 35), ("RAM", "CAM", 55)],
+}
+
+FORWARD_SLOTS = {
+    1: [("ST", "ST", (3, 35))],
+    2: [("ST1", "ST", (3, 25)), ("ST2", "ST", (3, 45))],
+    3: [("LW", "LW", (3, 15)), ("ST", "ST", (3, 35)), ("RW", "RW", (3, 55))],
+}
+
+
+def _midfield_slots(holding, central, wide, attacking):
+    """Place the midfield groups on their rows and return slots plus row sizes"""
+    middle = WIDE_SLOTS[wide][:1] + CENTRAL_SLOTS[central] + WIDE_SLOTS[wide][1:]
+    # Holding midfielders drop deeper when there is a midfield row in front of them
+    holding_row = 13 if middle else 11
+    middle_row = 9 if holding else 11
+
+    slots = [(name, pos, (holding_row, x)) for name, pos, x in HOLDING_SLOTS[holding]]
+    slots += [(name, pos, (middle_row, x)) for name, pos, x in middle]
+    slots += [(name, pos, (7, x)) for name, pos, x in ATTACKING_MID_SLOTS[attacking]]
+    rows = [n for n in (holding, len(middle), attacking) if n]
+    return slots, rows
+
+
+def generate_shapes(defenders=(3, 5), midfielders=(2, 5), forwards=(1, 3)):
+    """
+    Enumerate every formation the slot library can build.
+
+    Args:
+        defenders (tuple): Inclusive (min, max) number of defenders
+        midfielders (tuple): Inclusive (min, max) number of midfielders
+        forwards (tuple): Inclusive (min, max) number of forwards
+
+    Returns:
+        list: Formation objects with one GK and ten outfield slots
+    """
+    shapes = []
+    names = Counter()
+    midfield_groups = itertools.product(HOLDING_SLOTS, CENTRAL_SLOTS, WIDE_SLOTS, ATTACKING_MID_SLOTS)
+
+    for holding, central, wide, attacking in midfield_groups:
+        mid_count = holding + central + wide + attacking
+        if not midfielders[0] <= mid_count <= midfielders[1]:
+            continue
+        mid_slots, mid_rows = _midfield_slots(holding, central, wide, attacking)
+
+        for def_count, def_slots in DEFENSE_SLOTS.items():
+            if not defenders[0] <= def_count <= defenders[1]:
+                continue
+            for fwd_count, fwd_slots in FORWARD_SLOTS.items():
+                if not forwards[0] <= fwd_count <= forwards[1]:
+                    continue
+                if def_count + mid_count + fwd_count != 10:
+                    continue
+
+                slots = fwd_slots + mid_slots[::-1] + def_slots + GOALKEEPER_SLOTS
+                name = "-".join(str(n) for n in [def_count] + mid_rows + [fwd_count])
+                names[name] += 1
+                if names[name] > 1:
+                    name = f"{name} v{names[name]}"
+
+                mapping = {slot: pos for slot, pos, _ in slots}
+                layout = {slot: coords for slot, _, coords in slots}
+                shapes.append(Formation(name, mapping, layout))
+    return shapes
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+class ShapeSearchResult:
+    """Top formations found by search_formations"""
+
+    def __init__(self):
+        self.top = []         # (Formation, lineup, score), best first
+        self.evaluated = 0    # Shapes scored with the assignment solver
+        self.pruned = 0       # Shapes skipped because their bound couldn't beat the top list
+        self.complete = True  # False if the time budget ran out
+
+    def __repr__(self):
+        return (f"ShapeSearchResult(top={len(self.top)}, evaluated={self.evaluated}, "
+                f"pruned={self.pruned}, complete={self.complete})")
+
+
+def shape_upper_bound(formation, sorted_ratings):
+    """
+    Best score a formation could reach: for every position it uses k times,
+    the k best ratings any selected player has there.
+    """
+    bound = 0.0
+    for pos, count in Counter(formation.positions).items():
+        bound += sorted_ratings[:count, POSITION_INDEX[pos]].sum()
+    return bound
+
+
+def score_formation(formation, ratings, player_names):
+    """
+    Solve the slot assignment for one formation.
+
+    Returns:
+        (lineup, score) where lineup maps slots to (player, rating); slots
+        nobody is rated for are filled by "AI"
+    """
+    slot_ratings = ratings[:, formation.slot_index].T
+    rows, cols = linear_sum_assignment(slot_ratings, maximize=True)
+
+    lineup = {slot: ("AI", 0.0) for slot in formation.slots}
+    score = 0.0
+    for i, j in zip(rows, cols):
+        rating = float(slot_ratings[i, j])
+        if rating > 0:
+            lineup[formation.slots[i]] = (player_names[j], rating)
+            score += rating
+    return lineup, score
+
+
+def search_formations(team, players_selected, top_n=5, time_budget=1.0, shapes=None,
+                      progress=None, cancel=None):
+    """
+    Find the best formations for the selected players.
+
+    Shapes are scored in order of their upper bound, so once a shape's bound
+    can't beat the current top_n every remaining shape is pruned.
+
+    Args:
+        team (Team): Team holding the players
+        players_selected (list): Player names to pick from
+        top_n (int): Number of formations to return
+        time_budget (float): Seconds to search before returning the best found so far
+        shapes (list): Formations to consider; defaults to generate_shapes()
+        progress (callable): Called with (shapes done, total shapes)
+        cancel (threading.Event): Stop early when set, like running out of time
+
+    Returns:
+        ShapeSearchResult
+    """
+    deadline = time.perf_counter() + time_budget
+    players = team.selected_players(players_selected)
+    player_names = [player.name for player in players]
+    ratings = team.lineup_matrix(players)
+    # Per-position ratings, best first, padded so every position has 11 entries
+    sorted_ratings = -np.sort(-np.vstack([ratings, np.zeros((11, ratings.shape[1]))]), axis=0)
+
+    if shapes is None:
+        shapes = generate_shapes()
+    bounded = sorted(((shape_upper_bound(shape, sorted_ratings), i, shape)
+                      for i, shape in enumerate(shapes)), key=lambda x: (-x[0], x[1]))
+
+    result = ShapeSearchResult()
+    for index, (bound, _, shape) in enumerate(bounded):
+        if len(result.top) >= top_n and bound <= result.top[-1][2]:
+            result.pruned = len(bounded) - index
+            break
+        if time.perf_counter() > deadline or (cancel and cancel.is_set()):
+            result.complete = False
+            break
+
+        lineup, score = score_formation(shape, ratings, player_names)
+        result.evaluated += 1
+        result.top.append((shape, lineup, score))
+        result.top.sort(key=lambda x: x[2], reverse=True)
+        del result.top[top_n:]
+        if progress:
+            progress(index + 1, len(bounded))
+
+    return result
@@ -1,3 +1,536 @@
+# Formations.py
+import json
+import numpy as np
+
+POSITIONS = ["GK", "LB", "CB", "RB", "CDM", "CM", "LM", "RM", "CAM", "LW", "RW", "ST"]
+POSITION_INDEX = {pos: i for i, pos in enumerate(POSITIONS)}
+
+# Pitch size used by the lineup view (rows, columns)
+PITCH_HEIGHT = 25
+PITCH_WIDTH = 75
+
+# Field area codes stored per formation slot
+AREAS = ["goalkeeper", "defense", "midfield", "attack"]
+AREA_GOALKEEPER, AREA_DEFENSE, AREA_MIDFIELD, AREA_ATTACK = range(len(AREAS))
+
+POSITION_AREAS = {
+    "GK": AREA_GOALKEEPER,
+    "LB": AREA_DEFENSE, "CB": AREA_DEFENSE, "RB": AREA_DEFENSE,
+    "CDM": AREA_MIDFIELD, "CM": AREA_MIDFIELD, "LM": AREA_MIDFIELD, "RM": AREA_MIDFIELD,
+    "CAM": AREA_ATTACK, "LW": AREA_ATTACK, "RW": AREA_ATTACK, "ST": AREA_ATTACK,
+}
+# Area code of every entry in POSITIONS, for indexing rating matrices
+POSITION_AREA_CODES = np.array([POSITION_AREAS[pos] for pos in POSITIONS], dtype=np.int8)
+
+# Side flags stored per formation slot
+SIDE_LEFT, SIDE_CENTER, SIDE_RIGHT = -1, 0, 1
+
+# Slot pairs whose players may be swapped to match their preferred side
+SIDE_PAIRS = [
+    # Midfield pairs
+    ('LCM', 'RCM'), ('LM', 'RM'),
+    # Defensive pairs
+    ('LB', 'RB'), ('LCB', 'RCB'),
+    # Attacking pairs
+    ('LW', 'RW')
+]
+
+# ---------------------------------------------------------------------------
+# Formation Layouts and Configurations
+# ---------------------------------------------------------------------------
+
+# Define available formations and their positions with improved spacing
+# POS: (x going down, y going right)
+FORMATION_LAYOUTS = {
+    "4-3-3 attacking": {
+        "ST": (3, 35),
+        "LW": (3, 15),
+        "RW": (3, 55),
+        "CAM": (7, 35),
+        "LCM": (11, 20),
+        "RCM": (11, 50),
+        "LB": (18, 10),
+        "LCB": (18, 28),
+        "RCB": (18, 42),
+        "RB": (18, 65),
+        "GK": (23, 36)
+    },
+    "4-3-3 defending": {
+        "ST": (3, 35),
+        "LW": (3, 15),
+        "RW": (3, 55),
+        "LCM": (9, 20),
+        "RCM": (9, 50),
+        "CDM": (11, 35),
+        "LB": (18, 10),
+        "LCB": (18, 28),
+        "RCB": (18, 42),
+        "RB": (18, 65),
+        "GK": (23, 36)
+    },
+    "4-3-1-2": {
+        "ST1": (3, 25),
+        "ST2": (3, 45),
+        "CAM": (7, 35),
+        "LCM": (11, 20),
+        "CM": (11, 35),
+        "RCM": (11, 50),
+        "LB": (18, 10),
+        "LCB": (18, 28),
+        "RCB": (18, 42),
+        "RB": (18, 65),
+        "GK": (23, 36)
+    },
+    "4-2-3-1": {
+        "ST": (3, 35),
+        "LAM": (7, 15),
+        "CAM": (7, 35),
+        "RAM": (7, 55),
+        "CDM1": (11, 25),
+        "CDM2": (11, 45),
+        "LB": (18, 10),
+        "LCB": (18, 28),
+        "RCB": (18, 42),
+        "RB": (18, 65),
+        "GK": (23, 36)
+    },
+    "5-2-1-2": {
+        "ST1": (3, 25),
+        "ST2": (3, 45),
+        "CAM": (7, 35),
+        "CM1": (11, 25),
+        "CM2": (11, 45),
+        "LWB": (18, 8),
+        "LCB": (18, 25),
+        "CB": (18, 36),
+        "RCB": (18, 48),
+        "RWB": (18, 67),
+        "GK": (23, 36)
+    },
+    "4-4-2": {
+        "ST1": (3, 25),
+        "ST2": (3, 45),
+        "LM": (9, 10),
+        "LCM": (9, 25), 
+        "RCM": (9, 45),
+        "RM": (9, 60),
+        "LB": (18, 10),
+        "LCB": (18, 28),
+        "RCB": (18, 42),
+        "RB": (18, 65),
+        "GK": (23, 36)
+    },
+    "4-4-2 diamond": {
+        "ST1": (3, 25),
+        "ST2": (3, 45),
+        "CAM": (7, 35),
+        "LCM": (10, 25),
+        "RCM": (10, 45),
+        "CDM": (13, 35),
+        "LB": (18, 10),
+        "LCB": (18, 28),
+        "RCB": (18, 42),
+        "RB": (18, 65),
+        "GK": (23, 36)
+    },
+    "3-5-2": {
+        "ST1": (3, 25),
+        "ST2": (3, 45),
+        "LM": (9, 5),
+        "LCM": (9, 25),
+        "CM": (9, 35),
+        "RCM": (9, 45),
+        "RM": (9, 65),
+        "LCB": (18, 25),
+        "CB": (18, 36),
+        "RCB": (18, 48),
+        "GK": (23, 36)
+    },
+    "5-3-2": {
+        "ST1": (3, 25),
+        "ST2": (3, 45),
+        "LCM": (9, 25),
+        "CM": (9, 35),
+        "RCM": (9, 45),
+        "LWB": (15, 8),
+        "LCB": (18, 25),
+        "CB": (18, 36),
+        "RCB": (18, 48),
+        "RWB": (15, 67),
+        "GK": (23, 36)
+    },
+    "4-1-4-1": {
+        "ST": (3, 35),
+        "LM": (7, 10),
+        "LCM": (7, 25),
+        "RCM": (7, 45),
+        "RM": (7, 60),
+        "CDM": (11, 35),
+        "LB": (18, 10),
+        "LCB": (18, 28),
+        "RCB": (18, 42),
+        "RB": (18, 65),
+        "GK": (23, 36)
+    },
+    "3-4-3": {
+        "ST": (3, 35),
+        "LW": (3, 15),
+        "RW": (3, 55),
+        "LM": (9, 10),
+        "LCM": (9, 25),
+        "RCM": (9, 45),
+        "RM": (9, 60),
+        "LCB": (18, 25),
+        "CB": (18, 36),
+        "RCB": (18, 48),
+        "GK": (23, 36)
+    },
+    "4-5-1": {
+        "ST": (3, 35),
+        "LM": (8, 10),
+        "LCM": (8, 25),
+        "CM": (8, 35),
+        "RCM": (8, 45),
+        "RM": (8, 60),
+        "LB": (18, 10),
+        "LCB": (18, 28),
+        "RCB": (18, 42),
+        "RB": (18, 65),
+        "GK": (23, 36)
+    }
+}
+
+# Update the formation mapping in Team class
+FORMATION_POSITIONS = {
+    "4-3-3 attacking": {
+        "ST": "ST",
+        "LW": "LW",
+        "RW": "RW",
+        "CAM": "CAM",
+        "LCM": "CM",
+        "RCM": "CM",
+        "LB": "LB",
+        "LCB": "CB",
+        "RCB": "CB",
+        "RB": "RB",
+        "GK": "GK"
+    },
+    "4-3-3 defending": {
+        "ST": "ST",
+        "LW": "LW",
+        "RW": "RW",
+        "LCM": "CM",
+        "RCM": "CM",
+        "CDM": "CDM",
+        "LB": "LB",
+        "LCB": "CB",
+        "RCB": "CB",
+        "RB": "RB",
+        "GK": "GK"
+    },
+    "4-3-1-2": {
+        "ST1": "ST",
+        "ST2": "ST",
+        "CAM": "CAM",
+        "LCM": "CM",
+        "CM": "CM",
+        "RCM": "CM",
+        "LB": "LB",
+        "LCB": "CB",
+        "RCB": "CB",
+        "RB": "RB",
+        "GK": "GK"
+    },
+    "4-2-3-1": {
+        "ST": "ST",
+        "LAM": "CAM",
+        "CAM": "CAM",
+        "RAM": "CAM",
+        "CDM1": "CDM",
+        "CDM2": "CDM",
+        "LB": "LB",
+        "LCB": "CB",
+        "RCB": "CB",
+        "RB": "RB",
+        "GK": "GK"
+    },
+    "5-2-1-2": {
+        "ST1": "ST",
+        "ST2": "ST",
+        "CAM": "CAM",
+        "CM1": "CM",
+        "CM2": "CM",
+        "LWB": "LB",
+        "LCB": "CB",
+        "CB": "CB",
+        "RCB": "CB",
+        "RWB": "RB",
+        "GK": "GK"
+    },
+    "4-4-2": {
+        "ST1": "ST",
+        "ST2": "ST",
+        "LM": "LM",
+        "LCM": "CM",
+        "RCM": "CM",
+        "RM": "RM",
+        "LB": "LB",
+        "LCB": "CB",
+        "RCB": "CB",
+        "RB": "RB",
+        "GK": "GK"
+    },
+    "4-4-2 diamond": {
+        "ST1": "ST",
+        "ST2": "ST",
+        "CAM": "CAM",
+        "LCM": "CM",
+        "RCM": "CM",
+        "CDM": "CDM",
+        "LB": "LB",
+        "LCB": "CB",
+        "RCB": "CB",
+        "RB": "RB",
+        "GK": "GK"
+    },
+    "3-5-2": {
+        "ST1": "ST",
+        "ST2": "ST",
+        "LM": "LM",
+        "LCM": "CM",
+        "CM": "CM",
+        "RCM": "CM",
+        "RM": "RM",
+        "LCB": "CB",
+        "CB": "CB",
+        "RCB": "CB",
+        "GK": "GK"
+    },
+    "5-3-2": {
+        "ST1": "ST",
+        "ST2": "ST",
+        "LCM": "CM",
+        "CM": "CM",
+        "RCM": "CM",
+        "LWB": "LB",
+        "LCB": "CB",
+        "CB": "CB",
+        "RCB": "CB",
+        "RWB": "RB",
+        "GK": "GK"
+    },
+    "4-1-4-1": {
+        "ST": "ST",
+        "LM": "LM",
+        "LCM": "CM",
+        "RCM": "CM",
+        "RM": "RM",
+        "CDM": "CDM",
+        "LB": "LB",
+        "LCB": "CB",
+        "RCB": "CB",
+        "RB": "RB",
+        "GK": "GK"
+    },
+    "3-4-3": {
+        "ST": "ST",
+        "LW": "LW",
+        "RW": "RW",
+        "LM": "LM",
+        "LCM": "CM",
+        "RCM": "CM",
+        "RM": "RM",
+        "LCB": "CB",
+        "CB": "CB",
+        "RCB": "CB",
+        "GK": "GK"
+    },
+    "4-5-1": {
+        "ST": "ST",
+        "LM": "LM",
+        "LCM": "CM",
+        "CM": "CM",
+        "RCM": "CM",
+        "RM": "RM",
+        "LB": "LB",
+        "LCB": "CB",
+        "RCB": "CB",
+        "RB": "RB",
+        "GK": "GK"
+    }
+}
+
+
+# ---------------------------------------------------------------------------
+# Compiled Formation Registry
+# ---------------------------------------------------------------------------
+
+class Formation:
+    """
+    A formation compiled into index arrays so the optimizers can slice rating
+    matrices directly instead of matching slot names.
+
+    Attributes:
+        name (str): Formation name (e.g., "4-3-3 attacking")
+        slots (tuple): Slot names in mapping order (e.g., "LCB", "ST1")
+        positions (tuple): Actual position played in each slot
+        slot_index (np.ndarray): POSITIONS index of each slot
+        areas (np.ndarray): Area code of each slot (see AREAS)
+        sides (np.ndarray): SIDE_LEFT / SIDE_CENTER / SIDE_RIGHT for each slot
+        coords (np.ndarray): (row, column) of each slot on the pitch
+        named_positions (np.ndarray): True for slots named exactly like a position
+        side_pairs (list): (left slot index, right slot index) pairs from SIDE_PAIRS
+    """
+
+    def __init__(self, name, position_mapping, layout=None):
+        self.name = name
+        self.mapping = dict(position_mapping)
+        self.layout = dict(layout) if layout else {}
+        self.slots = tuple(self.mapping)
+        self.positions = tuple(self.mapping.values())
+
+        self.slot_index = np.array([POSITION_INDEX[pos] for pos in self.positions], dtype=np.intp)
+        self.areas = np.array([POSITION_AREAS[pos] for pos in self.positions], dtype=np.int8)
+        self.sides = np.array([_slot_side(slot) for slot in self.slots], dtype=np.int8)
+        self.coords = np.array([self.layout.get(slot, (-1, -1)) for slot in self.slots],
+                               dtype=np.int16).reshape(-1, 2)
+        self.named_positions = np.array([slot in POSITION_INDEX for slot in self.slots], dtype=bool)
+
+        slot_lookup = {slot: i for i, slot in enumerate(self.slots)}
+        self.side_pairs = [(slot_lookup[left], slot_lookup[right]) for left, right in SIDE_PAIRS
+                           if left in slot_lookup and right in slot_lookup]
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __repr__(self):
+        return f"Formation({self.name!r}, slots={len(self.slots)})"
+
+
+def _slot_side(slot):
+    """Side of a slot from its name (LCB -> left, RWB -> right, ST1 -> center)"""
+    if slot[0] == 'L':
+        return SIDE_LEFT
+    if slot[0] == 'R':
+        return SIDE_RIGHT
+    return SIDE_CENTER
+
+
+def validate_formation(name, position_mapping, layout=None):
+    """
+    Check that a formation is usable by the optimizers and the pitch view.
+    Raises ValueError describing the first problem found.
+    """
+    if not position_mapping:
+        raise ValueError(f"Formation {name!r} has no slots")
+    if len(position_mapping) != 11:
+        raise ValueError(f"Formation {name!r} has {len(position_mapping)} slots, expected 11")
+
+    for slot, pos in position_mapping.items():
+        if not isinstance(slot, str) or not slot:
+            raise ValueError(f"Formation {name!r} has an invalid slot name: {slot!r}")
+        if pos not in POSITION_INDEX:
+            raise ValueError(f"Formation {name!r}: slot {slot} uses invalid position {pos!r}")
+
+    goalkeepers = [slot for slot, pos in position_mapping.items() if pos == "GK"]
+    if len(goalkeepers) != 1:
+        raise ValueError(f"Formation {name!r} needs exactly one GK slot, found {len(goalkeepers)}")
+
+    if layout is not None:
+        missing = [slot for slot in position_mapping if slot not in layout]
+        if missing:
+            raise ValueError(f"Formation {name!r} has no coordinates for: {', '.join(missing)}")
+        for slot, coords in layout.items():
+            try:
+                y, x = coords
+            except (TypeError, ValueError):
+                raise ValueError(f"Formation {name!r}: slot {slot} coordinates must be [row, column]")
+            if not (isinstance(y, int) and isinstance(x, int)
+                    and 0 <= y < PITCH_HEIGHT and 0 <= x < PITCH_WIDTH):
+                raise ValueError(f"Formation {name!r}: slot {slot} coordinates {coords} are off the pitch")
+
+
+def register_formation(name, position_mapping, layout):
+    """Validate, compile and add a formation to the registry and the layout tables"""
+    validate_formation(name, position_mapping, layout)
+    layout = {slot: tuple(coords) for slot, coords in layout.items()}
+    FORMATION_POSITIONS[name] = dict(position_mapping)
+    FORMATION_LAYOUTS[name] = layout
+    FORMATIONS[name] = Formation(name, position_mapping, layout)
+    return FORMATIONS[name]
+
+
+def load_formations(path):
+    """
+    Load user-defined formations from a JSON file and register them.
+
+    The file maps formation names to slots, each with the position played and
+    its pitch coordinates:
+
+        {"3-4-2-1": {"GK": {"position": "GK", "coords": [23, 36]}, ...}}
+
+    Every formation is validated before any of them is registered.
+
+    Returns:
+        list: Names of the formations that were loaded
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("Formations file must contain an object of formations")
+
+    parsed = []
+    for name, slots in data.items():
+        if not isinstance(slots, dict):
+            raise ValueError(f"Formation {name!r} must map slot names to slot definitions")
+        position_mapping = {}
+        layout = {}
+        for slot, spec in slots.items():
+            if not isinstance(spec, dict) or 'position' not in spec or 'coords' not in spec:
+                raise ValueError(f"Formation {name!r}: slot {slot} needs 'position' and 'coords'")
+            position_mapping[slot] = spec['position']
+            layout[slot] = spec['coords']
+        validate_formation(name, position_mapping, layout)
+        parsed.append((name, position_mapping, layout))
+
+    for name, position_mapping, layout in parsed:
+        register_formation(name, position_mapping, layout)
+    return [name for name, _, _ in parsed]
+
+
+# Compiled once at import; custom formations are added by load_formations
+FORMATIONS = {
+    name: Formation(name, FORMATION_POSITIONS[name], FORMATION_LAYOUTS.get(name))
+    for name in FORMATION_POSITIONS
+}
+# Formations compiled on the fly for mappings that aren't registered
+_ADHOC_FORMATIONS = {}
+
+
+def get_formation(name, position_mapping=None):
+    """
+    Return the compiled formation for a name and slot mapping.
+
+    Registered formations are returned directly; any other mapping is compiled
+    once and cached, so callers can keep passing plain position_mapping dicts.
+    """
+    formation = FORMATIONS.get(name)
+    if formation is not None and (position_mapping is None or formation.mapping == position_mapping):
+        return formation
+    if position_mapping is None:
+        raise ValueError(f"Unknown formation: {name}")
+
+    key = (name, tuple(position_mapping.items()))
+    formation = _ADHOC_FORMATIONS.get(key)
+    if formation is None:
+        formation = _ADHOC_FORMATIONS[key] = Formation(name, position_mapping)
+    return formation
+
+
+# ---------------------------------------------------------------------------
+# Pitch Preview
+# ---------------------------------------------------------------------------
+
 def draw_side_view_pitch():
     # Define pitch dimensions
     width = 75  # Width of the pitch (side-to-side)
@@ -63,8 +596,9 @@ def draw_side_view_pitch():
     for row in pitch:
         print(''.join(row))
 
-# Call the function to draw the side view pitch
-draw_side_view_pitch()
+if __name__ == "__main__":
+    # Draw the side view pitch
+    draw_side_view_pitch()
 
 
 # player 1 ST: 5 CAM: 5 CM: 5
@@ -0,0 +1,201 @@
+# Instrumentation.py
+"""
+Opt-in timing of hot paths.
+
+Instrumentation is off by default and costs a single flag check per call.
+Turn it on with LINEUP_PROFILE=1 in the environment or by calling enable();
+either way a report is printed on exit, or written as JSON to
+LINEUP_PROFILE_FILE. Recording is thread-safe.
+
+    @instrumented
+    def get_best_lineup(self, players_selected, formation): ...
+
+    with timed("get_best_lineup.solve"):
+        linear_sum_assignment(cost_matrix)
+"""
+import atexit
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+# Latency histogram buckets are powers of two in microseconds: <1us, <2us, <4us, ...
+HISTOGRAM_BUCKETS = 32
+
+_enabled = False
+_stats = {}
+# Instrumented methods also run on worker threads (see Solve_Tasks)
+_lock = threading.Lock()
+_exit_report_registered = False
+
+
+class TimingStat:
+    """Call count, total time and latency histogram of one instrumented name"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        micros = seconds * 1e6
+        bucket = 0 if micros < 1 else min(HISTOGRAM_BUCKETS - 1, int(math.log2(micros)) + 1)
+        self.buckets[bucket] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the histogram bucket holding the given fraction of calls, in seconds"""
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(2 ** bucket / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            # Bucket i counts calls faster than 2**i microseconds
+            'histogram': {f"<{2 ** i}us": n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+def enable():
+    """Start recording; the report is printed (or written) when the program exits"""
+    global _enabled, _exit_report_registered
+    _enabled = True
+    with _lock:
+        if not _exit_report_registered:
+            atexit.register(_report_at_exit)
+            _exit_report_registered = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forget every recorded timing"""
+    with _lock:
+        _stats.clear()
+
+
+def record(name, seconds):
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = TimingStat(name)
+        stat.record(seconds)
+
+
+def instrumented(func=None, name=None):
+    """
+    Decorator timing every call of a function while instrumentation is enabled.
+    Use as @instrumented or @instrumented(name="custom.name").
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name)
+    label = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(label, time.perf_counter() - start)
+    return wrapper
+
+
+class timed:
+    """Context manager timing a block while instrumentation is enabled"""
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if _enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            record(self.name, time.perf_counter() - self.start)
+            self.start = None
+        return False
+
+
+def timing_report():
+    """Recorded timings as dicts, most total time first"""
+    with _lock:
+        stats = [stat.to_dict() for stat in _stats.values()]
+    return sorted(stats, key=lambda s: s['total'], reverse=True)
+
+
+def _format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.2f}s"
+
+
+def format_report():
+    """Timing summary as a printable table"""
+    from tabulate import tabulate
+
+    rows = [[s['name'], s['count'], _format_seconds(s['total']), _format_seconds(s['mean']),
+             _format_seconds(s['p50']), _format_seconds(s['p95']), _format_seconds(s['max'])]
+            for s in timing_report()]
+    if not rows:
+        return "No timings recorded." if _enabled else "Instrumentation is disabled (set LINEUP_PROFILE=1)."
+    return tabulate(rows, headers=['Name', 'Calls', 'Total', 'Mean', 'p50', 'p95', 'Max'], tablefmt='grid')
+
+
+def dump_report(path):
+    """Write the timing report as JSON"""
+    with open(path, 'w') as f:
+        json.dump(timing_report(), f, indent=4)
+
+
+def _report_at_exit():
+    if not _stats:
+        return
+    path = os.environ.get("LINEUP_PROFILE_FILE")
+    if path:
+        dump_report(path)
+    else:
+        print("\n=== Timing Report ===", file=sys.stderr)
+        print(format_report(), file=sys.stderr)
+
+
+if os.environ.get("LINEUP_PROFILE", "") not in ("", "0"):
+    enable()
@@ -0,0 +1,251 @@
+# Lineup_Analysis.py
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from Formations import FORMATION_POSITIONS, get_formation
+from Instrumentation import instrumented
+
+
+class LineupSensitivity:
+    """
+    How close every player was to every slot of a best lineup.
+
+    Attributes:
+        slots (list): Formation slots, one row each
+        players (list): Player names, one column each
+        ratings (np.ndarray): Slot x player rating, NaN where the player is unrated
+        starters (list): Player name assigned to each slot
+        required (np.ndarray): Slot x player rating at which the player would take
+            the slot (for the starter: the rating they can drop to and keep it);
+            inf if no rating would do it
+        margin (np.ndarray): required - rating. Positive: the rise a player needs to
+            start there; zero or negative for the starter, whose cushion is -margin
+        slot_duals, player_duals (np.ndarray): Optimal dual potentials of the assignment
+        reduced_costs (np.ndarray): Slot x player reduced costs, a lower bound on the
+            weighted cost of forcing each pair
+    """
+
+    def __init__(self, slots, players, ratings, starters, required, slot_duals, player_duals, reduced_costs):
+        self.slots = slots
+        self.players = players
+        self.ratings = ratings
+        self.starters = starters
+        self.required = required
+        self.margin = required - np.nan_to_num(ratings, nan=0.0)
+        self.slot_duals = slot_duals
+        self.player_duals = player_duals
+        self.reduced_costs = reduced_costs
+
+    def margin_for(self, player_name, slot):
+        """Rating change needed for a player to take a slot (see margin)"""
+        return float(self.margin[self.slots.index(slot), self.players.index(player_name)])
+
+    def closest_challengers(self, slot, limit=3):
+        """(player name, margin) of the non-starters closest to a slot"""
+        row = self.slots.index(slot)
+        order = np.argsort(self.margin[row], kind='stable')
+        challengers = [(self.players[j], float(self.margin[row, j])) for j in order
+                       if self.players[j] != self.starters[row] and np.isfinite(self.margin[row, j])]
+        return challengers[:limit]
+
+    def margin_table(self, limit=3):
+        """
+        Rows of [slot, starter, cushion, challenger (+margin), ...] for display.
+
+        Args:
+            limit (int): Challengers shown per slot
+        """
+        rows = []
+        for row, slot in enumerate(self.slots):
+            starter = self.starters[row]
+            cushion = -self.margin[row, self.players.index(starter)]
+            challengers = [f"{name} (+{margin:.1f})" for name, margin in self.closest_challengers(slot, limit)]
+            challengers += [""] * (limit - len(challengers))
+            cushion_display = f"{cushion:.1f}" if np.isfinite(cushion) else "-"
+            rows.append([slot, starter, cushion_display] + challengers)
+        return rows
+
+
+def _all_pairs_shortest_paths(weights):
+    """Floyd-Warshall over a small dense matrix (np.inf for missing arcs)"""
+    distances = weights.copy()
+    for k in range(len(distances)):
+        np.minimum(distances, distances[:, k:k + 1] + distances[k:k + 1, :], out=distances)
+    return distances
+
+
+def _residual_paths(costs, slot_player, player_slot):
+    """
+    Shortest paths in the residual graph of an optimal slot assignment.
+
+    The graph has a node per slot plus one bench node (index len(slots)):
+        slot t -> slot u: t takes u's player, so u has to be refilled
+        slot t -> bench:  t takes its best bench player
+        bench -> slot u:  u's player is dropped to the bench
+    Optimality means there are no negative cycles.
+    """
+    n_slots = len(slot_player)
+    current = costs[np.arange(n_slots), slot_player]
+    bench = player_slot < 0
+    graph = np.full((n_slots + 1, n_slots + 1), np.inf)
+    graph[:n_slots, :n_slots] = costs[:, slot_player] - current[:, None]
+    if bench.any():
+        graph[:n_slots, n_slots] = (costs[:, bench] - current[:, None]).min(axis=1)
+    graph[n_slots, :] = 0.0
+    np.fill_diagonal(graph, 0.0)
+    return _all_pairs_shortest_paths(graph)
+
+
+def _solve(costs):
+    """Optimal assignment as (slot -> player, player -> slot or -1) arrays"""
+    rows, assigned = linear_sum_assignment(costs)
+    slot_player = np.empty(costs.shape[0], dtype=np.int64)
+    slot_player[rows] = assigned
+    player_slot = np.full(costs.shape[1], -1, dtype=np.int64)
+    player_slot[slot_player] = np.arange(costs.shape[0])
+    return slot_player, player_slot
+
+
+@instrumented
+def lineup_sensitivity(team, players_selected, formation, position_mapping):
+    """
+    Sensitivity of the assignment behind Team.get_best_lineup, from one solve.
+
+    Forcing a player j into slot i moves the starter of i out and, if j was
+    starting elsewhere, leaves that slot to be refilled by a chain of moves
+    ending at a bench player or at i's old starter. The cheapest chain is a
+    shortest path in the residual graph of the optimal assignment, which has
+    no negative cycles, so all-pairs shortest paths between the slots give
+    the exact cost of every forced pair at once, without re-solving. The same
+    distances yield the dual potentials and reduced costs of the assignment.
+
+    Slots are weighted like get_best_lineup (slots named after their position
+    count double), and the analysis describes the assignment before its
+    left/right side swaps.
+
+    Returns:
+        LineupSensitivity
+    """
+    players = team.selected_players(players_selected)
+    compiled = get_formation(formation, position_mapping)
+    ratings = team.lineup_matrix(players)[:, compiled.slot_index].T
+
+    slots = list(compiled.slots)
+    weights = np.ones(len(slots))
+    weights[compiled.named_positions] = 2
+    if len(slots) > len(players):
+        slots, ratings, weights = slots[:len(players)], ratings[:len(players)], weights[:len(players)]
+    costs = np.where(ratings > 0, -ratings * weights[:, None], np.inf)
+
+    n_slots, n_players = costs.shape
+    slot_player, player_slot = _solve(costs)
+    current = costs[np.arange(n_slots), slot_player]
+    paths = _residual_paths(costs, slot_player, player_slot)
+    bench = player_slot < 0
+
+    # Forcing (i, j) frees i's starter and leaves j's slot (or j's bench place)
+    # to be refilled; the cheapest way is a shortest path from there to i
+    sources = np.where(bench, n_slots, player_slot)
+    chain = paths[sources][:, :n_slots].T
+
+    with np.errstate(invalid='ignore'):
+        required = (chain - current[:, None]) / weights[:, None]
+        forced_cost = np.where(np.isfinite(costs), costs - current[:, None] + chain, np.inf)
+    # A starter keeps the slot until the cheapest alternative costs nothing extra
+    for i in range(n_slots):
+        alternatives = np.delete(forced_cost[i], slot_player[i])
+        cushion = alternatives.min() / weights[i] if alternatives.size else np.inf
+        required[i, slot_player[i]] = max(ratings[i, slot_player[i]] - cushion, 0.0) if np.isfinite(cushion) else 0.0
+
+    # Dual potentials from the shortest path out of each slot: to the bench, or
+    # (with no bench) to any slot
+    potentials = paths[:n_slots, n_slots] if bench.any() else paths[:n_slots, :n_slots].min(axis=1)
+    slot_duals = current + potentials
+    player_duals = np.zeros(n_players)
+    player_duals[slot_player] = -potentials
+    with np.errstate(invalid='ignore'):
+        reduced_costs = costs - slot_duals[:, None] - player_duals[None, :]
+
+    player_names = [player.name for player in players]
+    return LineupSensitivity(
+        slots, player_names, np.where(ratings > 0, ratings, np.nan),
+        [player_names[j] for j in slot_player], required, slot_duals, player_duals, reduced_costs)
+
+
+class PlayerValues:
+    """
+    Leave-one-out value of every player in every formation.
+
+    Attributes:
+        players (list): Player names, one row each
+        formations (list): Formation names, one column each
+        base_scores (np.ndarray): Best lineup score of each formation with everyone
+        values (np.ndarray): Player x formation drop in the best score without the player
+    """
+
+    def __init__(self, players, formations, base_scores, values):
+        self.players = players
+        self.formations = formations
+        self.base_scores = base_scores
+        self.values = values
+
+    def value_of(self, player_name, formation):
+        return float(self.values[self.players.index(player_name), self.formations.index(formation)])
+
+    def table(self, formations=None):
+        """Rows of [player, value per formation..., mean], most valuable first"""
+        columns = [self.formations.index(f) for f in formations] if formations else range(len(self.formations))
+        columns = list(columns)
+        means = self.values[:, columns].mean(axis=1) if columns else np.zeros(len(self.players))
+        rows = []
+        for i in np.argsort(-means, kind='stable'):
+            rows.append([self.players[i]] + [f"{self.values[i, j]:.1f}" for j in columns] + [f"{means[i]:.2f}"])
+        return rows
+
+
+@instrumented
+def leave_one_out_values(team, players_selected, formations=None, progress=None, cancel=None):
+    """
+    How much each formation's best lineup score drops without each player.
+
+    Lineups are scored like the formation search: the plain sum of the
+    starters' ratings, with "AI" (rating 0) filling slots nobody can take.
+    Each formation is solved once. Removing a bench player changes nothing,
+    and removing a starter costs exactly the shortest path from their slot to
+    the bench in the residual graph of that solution (the cheapest chain of
+    moves that refills the slot), so every leave-one-out score comes from one
+    solve and one all-pairs shortest path run per formation.
+
+    Args:
+        formations (dict): Formation name -> position mapping; defaults to FORMATION_POSITIONS
+        progress (callable): Called with (formations done, total formations)
+        cancel (threading.Event): When set, stop and return the formations done so far
+
+    Returns:
+        PlayerValues
+    """
+    formations = FORMATION_POSITIONS if formations is None else formations
+    players = team.selected_players(players_selected)
+    ratings = team.lineup_matrix(players)
+    n_players = len(players)
+
+    base_scores = np.zeros(len(formations))
+    values = np.zeros((n_players, len(formations)))
+    done = 0
+    for column, (name, mapping) in enumerate(formations.items()):
+        if cancel and cancel.is_set():
+            break
+        compiled = get_formation(name, mapping)
+        n_slots = len(compiled.slots)
+        # One "AI" column per slot, rated 0 everywhere, so every slot can be filled
+        costs = np.zeros((n_slots, n_players + n_slots))
+        costs[:, :n_players] = -ratings[:, compiled.slot_index].T
+        slot_player, player_slot = _solve(costs)
+        paths = _residual_paths(costs, slot_player, player_slot)
+
+        base_scores[column] = -costs[np.arange(n_slots), slot_player].sum()
+        starters = np.nonzero(player_slot[:n_players] >= 0)[0]
+        values[starters, column] = paths[player_slot[starters], n_slots]
+        done += 1
+        if progress:
+            progress(done, len(formations))
+    return PlayerValues([p.name for p in players], list(formations)[:done], base_scores[:done], values[:, :done])
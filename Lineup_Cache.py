@@ -0,0 +1,118 @@
+# Lineup_Cache.py
+import hashlib
+import json
+import os
+import numpy as np
+from Instrumentation import instrumented
+
+# Bump when a lineup strategy changes its results, so old entries are never served
+SOLVER_VERSION = 2
+# Entries kept before the least recently used ones are evicted
+MAX_ENTRIES = 500
+
+
+class LineupCache:
+    """
+    Content-addressed on-disk cache of solved lineups.
+
+    An entry's key is a hash of everything the result depends on: the solver
+    version, the strategy, the formation's slot -> position mapping, the
+    min/max aggregate ratings of the selected players in selection order and
+    the out-of-position compatibility matrix (see Position_Compatibility). Any
+    rating change gives a new key, so entries never go stale and the cache
+    can be shared by every process or machine using the same data file.
+
+    Each entry is one JSON file written atomically; reading an entry touches
+    its modification time, and once more than max_entries exist the least
+    recently used ones are deleted.
+    """
+
+    def __init__(self, directory, max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (team revision, selection) -> digest of the selection's ratings, so
+        # keys for many formations of one selection hash the ratings once
+        self._ratings_digest = (None, None)
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def for_data_file(cls, filename, max_entries=MAX_ENTRIES):
+        """Cache directory next to a players data file"""
+        return cls(os.path.splitext(filename)[0] + "_lineup_cache", max_entries)
+
+    def _selection_digest(self, team, players_selected):
+        """Hash of the selected players' names, min/max ratings and compatibility matrix"""
+        memo_key = (id(team), team.revision, tuple(players_selected))
+        if self._ratings_digest[0] == memo_key:
+            return self._ratings_digest[1]
+        players = team.selected_players(players_selected)
+        digest = hashlib.sha256(json.dumps([player.name for player in players]).encode('utf-8'))
+        for field in ('min', 'max'):
+            digest.update(np.ascontiguousarray(team.rating_matrix(players, field), dtype='<f8').tobytes())
+        if team.out_of_position:
+            digest.update(np.ascontiguousarray(team.compatibility, dtype='<f8').tobytes())
+        self._ratings_digest = (memo_key, digest.hexdigest())
+        return self._ratings_digest[1]
+
+    def key(self, team, strategy, players_selected, formation, position_mapping):
+        header = {'version': SOLVER_VERSION, 'strategy': strategy, 'formation': formation,
+                  'mapping': sorted(position_mapping.items()),
+                  'players': self._selection_digest(team, players_selected)}
+        return hashlib.sha256(json.dumps(header, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """The cached lineup for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {slot: (player, rating) for slot, (player, rating) in data['lineup'].items()}
+
+    def put(self, key, lineup):
+        path = self._path(key)
+        temp_path = f"{path}.tmp{os.getpid()}"
+        data = {'lineup': {slot: [player, float(rating)] for slot, (player, rating) in lineup.items()}}
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries beyond max_entries"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                # Another process evicted it first
+                pass
+
+    @instrumented(name="LineupCache.get_or_solve")
+    def get_or_solve(self, team, strategy, players_selected, formation, position_mapping):
+        """Serve a lineup from disk, solving and storing it on a miss"""
+        key = self.key(team, strategy, players_selected, formation, position_mapping)
+        lineup = self.get(key)
+        if lineup is None:
+            lineup = getattr(team, strategy)(players_selected, formation, position_mapping)
+            self.put(key, lineup)
+        return lineup
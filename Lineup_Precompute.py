@@ -0,0 +1,112 @@
+# Lineup_Precompute.py
+import threading
+from Formations import FORMATION_POSITIONS
+from Player_Stats import LINEUP_STRATEGIES
+from Instrumentation import instrumented
+
+
+class LineupPrecomputer:
+    """
+    Solve every lineup strategy for every formation with all players in a
+    background thread, so "View best lineup" with 'ALL' is served instantly.
+
+    Results are tagged with the team revision they were computed from and are
+    only returned while the team is still at that revision. Call schedule()
+    after anything that may change ratings; it does nothing when the results
+    (or a running computation) are already current.
+
+    With a LineupCache, lineups solved in earlier sessions are read from disk
+    instead of being solved again.
+
+    Each lineup is solved holding the team lock, so votes applied meanwhile
+    wait for the current solve (a few milliseconds) and are never seen half
+    done; once the revision moves on, the rest of the computation is skipped.
+    """
+
+    def __init__(self, team, cache=None):
+        self.team = team
+        self.cache = cache
+        self.results = {}  # (strategy, formation) -> (position mapping, lineup)
+        self.revision = None  # Team revision of self.results
+        self.players = ()  # Player names the results were computed with
+        self._lock = threading.Lock()
+        self._thread = None
+        self._target_revision = None
+
+    def schedule(self):
+        """Start a background computation if the results are out of date"""
+        revision = self.team.revision
+        with self._lock:
+            if revision in (self.revision, self._target_revision):
+                return
+            self._target_revision = revision
+        self._thread = threading.Thread(target=self._run, args=(revision,), daemon=True,
+                                        name="lineup-precompute")
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Block until the current computation finishes; returns True if it did"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    @instrumented(name="LineupPrecomputer.compute")
+    def _compute(self, players, revision):
+        results = {}
+        for formation, mapping in list(FORMATION_POSITIONS.items()):
+            for strategy in LINEUP_STRATEGIES:
+                with self.team.lock:
+                    if self.team.revision != revision:
+                        return None
+                    try:
+                        lineup = self._solve(strategy, list(players), formation, mapping)
+                        results[(strategy, formation)] = (mapping, lineup)
+                    except ValueError:
+                        # Not enough players to fill this formation
+                        pass
+        return results
+
+    def _solve(self, strategy, players_selected, formation, position_mapping):
+        with self.team.lock:
+            if self.cache:
+                return self.cache.get_or_solve(self.team, strategy, players_selected, formation, position_mapping)
+            return getattr(self.team, strategy)(players_selected, formation, position_mapping)
+
+    def _run(self, revision):
+        with self.team.lock:
+            players = tuple(self.team.players)
+        try:
+            results = self._compute(players, revision)
+        except Exception:
+            # A solve failed unexpectedly; the next schedule() call will retry
+            results = None
+        with self._lock:
+            if self._target_revision == revision:
+                self._target_revision = None
+            # Keep results only if nothing changed while they were being computed
+            if results is not None and self.team.revision == revision:
+                self.results = results
+                self.revision = revision
+                self.players = players
+
+    def lookup(self, strategy, formation, position_mapping, players_selected):
+        """
+        A copy of a precomputed lineup, or None if the selection, formation or
+        ratings don't match the precomputed results.
+        """
+        with self._lock:
+            if self.revision != self.team.revision or tuple(players_selected) != self.players:
+                return None
+            mapping, lineup = self.results.get((strategy, formation), (None, None))
+            if mapping is None or mapping != position_mapping:
+                return None
+            return dict(lineup)
+
+    def get_lineup(self, strategy, players_selected, formation, position_mapping):
+        """Serve a precomputed or cached lineup, or fall back to solving it now"""
+        lineup = self.lookup(strategy, formation, position_mapping, players_selected)
+        if lineup is not None:
+            return lineup
+        return self._solve(strategy, players_selected, formation, position_mapping)
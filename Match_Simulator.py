@@ -0,0 +1,150 @@
+# Match_Simulator.py
+"""
+Batched match simulation between two lineups.
+
+Every simulated match draws each player's form uniformly from their rating
+range plus normal noise with standard deviation FORM_NOISE (so a fixed
+rating still varies from match to match), averages it into goalkeeper,
+defense, midfield and attack strengths, and draws each side's goals from a
+Poisson distribution whose rate grows with their attack against the other
+side's defense and with their midfield advantage. All matches are simulated
+at once as NumPy arrays.
+"""
+import numpy as np
+from Formations import (
+    FORMATION_POSITIONS, AREA_GOALKEEPER, AREA_DEFENSE, AREA_MIDFIELD, AREA_ATTACK, get_formation
+)
+from Instrumentation import instrumented
+
+# Goals per side per match between evenly matched lineups
+BASE_GOALS = 1.35
+# Effect of one rating point of attack over the opposing defense on the log goal rate
+ATTACK_WEIGHT = 0.35
+# Effect of one rating point of midfield advantage on the log goal rate
+MIDFIELD_WEIGHT = 0.2
+# Share of the goalkeeper in a side's defensive strength
+GOALKEEPER_SHARE = 0.25
+# Form spread (standard deviation) added to every player, fixed ratings included
+FORM_NOISE = 0.3
+# Rating assumed for slots filled by "AI"
+AI_RATING = 2.0
+DEFAULT_SIMULATIONS = 100000
+
+
+class LineupStrength:
+    """
+    The rating range and area of every slot of a lineup.
+
+    Attributes:
+        lows, highs (np.ndarray): Rating range of each slot's player
+        areas (np.ndarray): Area code of each slot (see Formations.AREAS)
+    """
+
+    def __init__(self, lows, highs, areas):
+        self.lows = np.asarray(lows, dtype=float)
+        self.highs = np.maximum(np.asarray(highs, dtype=float), self.lows)
+        self.areas = np.asarray(areas)
+
+    @classmethod
+    def from_lineup(cls, lineup, formation, position_mapping=None, team=None):
+        """
+        Args:
+            lineup (dict): Slot -> (player, rating), as returned by Team.get_*_lineup
+            formation (str): Formation name the lineup was built for
+            position_mapping (dict): Defaults to FORMATION_POSITIONS[formation]
+            team (Team): If given, each player's min-max rating at the slot's
+                position is used as their range; otherwise the lineup rating
+        """
+        compiled = get_formation(formation, position_mapping or FORMATION_POSITIONS[formation])
+        lows, highs = [], []
+        for slot, position in zip(compiled.slots, compiled.positions):
+            player_name, rating = lineup.get(slot, ("AI", 0.0))
+            player = team.get_player(player_name) if team and player_name != "AI" else None
+            if player_name == "AI":
+                low = high = AI_RATING
+            elif player:
+                low, high = team.lineup_rating(player, position)
+            else:
+                low = high = min(float(rating), 5.0)
+            lows.append(low)
+            highs.append(high)
+        return cls(lows, highs, compiled.areas)
+
+    @classmethod
+    def uniform(cls, formation, rating, spread=0.0, position_mapping=None):
+        """An opponent whose every player is rated rating +/- spread"""
+        compiled = get_formation(formation, position_mapping or FORMATION_POSITIONS[formation])
+        count = len(compiled.slots)
+        return cls([max(rating - spread, 0.0)] * count, [min(rating + spread, 5.0)] * count, compiled.areas)
+
+    def sample_areas(self, rng, n):
+        """(n, 4) area strengths of n simulated matches"""
+        form = rng.uniform(self.lows, self.highs, size=(n, len(self.lows)))
+        form += rng.normal(0.0, FORM_NOISE, size=form.shape)
+        strengths = np.full((n, 4), AI_RATING)
+        for area in (AREA_GOALKEEPER, AREA_DEFENSE, AREA_MIDFIELD, AREA_ATTACK):
+            columns = self.areas == area
+            if columns.any():
+                strengths[:, area] = form[:, columns].mean(axis=1)
+        return strengths
+
+
+class SimulationResult:
+    """Outcome rates and goal averages of a batch of simulated matches, from the home side's view"""
+
+    def __init__(self, home_goals, away_goals):
+        self.matches = len(home_goals)
+        self.win = float(np.mean(home_goals > away_goals))
+        self.draw = float(np.mean(home_goals == away_goals))
+        self.loss = float(np.mean(home_goals < away_goals))
+        self.home_goals = float(np.mean(home_goals))
+        self.away_goals = float(np.mean(away_goals))
+
+    def to_dict(self):
+        return {
+            'matches': self.matches,
+            'win': self.win,
+            'draw': self.draw,
+            'loss': self.loss,
+            'home_goals': self.home_goals,
+            'away_goals': self.away_goals,
+        }
+
+
+def _goal_rates(attacking, defending):
+    defense = (1 - GOALKEEPER_SHARE) * defending[:, AREA_DEFENSE] + GOALKEEPER_SHARE * defending[:, AREA_GOALKEEPER]
+    return BASE_GOALS * np.exp(ATTACK_WEIGHT * (attacking[:, AREA_ATTACK] - defense)
+                               + MIDFIELD_WEIGHT * (attacking[:, AREA_MIDFIELD] - defending[:, AREA_MIDFIELD]))
+
+
+@instrumented
+def simulate_matches(home, away, n=DEFAULT_SIMULATIONS, seed=0, batch_size=10000,
+                     progress=None, cancel=None):
+    """
+    Simulate n matches between two LineupStrength objects.
+
+    Args:
+        seed (int): Seed of the random generator, so runs are reproducible
+        batch_size (int): Matches simulated per NumPy batch, bounding memory use
+        progress (callable): Called with (matches done, n) after each batch
+        cancel (threading.Event): When set, stop and report the matches played so far
+
+    Returns:
+        SimulationResult
+    """
+    rng = np.random.default_rng(seed)
+    home_goals = np.empty(n, dtype=np.int64)
+    away_goals = np.empty(n, dtype=np.int64)
+    played = 0
+    for start in range(0, n, batch_size):
+        if cancel and cancel.is_set() and played:
+            break
+        size = min(batch_size, n - start)
+        home_areas = home.sample_areas(rng, size)
+        away_areas = away.sample_areas(rng, size)
+        home_goals[start:start + size] = rng.poisson(_goal_rates(home_areas, away_areas))
+        away_goals[start:start + size] = rng.poisson(_goal_rates(away_areas, home_areas))
+        played += size
+        if progress:
+            progress(played, n)
+    return SimulationResult(home_goals[:played], away_goals[:played])
@@ -0,0 +1,151 @@
+# Name_Index.py
+from collections import defaultdict
+import numpy as np
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy suggestion
+SUGGESTION_THRESHOLD = 0.3
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a name"""
+    return " ".join(name.split()).casefold()
+
+
+def _trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameResolution:
+    """
+    Result of resolving a batch of names.
+
+    Attributes:
+        rows (list): Row id of each input name, or None if it wasn't found
+        names (list): Canonical player name of each input name, or None
+        missing (dict): Input name -> list of suggested player names
+    """
+
+    def __init__(self, rows, names, missing):
+        self.rows = rows
+        self.names = names
+        self.missing = missing
+
+    @property
+    def found(self):
+        """Canonical names of the resolved inputs, in input order"""
+        return [name for name in self.names if name is not None]
+
+
+class NameIndex:
+    """
+    Normalized player name index with aliases and trigram fuzzy matching.
+
+    Exact lookups are a single dict access. Fuzzy suggestions use an inverted
+    index from trigrams to name ids: the candidates sharing trigrams with the
+    query are counted in one np.bincount and ranked by Dice similarity, so a
+    miss costs time proportional to the names that look alike, not to the
+    roster size. Trigram postings are built lazily, on the first suggestion.
+
+    Row ids are assigned in insertion order, matching the order of
+    Team.players.
+    """
+
+    def __init__(self, names=(), aliases=None):
+        self.names = []
+        self.ids = {}  # normalized name -> row id
+        self.aliases = {}  # normalized alias -> row id
+        self._postings = defaultdict(list)
+        self._gram_counts = []
+        self._indexed = 0  # names already in the trigram postings
+        self._arrays = None
+        for name in names:
+            self.add(name)
+        for alias, name in (aliases or {}).items():
+            if self.lookup(name) is not None:
+                self.add_alias(alias, name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        """Add a name and return its row id"""
+        normalized = normalize_name(name)
+        row = self.ids.get(normalized)
+        if row is None:
+            row = self.ids[normalized] = len(self.names)
+            self.names.append(name)
+        return row
+
+    def add_alias(self, alias, name):
+        """Make alias resolve to an existing name"""
+        row = self.lookup(name)
+        if row is None:
+            raise ValueError(f"Player {name} not found")
+        self.aliases[normalize_name(alias)] = row
+
+    def lookup(self, name):
+        """Row id of a name or alias, or None"""
+        normalized = normalize_name(name)
+        row = self.ids.get(normalized)
+        return self.aliases.get(normalized) if row is None else row
+
+    def _update_postings(self):
+        if self._indexed == len(self.names):
+            return
+        for row in range(self._indexed, len(self.names)):
+            grams = _trigrams(normalize_name(self.names[row]))
+            for gram in grams:
+                self._postings[gram].append(row)
+            self._gram_counts.append(len(grams))
+        self._indexed = len(self.names)
+        self._arrays = None
+
+    def suggest(self, name, limit=3, threshold=SUGGESTION_THRESHOLD):
+        """
+        Names that look like name, best first.
+
+        Returns:
+            list: (player name, similarity) tuples
+        """
+        self._update_postings()
+        if self._arrays is None:
+            self._arrays = ({gram: np.array(rows, dtype=np.int64) for gram, rows in self._postings.items()},
+                            np.array(self._gram_counts, dtype=float))
+        postings, gram_counts = self._arrays
+
+        grams = _trigrams(normalize_name(name))
+        hits = [postings[gram] for gram in grams if gram in postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(gram_counts))
+        candidates = np.nonzero(shared)[0]
+        scores = 2 * shared[candidates] / (len(grams) + gram_counts[candidates])
+        keep = scores >= threshold
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))
+        return [(self.names[candidates[i]], float(scores[i])) for i in order]
+
+    def resolve(self, names, suggestions=3):
+        """
+        Resolve a batch of names or aliases at once.
+
+        Args:
+            suggestions (int): Fuzzy suggestions returned per missing name
+
+        Returns:
+            NameResolution
+        """
+        rows, canonical, missing = [], [], {}
+        for name in names:
+            row = self.lookup(name)
+            rows.append(row)
+            canonical.append(None if row is None else self.names[row])
+            if row is None and suggestions:
+                missing[name] = [match for match, _ in self.suggest(name, suggestions)]
+            elif row is None:
+                missing[name] = []
+        return NameResolution(rows, canonical, missing)
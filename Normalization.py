@@ -0,0 +1,144 @@
+# Normalization.py
+import math
+from Aggregation import VoteColumns
+
+# Votes a voter needs before their own mean counts as much as the team-wide mean
+PRIOR_STRENGTH = 5
+# Lower bound on a voter's spread so a voter who always gives the same rating
+# isn't stretched across the whole scale
+MIN_STD = 0.5
+# How far the team-wide mean or std may drift before the transforms are re-anchored
+REFERENCE_TOLERANCE = 0.02
+
+
+class VoterStats:
+    """
+    Running per-voter and team-wide rating statistics.
+
+    Every vote updates the counts, sums and sums of squares of its voter in
+    O(1) (a replaced vote is subtracted first), so normalized ratings never
+    need a rescan of all votes. A voter's votes are mapped onto the team scale
+    with
+
+        normalized = team mean + team std * (vote - voter mean) / voter std
+
+    where the voter's mean and std are shrunk towards the team's until they
+    have cast PRIOR_STRENGTH votes. The same map is applied to a vote's min
+    and max, using the vote midpoint for the statistics.
+
+    Transforms use a reference copy of the team mean and std that is only
+    re-anchored once the live values drift more than the tolerance, so a
+    vote changes just its own voter's transform (ratings may sit one 0.1
+    rounding step from a fresh rebuild until then). Callers caching normalized
+    ratings drop the ones of take_changed() voters, and everything when
+    generation changes.
+    """
+
+    def __init__(self, prior_strength=PRIOR_STRENGTH, min_std=MIN_STD, tolerance=REFERENCE_TOLERANCE):
+        self.prior_strength = prior_strength
+        self.min_std = min_std
+        self.tolerance = tolerance
+        self.voters = {}  # voter -> [count, sum, sum of squares]
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        # Team (mean, std) the transforms are anchored to
+        self.reference = self._team_moments()
+        # Bumped when the reference is re-anchored, which changes every transform
+        self.generation = 0
+        self._transforms = {}
+        self._changed = set()
+
+    @classmethod
+    def from_players(cls, players, **kwargs):
+        """Build statistics from every vote of the given Player objects"""
+        stats = cls(**kwargs)
+        columns = VoteColumns.from_players(players)
+        voters = columns.voter_names
+        for voter_id, low, high in zip(columns.voter_ids.tolist(), columns.mins.tolist(), columns.maxs.tolist()):
+            stats.add(voters[voter_id], low, high)
+        stats._anchor()
+        return stats
+
+    def _anchor(self):
+        self.reference = self._team_moments()
+        self._transforms = {}
+        self.generation += 1
+
+    def _update(self, voter, min_rating, max_rating, sign):
+        value = (min_rating + max_rating) / 2
+        entry = self.voters.setdefault(voter, [0, 0.0, 0.0])
+        entry[0] += sign
+        entry[1] += sign * value
+        entry[2] += sign * value * value
+        self.count += sign
+        self.total += sign * value
+        self.total_sq += sign * value * value
+        if entry[0] == 0:
+            del self.voters[voter]
+        self._transforms.pop(voter, None)
+        self._changed.add(voter)
+        mean, std = self._team_moments()
+        if abs(mean - self.reference[0]) > self.tolerance or abs(std - self.reference[1]) > self.tolerance:
+            self._anchor()
+
+    def add(self, voter, min_rating, max_rating):
+        self._update(voter, min_rating, max_rating, 1)
+
+    def remove(self, voter, min_rating, max_rating):
+        self._update(voter, min_rating, max_rating, -1)
+
+    def replace(self, old_vote, voter, min_rating, max_rating):
+        """Record a vote that replaces old_vote (a vote dict or None)"""
+        if old_vote is not None:
+            self.remove(old_vote['voter'], old_vote['min'], old_vote['max'])
+        self.add(voter, min_rating, max_rating)
+
+    def take_changed(self):
+        """Voters whose transform changed since the last call"""
+        changed, self._changed = self._changed, set()
+        return changed
+
+    def _team_moments(self):
+        if self.count == 0:
+            return 0.0, 1.0
+        mean = self.total / self.count
+        variance = max(self.total_sq / self.count - mean * mean, 0.0)
+        return mean, max(math.sqrt(variance), self.min_std)
+
+    def transform(self, voter):
+        """(scale, shift) mapping this voter's ratings onto the team scale"""
+        cached = self._transforms.get(voter)
+        if cached is not None:
+            return cached
+
+        team_mean, team_std = self.reference
+        count, total, total_sq = self.voters.get(voter, (0, 0.0, 0.0))
+        weight = self.prior_strength
+        # Shrink the voter's moments towards the team's
+        mean = (total + weight * team_mean) / (count + weight)
+        second_moment = (total_sq + weight * (team_std ** 2 + team_mean ** 2)) / (count + weight)
+        std = max(math.sqrt(max(second_moment - mean * mean, 0.0)), self.min_std)
+
+        scale = team_std / std
+        result = self._transforms[voter] = (scale, team_mean - scale * mean)
+        return result
+
+    def normalize(self, voter, rating):
+        scale, shift = self.transform(voter)
+        return min(5.0, max(0.0, shift + scale * rating))
+
+    def normalized_aggregate(self, votes):
+        """Mean normalized (min, max) of a position's votes, or None without votes"""
+        if not votes:
+            return None
+        mins = [self.normalize(v['voter'], v['min']) for v in votes]
+        maxs = [self.normalize(v['voter'], v['max']) for v in votes]
+        return round(sum(mins) / len(mins), 1), round(sum(maxs) / len(maxs), 1)
+
+    def voter_bias(self, voter):
+        """How far a voter's average rating sits above (+) or below (-) the team's"""
+        count, total, _ = self.voters.get(voter, (0, 0.0, 0.0))
+        if not count or not self.count:
+            return 0.0
+        return total / count - self.total / self.count
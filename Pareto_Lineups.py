@@ -0,0 +1,165 @@
+# Pareto_Lineups.py
+import itertools
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from Formations import AREA_GOALKEEPER, AREA_DEFENSE, AREA_MIDFIELD, AREA_ATTACK, get_formation
+from Instrumentation import instrumented
+
+# Objectives every lineup is scored on; higher is better for all of them
+OBJECTIVES = ["total", "attack", "defense", "balance"]
+# Weight levels of each area in the scalarized solves; every combination is solved
+AREA_WEIGHT_LEVELS = (1, 3, 10)
+# Weight that makes one area's strength come first, for the extreme points of the front
+DOMINANT_WEIGHT = 1000
+# Areas weighted in the scalarized solves, with their labels
+AREA_CODES = (AREA_GOALKEEPER, AREA_DEFENSE, AREA_MIDFIELD, AREA_ATTACK)
+AREA_LABELS = ("GK", "DEF", "MID", "ATT")
+# Team strategies whose lineups are added to the candidates
+CANDIDATE_STRATEGIES = {
+    "get_best_lineup": "Best Overall",
+    "get_balanced_lineup": "Balanced",
+    "get_attack_focused_lineup": "Attack-Focused",
+}
+
+
+class ParetoLineup:
+    """
+    One non-dominated lineup.
+
+    Attributes:
+        lineup (dict): Slot -> (player, rating), "AI" for empty slots
+        objectives (dict): Objective name -> value (see lineup_objectives)
+        source (str): How it was found, e.g. "Balanced" or "weights GK1 DEF3 MID1 ATT2"
+    """
+
+    def __init__(self, lineup, objectives, source):
+        self.lineup = lineup
+        self.objectives = objectives
+        self.source = source
+
+    def vector(self):
+        return np.array([self.objectives[name] for name in OBJECTIVES])
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={self.objectives[name]:.2f}" for name in OBJECTIVES)
+        return f"ParetoLineup({values}, source={self.source!r})"
+
+
+def lineup_objectives(ratings, areas):
+    """
+    Objective vector of a lineup.
+
+    Args:
+        ratings (np.ndarray): Rating of each slot's player, 0 for AI
+        areas (np.ndarray): Area code of each slot
+
+    Returns:
+        dict: total (sum of ratings), attack (mean rating of attacking slots),
+        defense (mean of the goalkeeper and defenders) and balance (weakest
+        line's mean over the strongest's, 1 when defense, midfield and attack
+        are equally strong)
+    """
+    defensive = np.isin(areas, (AREA_GOALKEEPER, AREA_DEFENSE))
+    lines = [ratings[defensive], ratings[areas == AREA_MIDFIELD], ratings[areas == AREA_ATTACK]]
+    means = [float(line.mean()) for line in lines if line.size]
+    return {
+        'total': float(ratings.sum()),
+        'attack': means[-1] if lines[2].size else 0.0,
+        'defense': float(lines[0].mean()) if lines[0].size else 0.0,
+        'balance': min(means) / max(means) if means and max(means) > 0 else 0.0,
+    }
+
+
+def non_dominated(candidates, decimals=6):
+    """
+    The candidates no other candidate beats on every objective, in input
+    order. Of candidates with the same objective vector only the first is kept.
+    """
+    vectors = np.round(np.array([candidate.vector() for candidate in candidates]), decimals)
+    front = []
+    kept = set()
+    for i, vector in enumerate(vectors):
+        dominated = np.any(np.all(vectors >= vector, axis=1) & np.any(vectors > vector, axis=1))
+        if not dominated and tuple(vector) not in kept:
+            kept.add(tuple(vector))
+            front.append(candidates[i])
+    return front
+
+
+@instrumented
+def pareto_lineups(team, players_selected, formation, position_mapping, levels=AREA_WEIGHT_LEVELS,
+                   progress=None, cancel=None):
+    """
+    Pareto-optimal lineups over OBJECTIVES for a selection and formation.
+
+    Candidates are the lineups of the Team strategies plus the optimal
+    assignments for every combination of area weights (one weight level per
+    area, so all-equal weights give the best total and heavier areas trade it
+    for that area's strength), and with each area weighted far above the
+    others for the front's extremes. Proportional weightings are solved once,
+    identical lineups are kept once and dominated ones are dropped.
+
+    Args:
+        levels (tuple): Weight levels tried for each area
+        progress (callable): Called with (solves done, total solves)
+        cancel (threading.Event): When set, return the front of the candidates so far
+
+    Returns:
+        list: ParetoLineup objects, highest total first
+    """
+    players = team.selected_players(players_selected)
+    compiled = get_formation(formation, position_mapping)
+    n_slots, n_players = len(compiled.slots), len(players)
+    # One zero column per slot stands for "AI" filling it
+    ratings = np.hstack([team.lineup_matrix(players)[:, compiled.slot_index].T, np.zeros((n_slots, n_slots))])
+    names = [player.name for player in players]
+
+    candidates = []
+    seen = set()
+
+    def add(assign, source):
+        """Add a candidate from each slot's column, -1 for AI"""
+        assign = tuple(int(column) for column in assign)
+        if assign in seen:
+            return
+        seen.add(assign)
+        slot_ratings = np.array([ratings[i, column] if column >= 0 else 0.0 for i, column in enumerate(assign)])
+        lineup = {slot: (names[column], float(rating)) if column >= 0 else ("AI", 0.0)
+                  for slot, column, rating in zip(compiled.slots, assign, slot_ratings)}
+        candidates.append(ParetoLineup(lineup, lineup_objectives(slot_ratings, compiled.areas), source))
+
+    weightings = list(itertools.product(levels, repeat=len(AREA_CODES)))
+    weightings += [tuple(DOMINANT_WEIGHT if j == i else 1 for j in range(len(AREA_CODES)))
+                   for i in range(len(AREA_CODES))]
+    total = len(CANDIDATE_STRATEGIES) + len(weightings)
+    done = 0
+    row_of = {name: i for i, name in enumerate(names)}
+    for strategy, label in CANDIDATE_STRATEGIES.items():
+        lineup = getattr(team, strategy)(players_selected, formation, position_mapping)
+        add([row_of.get(lineup.get(slot, ("AI", 0.0))[0], -1) for slot in compiled.slots], label)
+        done += 1
+        if progress:
+            progress(done, total)
+
+    solved = set()
+    for weights in weightings:
+        if cancel and cancel.is_set():
+            break
+        # Weightings that are multiples of each other give the same assignment
+        scale = np.gcd.reduce(weights)
+        reduced = tuple(w // scale for w in weights)
+        if reduced not in solved:
+            solved.add(reduced)
+            slot_weights = np.select([compiled.areas == area for area in AREA_CODES], weights)
+            rows, columns = linear_sum_assignment(ratings * slot_weights[:, None], maximize=True)
+            assign = np.full(n_slots, -1)
+            rated = (columns < n_players) & (ratings[rows, columns] > 0)
+            assign[rows[rated]] = columns[rated]
+            add(assign, "weights " + " ".join(f"{label}{w}" for label, w in zip(AREA_LABELS, weights)))
+        done += 1
+        if progress:
+            progress(done, total)
+
+    front = non_dominated(candidates)
+    front.sort(key=lambda candidate: -candidate.objectives['total'])
+    return front
@@ -0,0 +1,153 @@
+# Pitch_Render.py
+import sys
+from functools import lru_cache
+from Formations import PITCH_WIDTH, PITCH_HEIGHT
+from Instrumentation import instrumented
+
+
+@lru_cache(maxsize=None)
+def pitch_template(width=PITCH_WIDTH, height=PITCH_HEIGHT):
+    """
+    The empty pitch (border, penalty area and goal area) as a tuple of row
+    strings, built once per size.
+    """
+    pitch = [[' ' for _ in range(width)] for _ in range(height)]
+
+    # Draw borders and lines
+    for i in range(height):
+        pitch[i][0] = '|'
+        pitch[i][width - 1] = '|'
+    for i in range(width):
+        pitch[0][i] = '-'
+        pitch[height - 1][i] = '-'
+
+    # Add corners
+    pitch[0][0] = "┌"
+    pitch[0][width - 1] = "┐"
+    pitch[height - 1][0] = "└"
+    pitch[height - 1][width - 1] = "┘"
+
+    # Draw penalty area
+    penalty_width = width // 2
+    penalty_height = height // 3
+    penalty_start_x = (width - penalty_width) // 2
+    for y in range(penalty_height):
+        pitch[height - 1 - y][penalty_start_x - 1] = '|'
+        pitch[height - 1 - y][penalty_start_x + penalty_width] = '|'
+    for x in range(penalty_width):
+        pitch[height - 1 - penalty_height][x + penalty_start_x] = '-'
+
+    # Draw goal area
+    goal_width = width // 3
+    goal_height = height // 6
+    goal_start_x = (width - goal_width) // 2
+    for y in range(goal_height):
+        pitch[height - 1 - y][goal_start_x - 1] = '|'
+        pitch[height - 1 - y][goal_start_x + goal_width] = '|'
+    for x in range(goal_width):
+        pitch[height - 1 - goal_height][x + goal_start_x] = '-'
+
+    return tuple(''.join(row) for row in pitch)
+
+
+class PitchRenderer:
+    """
+    Draws lineups on a copy of the cached pitch template.
+
+    draw() writes a whole frame with a single write. In live mode, update()
+    then rewrites only the cells that changed since the last frame, using
+    cursor moves, e.g. while trying substitutions.
+
+        renderer = PitchRenderer(live=True)
+        renderer.draw(layout, lineup, title)
+        renderer.update(layout, new_lineup, title)  # only the changed cells
+    """
+
+    def __init__(self, width=PITCH_WIDTH, height=PITCH_HEIGHT, stream=None, live=False):
+        self.width = width
+        self.height = height
+        self.stream = stream or sys.stdout
+        self.live = live
+        self._shown = None  # Rows on screen, for live updates
+
+    def _write(self, rows, y, x, text):
+        if 0 <= y < self.height:
+            for i, char in enumerate(text):
+                if 0 <= x + i < self.width:
+                    rows[y][x + i] = char
+
+    @instrumented(name="PitchRenderer.compose")
+    def compose(self, layout, lineup, title=None):
+        """
+        The frame of a lineup as a list of row strings.
+
+        Args:
+            layout (dict): Slot -> (row, column) on the pitch
+            lineup (dict): Slot -> (player, rating)
+            title (str): Centered on the top border
+        """
+        rows = [list(row) for row in pitch_template(self.width, self.height)]
+        for pos, (y, x) in layout.items():
+            if pos not in lineup:
+                continue
+            player, rating = lineup[pos]
+            # Player icon, position above, name and rating below
+            self._write(rows, y, x, "□")
+            self._write(rows, y - 1, max(0, x - len(pos) // 2), pos)
+            name = player[:7] if player != "AI" else "AI"
+            self._write(rows, y + 1, max(0, x - len(name) // 2), name)
+            if player != "AI":
+                rating_str = f"({rating:.1f})"
+                self._write(rows, y + 2, max(0, x - len(rating_str) // 2), rating_str)
+        if title:
+            self._write(rows, 0, (self.width - len(title)) // 2, title)
+        return [''.join(row) for row in rows]
+
+    def draw(self, layout, lineup, title=None):
+        """
+        Write the whole frame at once. In live mode the screen is cleared
+        first so update() knows where every cell is.
+        """
+        frame = self.compose(layout, lineup, title)
+        prefix = "\033[H\033[2J" if self.live else ""
+        self.stream.write(prefix + "\n".join(frame) + "\n")
+        self.stream.flush()
+        self._shown = frame
+
+    def changes(self, frame):
+        """(row, column, text) runs of frame that differ from the frame on screen"""
+        runs = []
+        for y, (old, new) in enumerate(zip(self._shown, frame)):
+            if old == new:
+                continue
+            x = 0
+            while x < len(new):
+                if old[x] == new[x]:
+                    x += 1
+                    continue
+                start = x
+                while x < len(new) and old[x] != new[x]:
+                    x += 1
+                runs.append((y, start, new[start:x]))
+        return runs
+
+    def update(self, layout, lineup, title=None):
+        """
+        Redraw only the changed cells, leaving the cursor where it was. Falls
+        back to draw() outside live mode or before the first frame.
+
+        Returns:
+            int: Number of changed cell runs written
+        """
+        if not self.live or self._shown is None:
+            self.draw(layout, lineup, title)
+            return self.height
+        frame = self.compose(layout, lineup, title)
+        runs = self.changes(frame)
+        if runs:
+            # Save the cursor, rewrite each run at its 1-based terminal position, restore
+            moves = "".join(f"\033[{y + 1};{x + 1}H{text}" for y, x, text in runs)
+            self.stream.write("\0337" + moves + "\0338")
+            self.stream.flush()
+        self._shown = frame
+        return len(runs)
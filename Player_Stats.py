@@ -1,5 +1,10 @@
 # Player_Stats.py
+import functools
+import itertools
 import json
+import os
+import shutil
+import threading
 from rich.console import Console
 from rich.table import Table
 from rich import box
@@ -7,16 +12,67 @@ from tabulate import tabulate
 from collections import defaultdict
 from scipy.optimize import linear_sum_assignment
 import numpy as np
+from Formations import (
+    POSITIONS, POSITION_INDEX, POSITION_AREA_CODES,
+    AREA_GOALKEEPER, AREA_DEFENSE, AREA_MIDFIELD, AREA_ATTACK, get_formation
+)
+from Instrumentation import instrumented, timed
+from Aggregation import AGGREGATORS, VoteColumns, aggregate, aggregate_votes, voter_reliability
+from Rating_History import RatingHistory, CHECKPOINT_INTERVAL
+from Normalization import VoterStats
+from Vote_Store import VoteStore, STORE_LOCK
+from Rating_Snapshot import write_snapshot
+from Name_Index import NameIndex
+from Team_File import TeamFileReader, SCHEMA_VERSION
+from Anytime_Solver import anytime_lineup, DEFAULT_TIME_BUDGET
+from Change_Feed import ChangeFeed, ChangeLog, PLAYER_ADDED, VOTE_SET, AGGREGATE_CHANGED, RELOADED
+from Position_Compatibility import compatibility_matrix, apply_compatibility
+
+# Team methods that build a lineup, in the order the menu offers them
+LINEUP_STRATEGIES = ["get_best_lineup", "get_balanced_lineup", "get_attack_focused_lineup"]
+
+# Votes apply_vote_stream holds in memory at once
+VOTE_CHUNK_SIZE = 10000
+
+# File layouts for save_players: one dict per vote, or columnar (see Vote_Store)
+STORAGE_FORMATS = ["json", "columnar"]
 
 console = Console()
-POSITIONS = ["GK", "LB", "CB", "RB", "CDM", "CM", "LM", "RM", "CAM", "LW", "RW", "ST"]
+
+# POSITIONS indexes used for side preference scores
+LEFT_SIDE_INDEX = [POSITION_INDEX[pos] for pos in ['LW', 'LM', 'LB']]
+RIGHT_SIDE_INDEX = [POSITION_INDEX[pos] for pos in ['RW', 'RM', 'RB']]
+# POSITIONS indexes outside the attack, used to rate attack-focused fillers
+NON_ATTACK_INDEX = [i for i, area in enumerate(POSITION_AREA_CODES) if area != AREA_ATTACK]
+
+def synchronized(method):
+    """Run a Team method holding the team's lock (see Team.lock)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class Player:
     def __init__(self, name):
         self.name = name
         self.positions = {pos: {'min': 0, 'max': 0, 'votes': []} for pos in POSITIONS}
+        # ChangeFeed notified of vote and aggregate changes (set by Team)
+        self.events = None
+        # (VoteStore, player id) still holding this player's votes (see Vote_Store)
+        self.stored_votes = None
         
+    def load_votes(self):
+        """Copy this player's votes out of the VoteStore holding them, if any"""
+        with STORE_LOCK:
+            if self.stored_votes is not None:
+                store, player_id = self.stored_votes
+                for pos, votes in store.player_votes(player_id).items():
+                    self.positions[pos]['votes'] = votes
+                self.stored_votes = None
+
     def to_dict(self):
+        self.load_votes()
         return {
             'name': self.name,
             'positions': self.positions
@@ -28,66 +84,413 @@ class Player:
         player.positions = data.get('positions', {pos: {'min': 0, 'max': 0, 'votes': []} for pos in POSITIONS})
         return player
     
-    def add_rating_vote(self, position, min_rating, max_rating, voter):
-        """Add a new vote for a position rating"""
-        if position not in self.positions:
-            raise ValueError(f"Invalid position: {position}")
-            
-        # Remove previous vote from this voter if exists
-        self.positions[position]['votes'] = [v for v in self.positions[position]['votes'] 
-                                           if v['voter'] != voter]
-        
-        # Add new vote
-        self.positions[position]['votes'].append({
-            'voter': voter,
-            'min': min_rating,
-            'max': max_rating,
-        })
-        
-        # Update aggregate ratings
-        votes = self.positions[position]['votes']
-        if votes:
-            self.positions[position]['min'] = round(sum(v['min'] for v in votes) / len(votes), 1)
-            self.positions[position]['max'] = round(sum(v['max'] for v in votes) / len(votes), 1)
+    def notify(self, kind, position=None, **data):
+        """Emit a change event about this player, if anybody listens"""
+        if self.events:
+            self.events.emit(kind, self.name, position, **data)
+
+    def update_aggregate(self, position, aggregator="mean", voter_weights=None):
+        """
+        Recompute the aggregate min/max rating of a position from its votes
+        
+        Args:
+            aggregator (str): One of AGGREGATORS (plain mean by default)
+            voter_weights (dict): Voter name -> weight, used by the "weighted" aggregator
+        """
+        rating = self.positions[position]
+        result = aggregate_votes(rating['votes'], aggregator, voter_weights)
+        if result:
+            old = (rating['min'], rating['max'])
+            rating['min'], rating['max'] = result
+            if tuple(result) != old:
+                self.notify(AGGREGATE_CHANGED, position, old=old, new=tuple(result))
 
 class Team:
-    def __init__(self, name):
+    def __init__(self, name, filename="players_data.json"):
+        # Held by every method that reads or changes shared state (votes,
+        # caches, the name index), so background solves (Lineup_Precompute,
+        # Solve_Tasks) never see a half-applied change
+        self.lock = threading.RLock()
         self.name = name
         self.players = {}
-        self.filename = "players_data.json"
+        self.filename = filename
+        self.aggregator = "mean"
+        self.voter_weights = {}
+        self.history = None
+        self.storage = "json"
+        # Alias -> player name; resolved through the lazily built name index
+        self.aliases = {}
+        self._name_index = None
+        # Fine-grained change events (see Change_Feed); the name index follows new players
+        self.events = ChangeFeed()
+        self.events.subscribe(self._index_new_player, kinds=[PLAYER_ADDED])
+        self.change_log = None
+        # Bumped whenever ratings or players change, so cached lineups can be checked
+        self.revision = 0
+        # Per-voter bias normalization of rankings and lineups
+        self.normalized = False
+        self.voter_stats = None
+        self._normalized_ratings = {}
+        self._normalized_by_voter = {}  # voter -> keys of the cached ratings with their votes
+        self._normalized_generation = -1
+        # Out-of-position play: lineups discount ratings by the compatibility matrix
+        self.out_of_position = True
+        self.compatibility = compatibility_matrix()
+        # Why the players file couldn't be loaded in full; the next save keeps a backup of it
+        self.load_problem = None
         self.load_players()
 
+    @instrumented
+    @synchronized
     def save_players(self):
-        data = {
+        settings = {
+            'schema_version': SCHEMA_VERSION,
             'team_name': self.name,
-            'players': {name: player.to_dict() for name, player in self.players.items()}
+            'aggregator': self.aggregator,
+            'normalized': self.normalized,
+            'out_of_position': self.out_of_position,
+            'aliases': self.aliases,
         }
         
+        # Write a temporary file and swap it in, so a crash never leaves a partial file
+        temp_filename = f"{self.filename}.tmp"
         try:
-            with open(self.filename, 'w') as f:
-                json.dump(data, f, indent=4)
+            if self.load_problem and os.path.exists(self.filename):
+                # Saving would drop what couldn't be loaded, so keep the original
+                backup = f"{self.filename}.bak"
+                shutil.copy2(self.filename, backup)
+                print(f"\nThe players file was not loaded in full ({self.load_problem}); "
+                      f"the original was kept as {backup}.")
+            self.load_problem = None
+            if self.storage == "columnar":
+                with timed("save_players.columnar"):
+                    store = VoteStore.from_players(self.players.values())
+                    store.save(temp_filename, **settings)
+                    # Keep the votes in the compact columns instead of per-vote dicts
+                    store.attach(list(self.players.values()))
+            else:
+                data = {**settings, 'players': {name: player.to_dict() for name, player in self.players.items()}}
+                with timed("save_players.json"), open(temp_filename, 'w') as f:
+                    json.dump(data, f, indent=4)
+            os.replace(temp_filename, self.filename)
+            if self.history:
+                self.history.flush()
+            if self.change_log:
+                self.change_log.flush()
             print("\nPlayers data saved successfully!")
         except Exception as e:
             print(f"\nError saving players data: {e}")
     
+    @instrumented
+    @synchronized
     def load_players(self):
+        """
+        Stream the players file, building and validating one player at a time
+        (see Team_File). Players from files written with an older schema are
+        upgraded in memory; the file itself only changes on the next save.
+
+        Invalid players are skipped and reported. If any were, or the file
+        can't be read at all, load_problem is set and the next save backs the
+        file up before replacing it.
+        """
+        self.load_problem = None
         try:
-            with open(self.filename, 'r') as f:
-                data = json.load(f)
-                
+            reader = TeamFileReader(self.filename, skip_invalid=True)
+            with timed("load_players.stream"):
+                players = {name: Player.from_dict(player_data) for name, player_data in reader.players()}
+            data = reader.settings
+
             self.name = data.get('team_name', self.name)
-            players_data = data.get('players', {})
+            aggregator = data.get('aggregator', "mean")
+            self.aggregator = aggregator if aggregator in AGGREGATORS else "mean"
+            self.aliases = data.get('aliases', {})
             
-            self.players = {
-                name: Player.from_dict(player_data)
-                for name, player_data in players_data.items()
-            }
+            if data.get('format') == "columnar":
+                self.storage = "columnar"
+                with timed("load_players.build"):
+                    players = VoteStore.from_dict(data).to_players()
+            else:
+                self.storage = "json"
+            self.players = players
+            if self.aggregator == "weighted":
+                self.voter_weights = self._voter_weights(VoteColumns.from_players(self.players.values()))
+            for player in self.players.values():
+                player.events = self.events
+            self._name_index = None
+            self.voter_stats = None
+            self.set_normalization(bool(data.get('normalized', False)))
+            self.out_of_position = bool(data.get('out_of_position', True))
+            self.revision += 1
+            self.events.emit(RELOADED)
             print(f"Loaded {len(self.players)} players from file.")
+            for name, message in reader.skipped:
+                print(f"Skipped invalid player {name}: {message}")
+            if reader.skipped:
+                self.load_problem = f"{len(reader.skipped)} invalid player(s) skipped"
+                print(f"The original file is kept as {self.filename}.bak when players are next saved.")
+            if reader.version < SCHEMA_VERSION:
+                # Upgraded in memory only; the file is rewritten by the next save
+                print(f"Players file uses schema version {reader.version}; it is upgraded to "
+                      f"{SCHEMA_VERSION} the next time players are saved.")
         except FileNotFoundError:
             print("No saved players data found. Starting with empty team.")
         except Exception as e:
+            self.load_problem = str(e)
             print(f"Error loading players data: {e}")
+            print(f"The original file is kept as {self.filename}.bak when players are next saved.")
+
+    @instrumented
+    def add_rating_vote(self, player_name, position, min_rating, max_rating, voter):
+        """Add a vote for a player and update the aggregate with the team's aggregator"""
+        self.apply_votes([(player_name, position, min_rating, max_rating, voter)])
+
+    @instrumented
+    @synchronized
+    def apply_votes(self, votes):
+        """
+        Apply a batch of votes with one aggregate update per touched position
+        (or one batched recompute for the weighted aggregator).
+
+        A vote replaces any earlier vote by the same voter for that player and
+        position. This is the one path every vote takes,
+        interactive or bulk imported (see apply_vote_stream), so events, voter
+        statistics, history and the revision always stay in step.
+
+        Args:
+            votes (iterable): (player name, position, min, max, voter) tuples
+
+        Returns:
+            int: Number of votes applied
+
+        Raises:
+            ValueError: If a player or position is unknown; nothing is applied then
+        """
+        resolved = []
+        for player_name, position, min_rating, max_rating, voter in votes:
+            player = self.get_player(player_name)
+            if not player:
+                raise ValueError(f"Player {player_name} not found")
+            if position not in player.positions:
+                raise ValueError(f"Invalid position: {position}")
+            resolved.append((player, position, min_rating, max_rating, voter))
+        return self.apply_vote_stream(resolved)
+
+    @instrumented
+    @synchronized
+    def apply_vote_stream(self, votes, chunk_size=VOTE_CHUNK_SIZE):
+        """
+        Apply a stream of already validated votes chunk by chunk, so memory
+        stays bounded however long the stream is (used by Vote_Import).
+
+        Aggregates are brought up to date once, after the last chunk.
+
+        Args:
+            votes (iterable): (Player of this team, position, min, max, voter) tuples
+            chunk_size (int): Votes applied per chunk
+
+        Returns:
+            int: Number of votes applied
+        """
+        votes = iter(votes)
+        # (player name, position) -> {voter: index into the votes list}, so
+        # replacing a vote doesn't rescan the list; it grows with the touched
+        # positions' votes, not with the stream
+        voter_indexes = {}
+        applied = 0
+        while True:
+            chunk = list(itertools.islice(votes, chunk_size))
+            if not chunk:
+                break
+            self._apply_chunk(chunk, voter_indexes)
+            applied += len(chunk)
+        if not applied:
+            return 0
+
+        if self.aggregator == "weighted" and len(voter_indexes) > 1:
+            self.recompute_aggregates()
+        else:
+            for player_name, position in voter_indexes:
+                self.players[player_name].update_aggregate(position, self.aggregator, self.voter_weights)
+        if self.history:
+            self.history.maybe_checkpoint(self.players.values())
+        self.revision += 1
+        return applied
+
+    def _apply_chunk(self, chunk, voter_indexes):
+        """Store one chunk of resolved votes, indexing each touched (player, position) by voter"""
+        notify = self.events.wants(VOTE_SET)
+        for player, position, min_rating, max_rating, voter in chunk:
+            group = (player.name, position)
+            votes = player.positions[position]['votes']
+            index = voter_indexes.get(group)
+            if index is None:
+                index = voter_indexes[group] = {v['voter']: i for i, v in enumerate(votes)}
+            self._normalized_ratings.pop(group, None)
+            vote = {'voter': voter, 'min': min_rating, 'max': max_rating}
+            if voter in index:
+                old_vote = votes[index[voter]]
+                votes[index[voter]] = vote
+            else:
+                old_vote = None
+                index[voter] = len(votes)
+                votes.append(vote)
+            if notify:
+                player.notify(VOTE_SET, position, voter=voter, min=min_rating, max=max_rating, replaced=old_vote)
+            if self.voter_stats:
+                self.voter_stats.replace(old_vote, voter, min_rating, max_rating)
+            if self.history:
+                self.history.record(player.name, position, voter, min_rating, max_rating)
+
+    @synchronized
+    def enable_history(self, checkpoint_interval=CHECKPOINT_INTERVAL):
+        """Start keeping a timestamped history of every vote next to the data file"""
+        self.history = RatingHistory.for_data_file(self.filename, checkpoint_interval)
+        # The first checkpoint records the votes that existed before the history
+        self.history.maybe_checkpoint(self.players.values())
+
+    @synchronized
+    def enable_change_log(self):
+        """Append every change event to a JSONL stream next to the data file"""
+        self.change_log = ChangeLog.for_data_file(self.filename)
+        self.events.subscribe(self.change_log)
+
+    def _voter_weights(self, columns):
+        weights = voter_reliability(columns)
+        return dict(zip(columns.voter_names, weights.tolist()))
+
+    @instrumented
+    @synchronized
+    def recompute_aggregates(self):
+        """
+        Recompute every player's aggregate ratings with the team's aggregator
+        in one batched pass over all votes, re-estimating voter weights first
+        when the weighted aggregator is selected.
+        """
+        players = list(self.players.values())
+        columns = VoteColumns.from_players(players)
+
+        voter_weights = None
+        if self.aggregator == "weighted":
+            self.voter_weights = self._voter_weights(columns)
+            voter_weights = np.array([self.voter_weights[v] for v in columns.voter_names])
+
+        mins, maxs = aggregate(columns, self.aggregator, voter_weights)
+        # Positions without votes keep their current values
+        rated = ~np.isnan(mins)
+        notify = self.events.wants(AGGREGATE_CHANGED)
+        for player, min_row, max_row, rated_row in zip(players, mins.tolist(), maxs.tolist(), rated.tolist()):
+            for pos, min_rating, max_rating, has_votes in zip(POSITIONS, min_row, max_row, rated_row):
+                if has_votes:
+                    rating = player.positions[pos]
+                    if notify and (rating['min'], rating['max']) != (min_rating, max_rating):
+                        self.events.emit(AGGREGATE_CHANGED, player.name, pos,
+                                         old=(rating['min'], rating['max']), new=(min_rating, max_rating))
+                    rating['min'] = min_rating
+                    rating['max'] = max_rating
+        self.revision += 1
+
+    @synchronized
+    def set_normalization(self, enabled):
+        """
+        Turn per-voter bias normalization of rankings and lineups on or off.
+        Voter statistics are built once here and then kept up to date by
+        add_rating_vote, so queries never rescan every vote.
+        """
+        self.normalized = enabled
+        if enabled and self.voter_stats is None:
+            self.voter_stats = VoterStats.from_players(self.players.values())
+        elif not enabled:
+            self.voter_stats = None
+        self._normalized_ratings = {}
+        self._normalized_by_voter = {}
+        self.revision += 1
+
+    @synchronized
+    def set_out_of_position(self, enabled, matrix=None):
+        """
+        Turn out-of-position play on or off for lineups.
+
+        Args:
+            enabled (bool): Let players fill slots they aren't rated for, at a discount
+            matrix (np.ndarray): Compatibility matrix to use (see Position_Compatibility);
+                keeps the current one by default
+        """
+        self.out_of_position = enabled
+        if matrix is not None:
+            self.compatibility = matrix
+        self.revision += 1
+
+    @synchronized
+    def position_rating(self, player, position, normalized=None):
+        """
+        A player's (min, max) rating at a position.
+
+        Args:
+            normalized (bool): Use voter-normalized ratings; defaults to the team setting
+        """
+        rating = player.positions[position]
+        if not (self.normalized if normalized is None else normalized):
+            return rating['min'], rating['max']
+
+        if self.voter_stats is None:
+            self.voter_stats = VoterStats.from_players(self.players.values())
+        # A re-anchored team scale changes every normalized rating; otherwise
+        # only the ratings with a vote by a voter whose statistics changed
+        changed = self.voter_stats.take_changed()
+        if self._normalized_generation != self.voter_stats.generation:
+            self._normalized_ratings = {}
+            self._normalized_by_voter = {}
+            self._normalized_generation = self.voter_stats.generation
+        else:
+            for voter in changed:
+                for stale in self._normalized_by_voter.pop(voter, ()):
+                    self._normalized_ratings.pop(stale, None)
+        key = (player.name, position)
+        cached = self._normalized_ratings.get(key)
+        if cached is None:
+            # Positions without votes keep their stored rating
+            cached = self.voter_stats.normalized_aggregate(rating['votes']) or (rating['min'], rating['max'])
+            self._normalized_ratings[key] = cached
+            for vote in rating['votes']:
+                self._normalized_by_voter.setdefault(vote['voter'], set()).add(key)
+        return cached
+
+    @synchronized
+    def lineup_rating(self, player, position):
+        """
+        A player's (min, max) rating at a position as lineups see it: with
+        out-of-position play on, the best compatible rating after its discount.
+        """
+        low, high = self.position_rating(player, position)
+        if not self.out_of_position:
+            return low, high
+        column = POSITION_INDEX[position]
+        for pos, factor in zip(POSITIONS, self.compatibility[:, column]):
+            if factor > 0 and pos != position:
+                pos_low, pos_high = self.position_rating(player, pos)
+                if pos_low * factor > low:
+                    low, high = pos_low * factor, pos_high * factor
+        return low, high
+
+    @synchronized
+    def set_storage(self, storage):
+        """Choose the file layout used by save_players (one of STORAGE_FORMATS)"""
+        if storage not in STORAGE_FORMATS:
+            raise ValueError(f"Invalid storage format: {storage}")
+        self.storage = storage
 
+    @synchronized
+    def set_aggregator(self, aggregator):
+        """Switch how votes are aggregated and recompute every rating"""
+        if aggregator not in AGGREGATORS:
+            raise ValueError(f"Invalid aggregator: {aggregator}")
+        self.aggregator = aggregator
+        if aggregator != "weighted":
+            self.voter_weights = {}
+        self.recompute_aggregates()
+
+    @instrumented
+    @synchronized
     def get_position_gaps(self):
         """Find positions where team lacks strong players (avg rating < 3)"""
         position_ratings = defaultdict(list)
@@ -103,6 +506,61 @@ class Team:
                 gaps[pos] = ratings
         return gaps
 
+    @instrumented
+    @synchronized
+    def rating_matrix(self, players, field='min', normalized=None):
+        """
+        Build a players x POSITIONS matrix of aggregate ratings.
+
+        Args:
+            players (list): Player objects, one row each
+            field (str): 'min' or 'max' aggregate rating
+            normalized (bool): Use voter-normalized ratings; defaults to the team setting
+        """
+        matrix = np.zeros((len(players), len(POSITIONS)))
+        if self.normalized if normalized is None else normalized:
+            column = 0 if field == 'min' else 1
+            for i, player in enumerate(players):
+                matrix[i] = [self.position_rating(player, pos, True)[column] for pos in POSITIONS]
+            return matrix
+
+        for i, player in enumerate(players):
+            positions = player.positions
+            matrix[i] = [positions[pos][field] for pos in POSITIONS]
+        return matrix
+
+    @synchronized
+    def lineup_matrix(self, players, field='min'):
+        """
+        rating_matrix as lineups see it: with out-of-position play on, every
+        position holds the player's best rating discounted by the compatibility
+        matrix, so players fill slots they aren't rated for instead of AI.
+        """
+        ratings = self.rating_matrix(players, field)
+        if not self.out_of_position:
+            return ratings
+        return apply_compatibility(ratings, self.compatibility)
+
+    @instrumented
+    @synchronized
+    def export_snapshot(self, path=None):
+        """
+        Write the rating matrices to a memory-mapped snapshot for worker processes
+        (see Rating_Snapshot). Defaults to <data file>_ratings.snap next to the
+        players file.
+
+        Returns:
+            (path, generation)
+        """
+        if path is None:
+            path = os.path.splitext(self.filename)[0] + "_ratings.snap"
+        players = list(self.players.values())
+        generation = write_snapshot(path, [p.name for p in players],
+                                    self.rating_matrix(players, 'min'), self.rating_matrix(players, 'max'))
+        return path, generation
+
+    @instrumented
+    @synchronized
     def get_best_lineup(self, players_selected, formation, position_mapping):
         """
         Suggest optimal positions for all players based on formation, prioritizing attacking positions
@@ -112,57 +570,37 @@ class Team:
             formation (str): The formation name (e.g., "4-3-3 attacking")
             position_mapping (dict): Maps formation positions to actual positions
         """
-        players = [self.get_player(name) for name in players_selected if self.get_player(name)]
-        # Priority order: Attack -> Midfield -> Defense -> Goalkeeper
-        position_priority = [
-            'ST', 'LW', 'RW', 'CAM',  # Prioritize attacking
-            'LM', 'RM', 'CM', 'CDM',  # Midfield
-            'CB', 'LB', 'RB',         # Defense
-            'GK'                      # Goalkeeper
-        ]
-    
-        # First pass: Create a list of best players for each position
-        all_ratings = {}
-        for player in players:
-            for formation_key, actual_pos in position_mapping.items():
-                rating = player.positions[actual_pos]
-                if rating['min'] > 0:  # Only consider rated positions
-                    all_ratings[(player.name, formation_key)] = rating['min']
+        players = self.selected_players(players_selected)
+        compiled = get_formation(formation, position_mapping)
+        ratings = self.rating_matrix(players)
+        player_rows = {player.name: i for i, player in enumerate(players)}
 
         # Create a list of positions to be filled
-        all_positions = list(position_mapping.keys())
+        all_positions = list(compiled.slots)
         check_positions = all_positions.copy()
 
-        # Create cost matrix for Hungarian algorithm
-        cost_matrix = np.zeros((len(all_positions), len(players)))
+        # Slot x player ratings, out-of-position discounts included; side
+        # affinities below still use the players' own ratings
+        slot_ratings = self.lineup_matrix(players)[:, compiled.slot_index].T
+        player_names = [player.name for player in players]
 
-        player_list = list(players)
-        player_names = [player.name for player in player_list]
-
-        # Fill the cost matrix with negative ratings (since we want to maximize)
-        for i, pos in enumerate(all_positions):
-            for j, player in enumerate(player_list):
-                # If player can play this position
-                if (player.name, pos) in all_ratings:
-                    rating = all_ratings[(player.name, pos)]
-                    cost_matrix[i, j] = -rating  # Maximize ratings (thus, negative for minimization)
-                else:
-                    cost_matrix[i, j] = float('inf')  # Can't assign player to this position
-    
-        # Add prioritization for the top attacking positions
-        for i, pos in enumerate(all_positions):
-            # Give higher priority (larger negative value) for top positions
-            if pos in position_priority:
-                cost_matrix[i] *= 2  # Increase the penalty for not filling top positions (for prioritization)
+        with timed("get_best_lineup.cost_matrix"):
+            # Fill the cost matrix with negative ratings (since we want to maximize),
+            # players can't be assigned to positions they aren't rated for
+            cost_matrix = np.where(slot_ratings > 0, -slot_ratings, np.inf)
+        
+            # Give higher priority (larger negative value) for slots named after a position
+            cost_matrix[compiled.named_positions] *= 2
     
         # Ensure we don't have more positions than players (adjust cost matrix)
-        if len(all_positions) > len(player_list):
+        if len(all_positions) > len(players):
             # Adjust the cost matrix to avoid index out of bounds
-            cost_matrix = cost_matrix[:len(player_list), :]
-            all_positions = all_positions[:len(player_list)]
+            cost_matrix = cost_matrix[:len(players), :]
+            all_positions = all_positions[:len(players)]
 
         # Use Hungarian algorithm to find the optimal assignment
-        row_ind, col_ind = linear_sum_assignment(cost_matrix)
+        with timed("get_best_lineup.solve"):
+            row_ind, col_ind = linear_sum_assignment(cost_matrix)
         lineup = {}
         for i, pos in enumerate(all_positions):
             if i < len(row_ind):
@@ -179,65 +617,65 @@ class Team:
                 lineup[pos] = (player, rating / 2)  # Update the tuple with the new value
     
         # Optimize side assignments (e.g., LCM vs RCM, LB vs RB)
-        side_pairs = [
-            # Midfield pairs
-            ('LCM', 'RCM'), ('LM', 'RM'),
-            # Defensive pairs
-            ('LB', 'RB'), ('LCB', 'RCB'),
-            # Attacking pairs
-            ('LW', 'RW')
-        ]
-    
-        for left_pos, right_pos in side_pairs:
-            if left_pos in lineup and right_pos in lineup:
-                left_player, left_rating = lineup[left_pos]
-                right_player, right_rating = lineup[right_pos]
-            
-                # Get actual player objects (ignore AI players)
-                left_player_obj = self.get_player(left_player) if left_player != "AI" else None
-                right_player_obj = self.get_player(right_player) if right_player != "AI" else None
+        left_affinities = ratings[:, LEFT_SIDE_INDEX].tolist()
+        right_affinities = ratings[:, RIGHT_SIDE_INDEX].tolist()
+
+        for left_index, right_index in compiled.side_pairs:
+            left_pos, right_pos = compiled.slots[left_index], compiled.slots[right_index]
+            left_player, left_rating = lineup[left_pos]
+            right_player, right_rating = lineup[right_pos]
             
-                # Calculate side preference scores
-                left_side_positions = ['LW', 'LM', 'LB']
-                right_side_positions = ['RW', 'RM', 'RB']
+            # Rating matrix rows of the actual players (ignore AI players)
+            left_row = player_rows.get(left_player) if left_player != "AI" else None
+            right_row = player_rows.get(right_player) if right_player != "AI" else None
             
-                if left_player_obj and right_player_obj:
-                    # Calculate left and right side affinity for both players
-                    left_player_left_affinity = sum(left_player_obj.positions[pos]['min'] for pos in left_side_positions)
-                    right_player_left_affinity = sum(right_player_obj.positions[pos]['min'] for pos in left_side_positions)
-
-                    left_player_right_affinity = sum(left_player_obj.positions[pos]['min'] for pos in right_side_positions)
-                    right_player_right_affinity = sum(right_player_obj.positions[pos]['min'] for pos in right_side_positions)
-                    
-                    # Compare current vs. swapped alignment
-                    current_alignment = left_player_left_affinity + right_player_right_affinity
-                    swapped_alignment = right_player_left_affinity + left_player_right_affinity
-
-                    if swapped_alignment > current_alignment:
-                        # Swap players if beneficial
-                        lineup[left_pos] = (right_player, right_rating)
-                        lineup[right_pos] = (left_player, left_rating)
-
-                elif left_player_obj:  # Right position has AI
-                    left_affinity = sum(left_player_obj.positions[pos]['min'] for pos in left_side_positions)
-                    right_affinity = sum(left_player_obj.positions[pos]['min'] for pos in right_side_positions)
-                    
-                    if right_affinity > left_affinity:
-                        # Move player to right position, AI takes left
-                        lineup[right_pos] = (left_player, left_rating)
-                        lineup[left_pos] = ("AI", 0.0)
-
-                elif right_player_obj:  # Left position has AI
-                    left_affinity = sum(right_player_obj.positions[pos]['min'] for pos in left_side_positions)
-                    right_affinity = sum(right_player_obj.positions[pos]['min'] for pos in right_side_positions)
-
-                    if left_affinity > right_affinity:
-                        # Move player to left position, AI takes right
-                        lineup[left_pos] = (right_player, right_rating)
-                        lineup[right_pos] = ("AI", 0.0)
+            if left_row is not None and right_row is not None:
+                # Calculate left and right side affinity for both players
+                left_player_left_affinity = sum(left_affinities[left_row])
+                right_player_left_affinity = sum(left_affinities[right_row])
+
+                left_player_right_affinity = sum(right_affinities[left_row])
+                right_player_right_affinity = sum(right_affinities[right_row])
+                
+                # Compare current vs. swapped alignment
+                current_alignment = left_player_left_affinity + right_player_right_affinity
+                swapped_alignment = right_player_left_affinity + left_player_right_affinity
+
+                if swapped_alignment > current_alignment:
+                    # Swap players if beneficial
+                    lineup[left_pos] = (right_player, right_rating)
+                    lineup[right_pos] = (left_player, left_rating)
+
+            elif left_row is not None:  # Right position has AI
+                left_affinity = sum(left_affinities[left_row])
+                right_affinity = sum(right_affinities[left_row])
+                
+                if right_affinity > left_affinity:
+                    # Move player to right position, AI takes left
+                    lineup[right_pos] = (left_player, left_rating)
+                    lineup[left_pos] = ("AI", 0.0)
+
+            elif right_row is not None:  # Left position has AI
+                left_affinity = sum(left_affinities[right_row])
+                right_affinity = sum(right_affinities[right_row])
+
+                if left_affinity > right_affinity:
+                    # Move player to left position, AI takes right
+                    lineup[left_pos] = (right_player, right_rating)
+                    lineup[right_pos] = ("AI", 0.0)
 
         return lineup
 
+    def _slot_ratings(self, players, compiled, ratings):
+        """Map (player name, slot) to the player's rating there, for rated slots only"""
+        slot_ratings = ratings[:, compiled.slot_index]
+        all_ratings = {}
+        for i, j in zip(*np.nonzero(slot_ratings > 0)):
+            all_ratings[(players[i].name, compiled.slots[j])] = float(slot_ratings[i, j])
+        return all_ratings
+
+    @instrumented
+    @synchronized
     def get_balanced_lineup(self, players_selected, formation, position_mapping):
         """
         Generate a balanced lineup that distributes talent across all areas of the field.
@@ -246,45 +684,36 @@ class Team:
             formation (str): The formation name (e.g., "4-3-3 attacking")
             position_mapping (dict): Maps formation positions to actual positions
         """
-        players = [self.get_player(name) for name in players_selected if self.get_player(name)]
+        players = self.selected_players(players_selected)
+        compiled = get_formation(formation, position_mapping)
+        ratings = self.rating_matrix(players)
+
         # First, get all player ratings for each position
-        all_ratings = {}
-        for player in players:
-            for formation_key, actual_pos in position_mapping.items():
-                rating = player.positions[actual_pos]
-                if rating['min'] > 0:  # Only consider rated positions
-                    all_ratings[(player.name, formation_key)] = rating['min']
-        
-        # Group positions by field area
-        field_areas = {
-            "defense": ["LB", "RB", "CB", "LCB", "RCB", "LWB", "RWB"],
-            "midfield": ["CDM", "CM", "LM", "RM", "LCM", "RCM", "CM1", "CM2"],
-            "attack": ["CAM", "ST", "LW", "RW", "ST1", "ST2", "LAM", "RAM"]
-        }
-        
-        # Reverse mapping from formation position to field area
-        position_to_area = {}
-        for area, positions in field_areas.items():
-            for pos in positions:
-                position_to_area[pos] = area
+        lineup_ratings = self.lineup_matrix(players)
+        all_ratings = self._slot_ratings(players, compiled, lineup_ratings)
         
-        # Split positions by area
-        positions_by_area = {area: [] for area in field_areas}
-        for pos in position_mapping.keys():
-            area = next((a for a in field_areas if any(p in pos for p in field_areas[a])), "midfield")
-            positions_by_area[area].append(pos)
+        # Split positions by field area; the goalkeeper is allocated with the midfield
+        area_names = {
+            AREA_GOALKEEPER: "midfield",
+            AREA_DEFENSE: "defense",
+            AREA_MIDFIELD: "midfield",
+            AREA_ATTACK: "attack"
+        }
+        positions_by_area = {"defense": [], "midfield": [], "attack": []}
+        for pos, area in zip(compiled.slots, compiled.areas):
+            positions_by_area[area_names[area]].append(pos)
         
         # Order players by overall average rating
         player_overall_ratings = {}
-        for player in players:
-            valid_ratings = [r['min'] for _, r in player.positions.items() if r['min'] > 0]
+        for player, row in zip(players, ratings.tolist()):
+            valid_ratings = [r for r in row if r > 0]
             if valid_ratings:
                 player_overall_ratings[player.name] = sum(valid_ratings) / len(valid_ratings)
         
         sorted_players = sorted(player_overall_ratings.items(), key=lambda x: x[1], reverse=True)
         
         # Allocate the top players evenly across areas
-        area_allocations = {area: [] for area in field_areas}
+        area_allocations = {area: [] for area in positions_by_area}
         area_cycle = ["defense", "midfield", "attack"] * (len(sorted_players) // 3 + 1)
         
         for i, (player_name, _) in enumerate(sorted_players):
@@ -344,6 +773,8 @@ class Team:
         
         return lineup
 
+    @instrumented
+    @synchronized
     def get_attack_focused_lineup(self, players_selected, formation, position_mapping):
         """
         Generate an attack-focused lineup that prioritizes placing best players in attacking positions.
@@ -352,25 +783,21 @@ class Team:
             formation (str): The formation name (e.g., "4-3-3 attacking")
             position_mapping (dict): Maps formation positions to actual positions
         """
-        players = [self.get_player(name) for name in players_selected if self.get_player(name)]
+        players = self.selected_players(players_selected)
+        compiled = get_formation(formation, position_mapping)
+        ratings = self.rating_matrix(players)
+
         # First, get all player ratings for each position
-        all_ratings = {}
-        for player in players:
-            for formation_key, actual_pos in position_mapping.items():
-                rating = player.positions[actual_pos]
-                if rating['min'] > 0:  # Only consider rated positions
-                    all_ratings[(player.name, formation_key)] = rating['min']
+        lineup_ratings = self.lineup_matrix(players)
+        all_ratings = self._slot_ratings(players, compiled, lineup_ratings)
         
-        # Define attacking positions (adjust based on formation)
-        attacking_positions = [
-            "ST", "ST1", "ST2", "LW", "RW", "CAM", "LAM", "RAM"
-        ]
+        # Attacking slots of this formation
+        attacking_slots = [i for i, area in enumerate(compiled.areas) if area == AREA_ATTACK]
         
         # Calculate player overall ratings (for non-attacking positions)
         player_overall_ratings = {}
-        for player in players:
-            valid_ratings = [r['min'] for p, r in player.positions.items() 
-                            if r['min'] > 0 and p not in ["ST", "LW", "RW", "CAM"]]
+        for player, row in zip(players, ratings[:, NON_ATTACK_INDEX].tolist()):
+            valid_ratings = [r for r in row if r > 0]
             if valid_ratings:
                 player_overall_ratings[player.name] = sum(valid_ratings) / len(valid_ratings)
         
@@ -379,13 +806,11 @@ class Team:
         attacking_assignments = []
         
         # Get all player ratings for attacking positions
-        for player in players:
-            for pos_key in position_mapping:
-                if any(attack_pos in pos_key for attack_pos in attacking_positions):
-                    actual_pos = position_mapping[pos_key]
-                    rating = player.positions[actual_pos]
-                    if rating['min'] > 0:
-                        attacking_assignments.append((player.name, pos_key, rating['min']))
+        attacking_ratings = lineup_ratings[:, compiled.slot_index[attacking_slots]].tolist()
+        for player, row in zip(players, attacking_ratings):
+            for slot, rating in zip(attacking_slots, row):
+                if rating > 0:
+                    attacking_assignments.append((player.name, compiled.slots[slot], rating))
         
         # Sort attacking assignments by rating
         attacking_assignments.sort(key=lambda x: x[2], reverse=True)
@@ -432,10 +857,28 @@ class Team:
         
         return lineup
 
+    @synchronized
+    def get_anytime_lineup(self, players_selected, formation, position_mapping,
+                           time_budget=DEFAULT_TIME_BUDGET, target_gap=0.0):
+        """
+        Improve the balanced and attack-focused lineups with local search for at
+        most time_budget seconds (see Anytime_Solver.anytime_lineup).
+
+        Args:
+            formation (str): The formation name (e.g., "4-3-3 attacking")
+            position_mapping (dict): Maps formation positions to actual positions
+            time_budget (float): Seconds to search
+            target_gap (float): Stop once the lineup is within this of the best possible score
+        """
+        return anytime_lineup(self, players_selected, formation, position_mapping,
+                              time_budget=time_budget, target_gap=target_gap).lineup
+
+    @instrumented
+    @synchronized
     def compare_players(self, player_names, position=None):
         """Compare specified players across all or specific position"""
         comparisons = []
-        players = [self.get_player(name) for name in player_names if self.get_player(name)]
+        players = self.selected_players(player_names)
         
         positions_to_compare = [position] if position in POSITIONS else POSITIONS
 
@@ -453,21 +896,28 @@ class Team:
 
         return comparisons
 
-    def get_top_players_by_position(self, position, limit=3):
-        """Get top rated players for a specific position"""
+    @instrumented
+    @synchronized
+    def get_top_players_by_position(self, position, limit=3, normalized=None):
+        """Get top rated players for a specific position (optionally voter-normalized)"""
+        normalized = self.normalized if normalized is None else normalized
         players_ratings = []
         for player in self.players.values():
-            rating = player.positions[position]
-            if rating['min'] > 0:  # Only include rated players
+            if normalized:
+                min_rating, max_rating = self.position_rating(player, position, True)
+            else:
+                rating = player.positions[position]
+                min_rating, max_rating = rating['min'], rating['max']
+            if min_rating > 0:  # Only include rated players
                 # Determine if this is a range or single value
-                is_range = rating['min'] != rating['max']
+                is_range = min_rating != max_rating
                 # Add a flag (0 for range, 1 for single value) to prioritize single values
                 priority_flag = 0 if is_range else 1
                 players_ratings.append((
                     player.name,
-                    rating['max'],  # Max value first for primary sorting
+                    max_rating,  # Max value first for primary sorting
                     priority_flag,  # Single values prioritized over ranges
-                    rating['min'],  # Min value last
+                    min_rating,  # Min value last
                 ))
         
         # Sort by max rating (desc), then by single/range flag (desc), then by min rating (desc)
@@ -492,16 +942,72 @@ class Team:
         
         return ranked_players[:limit]
 
+    @property
+    def name_index(self):
+        """NameIndex over the player names and aliases, built on first use"""
+        with self.lock:
+            if self._name_index is None:
+                self._name_index = NameIndex(self.players, self.aliases)
+            return self._name_index
+
+    def _index_new_player(self, event):
+        if self._name_index is not None:
+            self._name_index.add(event.player)
+
     def get_player(self, player_name):
-        formatted_name = player_name.strip().title()
-        return self.players.get(formatted_name)
+        # Not instrumented or wrapped: it runs once per imported vote and menu entry
+        player = self.players.get(player_name)
+        if player is None:
+            # Names are stored title-cased (see add_player)
+            player = self.players.get(player_name.strip().title())
+        if player is None:
+            # Any other capitalisation or spacing of a name, or an alias
+            with self.lock:
+                index = self.name_index
+                row = index.lookup(player_name)
+                if row is not None:
+                    player = self.players.get(index.names[row])
+        return player
+
+    @instrumented
+    @synchronized
+    def resolve_players(self, player_names, suggestions=3):
+        """
+        Resolve a whole selection of names or aliases in one call.
+
+        Returns:
+            NameResolution: Row ids (positions in self.players), canonical
+            names and fuzzy suggestions for the names that weren't found
+        """
+        return self.name_index.resolve(player_names, suggestions)
+
+    @synchronized
+    def selected_players(self, player_names):
+        """Player objects of the names that resolve, in order, without suggestions"""
+        found = self.name_index.resolve(player_names, 0).found
+        return [self.players[name] for name in found if name in self.players]
+
+    @synchronized
+    def add_alias(self, alias, player_name):
+        """Let alias (e.g. a nickname) stand for a player everywhere names are entered"""
+        player = self.get_player(player_name)
+        if not player:
+            raise ValueError(f"Player {player_name} not found")
+        self.name_index.add_alias(alias, player.name)
+        self.aliases[alias] = player.name
 
+    @instrumented
+    @synchronized
     def add_player(self, player_name):
         formatted_name = player_name.strip().title()
         if formatted_name not in self.players:
-            self.players[formatted_name] = Player(formatted_name)
+            player = self.players[formatted_name] = Player(formatted_name)
+            player.events = self.events
+            self.revision += 1
+            self.events.emit(PLAYER_ADDED, formatted_name)
         return self.players[formatted_name]
 
+    @instrumented
     def display_player_ratings(self, player_name):
         player = self.get_player(player_name)
         if not player:
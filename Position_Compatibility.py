@@ -0,0 +1,66 @@
+# Position_Compatibility.py
+import json
+import numpy as np
+from Formations import POSITIONS, POSITION_INDEX
+
+# Share of a player's rating kept when they play out of position:
+# rated position -> {position they can cover: discount factor}
+DEFAULT_COMPATIBILITY = {
+    "GK": {},
+    "LB": {"RB": 0.85, "LM": 0.85, "CB": 0.8},
+    "CB": {"CDM": 0.85, "LB": 0.8, "RB": 0.8},
+    "RB": {"LB": 0.85, "RM": 0.85, "CB": 0.8},
+    "CDM": {"CM": 0.9, "CB": 0.85},
+    "CM": {"CDM": 0.9, "CAM": 0.9, "LM": 0.8, "RM": 0.8},
+    "LM": {"LW": 0.9, "RM": 0.85, "LB": 0.8, "CM": 0.8},
+    "RM": {"RW": 0.9, "LM": 0.85, "RB": 0.8, "CM": 0.8},
+    "CAM": {"CM": 0.9, "ST": 0.8, "LW": 0.8, "RW": 0.8},
+    "LW": {"LM": 0.9, "RW": 0.85, "ST": 0.8},
+    "RW": {"RM": 0.9, "LW": 0.85, "ST": 0.8},
+    "ST": {"CAM": 0.8, "LW": 0.8, "RW": 0.8},
+}
+
+
+def compatibility_matrix(table=None):
+    """
+    Build the POSITIONS x POSITIONS discount matrix of a compatibility table.
+
+    Entry [r, q] is the share of a rating at position r a player keeps at
+    position q; the diagonal is 1 and pairs missing from the table are 0.
+
+    Args:
+        table (dict): Rated position -> {other position: factor}; defaults to
+            DEFAULT_COMPATIBILITY
+
+    Raises:
+        ValueError: For unknown positions or factors outside [0, 1]
+    """
+    matrix = np.eye(len(POSITIONS))
+    for rated, covers in (DEFAULT_COMPATIBILITY if table is None else table).items():
+        for position, factor in covers.items():
+            if rated not in POSITION_INDEX or position not in POSITION_INDEX:
+                raise ValueError(f"Invalid position pair: {rated} -> {position}")
+            if not isinstance(factor, (int, float)) or not 0 <= factor <= 1:
+                raise ValueError(f"Invalid factor for {rated} -> {position}: {factor}")
+            if rated != position:
+                matrix[POSITION_INDEX[rated], POSITION_INDEX[position]] = factor
+    return matrix
+
+
+def load_compatibility(path):
+    """Read a compatibility table from JSON (same shape as DEFAULT_COMPATIBILITY)"""
+    with open(path, 'r') as f:
+        table = json.load(f)
+    if not isinstance(table, dict) or not all(isinstance(covers, dict) for covers in table.values()):
+        raise ValueError("Compatibility file must map positions to {position: factor} objects")
+    return compatibility_matrix(table)
+
+
+def apply_compatibility(ratings, matrix):
+    """
+    Effective players x POSITIONS ratings: at every position, the best of the
+    player's ratings discounted by the compatibility matrix (a max-product of
+    ratings and matrix, broadcast in one step).
+    """
+    return (ratings[:, :, None] * matrix[None, :, :]).max(axis=1)
+
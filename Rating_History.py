@@ -0,0 +1,259 @@
+# Rating_History.py
+import bisect
+import copy
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from Formations import POSITIONS, POSITION_INDEX
+from Change_Feed import ChangeFeed
+from Aggregation import VoteColumns
+
+# Minimum number of changes between two checkpoints
+CHECKPOINT_INTERVAL = 500
+
+
+def _to_millis(when):
+    """Epoch milliseconds from a datetime, epoch seconds or None (now)"""
+    if when is None:
+        return int(time.time() * 1000)
+    if isinstance(when, datetime):
+        return int(when.timestamp() * 1000)
+    return int(when * 1000)
+
+
+class RatingHistory:
+    """
+    Append-only history of rating votes with periodic checkpoints.
+
+    Three files sit next to the data file:
+        <base>_history.jsonl       one change per line: [ms since previous change,
+                                   player id, position id, voter id, min, max]
+        <base>_history_names.jsonl interned names: ["p", name] or ["v", name]
+        <base>_history_checkpoints.jsonl
+                                   "<time ms> <change count> <history offset> <vote count> <votes json>"
+
+    A checkpoint holds every vote at that moment, so "ratings as of D" loads the
+    nearest checkpoint before D and replays only the changes after it. A new
+    checkpoint is written once at least max(checkpoint_interval, votes in the
+    previous checkpoint) changes have happened, so checkpoints never take more
+    space than the changes themselves.
+    """
+
+    def __init__(self, base_path, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.history_path = f"{base_path}_history.jsonl"
+        self.names_path = f"{base_path}_history_names.jsonl"
+        self.checkpoints_path = f"{base_path}_history_checkpoints.jsonl"
+        self.checkpoint_interval = checkpoint_interval
+
+        self.player_names, self.voter_names = [], []
+        self.player_ids, self.voter_ids = {}, {}
+        # (time ms, change count, history offset, line offset in the checkpoints file)
+        self.checkpoints = []
+        self.changes = 0
+        self.last_time = 0
+        self.changes_since_checkpoint = 0
+        self.last_checkpoint_size = 0
+
+        self._load_names()
+        self._load_checkpoint_index()
+        self._history = open(self.history_path, 'a', encoding='utf-8')
+        self._names = open(self.names_path, 'a', encoding='utf-8')
+        self._catch_up()
+
+    @classmethod
+    def for_data_file(cls, filename, checkpoint_interval=CHECKPOINT_INTERVAL):
+        """History stored next to a players data file"""
+        return cls(os.path.splitext(filename)[0], checkpoint_interval)
+
+    # -----------------------------------------------------------------------
+    # Loading
+    # -----------------------------------------------------------------------
+
+    def _load_names(self):
+        if not os.path.exists(self.names_path):
+            return
+        with open(self.names_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    kind, name = json.loads(line)
+                    self._intern(kind, name, write=False)
+
+    def _load_checkpoint_index(self):
+        """Read checkpoint headers only; the votes are parsed when a query needs them"""
+        if not os.path.exists(self.checkpoints_path):
+            return
+        with open(self.checkpoints_path, 'rb') as f:
+            while True:
+                line_offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                checkpoint_time, count, history_offset, size, _ = line.split(b' ', 4)
+                self.checkpoints.append((int(checkpoint_time), int(count), int(history_offset), line_offset))
+                self.last_checkpoint_size = int(size)
+
+    def _catch_up(self):
+        """Find the time and count of the last change by replaying after the last checkpoint"""
+        if self.checkpoints:
+            self.last_time, self.changes, offset, _ = self.checkpoints[-1]
+        else:
+            offset = 0
+        for delta, *_ in self._read_changes(offset):
+            self.last_time += delta
+            self.changes += 1
+            self.changes_since_checkpoint += 1
+
+    def _read_changes(self, offset):
+        if not os.path.exists(self.history_path):
+            return
+        with open(self.history_path, 'r', encoding='utf-8') as f:
+            f.seek(offset)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _intern(self, kind, name, write=True):
+        ids, names = (self.player_ids, self.player_names) if kind == "p" else (self.voter_ids, self.voter_names)
+        index = ids.get(name)
+        if index is None:
+            index = ids[name] = len(names)
+            names.append(name)
+            if write:
+                self._names.write(json.dumps([kind, name]) + "\n")
+        return index
+
+    # -----------------------------------------------------------------------
+    # Recording
+    # -----------------------------------------------------------------------
+
+    def record(self, player_name, position, voter, min_rating, max_rating, when=None):
+        """Append one vote change"""
+        now = max(_to_millis(when), self.last_time)
+        change = [now - self.last_time, self._intern("p", player_name), POSITION_INDEX[position],
+                  self._intern("v", voter), min_rating, max_rating]
+        self._history.write(json.dumps(change, separators=(',', ':')) + "\n")
+        self.last_time = now
+        self.changes += 1
+        self.changes_since_checkpoint += 1
+
+    def checkpoint_due(self):
+        if not self.checkpoints:
+            return True
+        return self.changes_since_checkpoint >= max(self.checkpoint_interval, self.last_checkpoint_size)
+
+    def checkpoint(self, players, when=None):
+        """Write the full vote state of the given Player objects"""
+        self.flush()
+        columns = VoteColumns.from_players(players)
+        player_ids = [self._intern("p", name) for name in columns.player_names]
+        voter_ids = [self._intern("v", name) for name in columns.voter_names]
+        votes = [[player_ids[player], position, voter_ids[voter], low, high]
+                 for player, position, voter, low, high in zip(
+                     columns.player_ids.tolist(), columns.position_ids.tolist(), columns.voter_ids.tolist(),
+                     columns.mins.tolist(), columns.maxs.tolist())]
+        self._names.flush()
+
+        checkpoint_time = max(_to_millis(when), self.last_time)
+        history_offset = os.path.getsize(self.history_path)
+        line_offset = os.path.getsize(self.checkpoints_path) if os.path.exists(self.checkpoints_path) else 0
+        with open(self.checkpoints_path, 'ab') as f:
+            header = f"{checkpoint_time} {self.changes} {history_offset} {len(votes)} "
+            f.write((header + json.dumps(votes, separators=(',', ':')) + "\n").encode('utf-8'))
+
+        self.checkpoints.append((checkpoint_time, self.changes, history_offset, line_offset))
+        self.last_time = checkpoint_time
+        self.changes_since_checkpoint = 0
+        self.last_checkpoint_size = len(votes)
+
+    def maybe_checkpoint(self, players):
+        if self.checkpoint_due():
+            self.checkpoint(players)
+
+    def flush(self):
+        self._names.flush()
+        self._history.flush()
+
+    def close(self):
+        self.flush()
+        self._history.close()
+        self._names.close()
+
+    # -----------------------------------------------------------------------
+    # Point-in-time queries
+    # -----------------------------------------------------------------------
+
+    def votes_as_of(self, when):
+        """
+        Rebuild every vote as it stood at a point in time.
+
+        Returns:
+            dict: {player name: {position: {voter: (min, max)}}}
+        """
+        self.flush()
+        target = _to_millis(when)
+        index = bisect.bisect_right([c[0] for c in self.checkpoints], target) - 1
+        if index < 0:
+            raise ValueError("No rating history before that date")
+        checkpoint_time, _, history_offset, line_offset = self.checkpoints[index]
+
+        state = {}
+        with open(self.checkpoints_path, 'rb') as f:
+            f.seek(line_offset)
+            votes = json.loads(f.readline().split(b' ', 4)[4])
+        for player_id, position_id, voter_id, min_rating, max_rating in votes:
+            positions = state.setdefault(self.player_names[player_id], {})
+            positions.setdefault(POSITIONS[position_id], {})[self.voter_names[voter_id]] = (min_rating, max_rating)
+
+        current = checkpoint_time
+        for delta, player_id, position_id, voter_id, min_rating, max_rating in self._read_changes(history_offset):
+            current += delta
+            if current > target:
+                break
+            positions = state.setdefault(self.player_names[player_id], {})
+            positions.setdefault(POSITIONS[position_id], {})[self.voter_names[voter_id]] = (min_rating, max_rating)
+        return state
+
+    def players_as_of(self, when, aggregator="mean", voter_weights=None):
+        """Player objects with the votes and aggregates they had at a point in time"""
+        from Player_Stats import Player
+
+        players = {}
+        for name, positions in self.votes_as_of(when).items():
+            player = players[name] = Player(name)
+            for pos, votes in positions.items():
+                player.positions[pos]['votes'] = [
+                    {'voter': voter, 'min': min_rating, 'max': max_rating}
+                    for voter, (min_rating, max_rating) in votes.items()
+                ]
+                player.update_aggregate(pos, aggregator, voter_weights)
+        return players
+
+
+def team_as_of(team, when):
+    """
+    A read-only copy of a team with the ratings it had at a point in time, usable
+    with every Team method (e.g. get_best_lineup for "best lineup as of D").
+    """
+    if team.history is None:
+        raise ValueError("Rating history is not enabled for this team")
+    snapshot = copy.copy(team)
+    snapshot.players = team.history.players_as_of(when, team.aggregator, team.voter_weights)
+    # Alias or weight edits on the copy must not reach the live team
+    snapshot.aliases = dict(team.aliases)
+    snapshot.voter_weights = dict(team.voter_weights)
+    snapshot.lock = threading.RLock()
+    snapshot.history = None
+    snapshot.filename = None
+    # Names resolve against the past roster, rebuilt on first use
+    snapshot._name_index = None
+    # Changes to the copy are nobody else's business
+    snapshot.events = ChangeFeed()
+    snapshot.change_log = None
+    # Voter statistics must describe the past votes, not today's
+    snapshot.voter_stats = None
+    snapshot.set_normalization(team.normalized)
+    return snapshot
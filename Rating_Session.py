@@ -0,0 +1,82 @@
+# Rating_Session.py
+from Formations import POSITIONS
+
+
+class RatingSession:
+    """
+    Buffer a voter's votes and apply them all at once.
+
+    Nothing touches the team until commit(), which applies every buffered vote
+    with one aggregate update per position (Team.apply_votes) and saves the
+    team once. rollback() drops the buffer. Used as a context manager, the
+    session commits when the block finishes and rolls back if it raises
+    (including KeyboardInterrupt), so an interrupted ballot leaves no trace.
+
+        with RatingSession(team, "Alex") as session:
+            session.add("Sam", "ST", 3, 4)
+            session.add("Sam", "CAM", 2.5, 3)
+    """
+
+    def __init__(self, team, voter, save=True):
+        self.team = team
+        self.voter = voter
+        self.save = save
+        # (player name, position) -> (min, max); a later vote replaces an earlier one
+        self.pending = {}
+        self.committed = False
+        # Votes applied by commit()
+        self.applied = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def add(self, player_name, position, min_rating, max_rating):
+        """Buffer a vote; invalid votes are rejected here rather than at commit"""
+        if self.committed:
+            raise ValueError("Rating session already committed")
+        player = self.team.get_player(player_name)
+        if not player:
+            raise ValueError(f"Player {player_name} not found")
+        if position not in POSITIONS:
+            raise ValueError(f"Invalid position: {position}")
+        if not (0 <= min_rating <= 5 and 0 <= max_rating <= 5):
+            raise ValueError(f"Ratings must be between 0 and 5 (got {min_rating}-{max_rating})")
+        self.pending[(player.name, position)] = (min_rating, max_rating)
+
+    def pending_vote(self, player_name, position):
+        """A buffered (min, max) vote, or None"""
+        return self.pending.get((player_name, position))
+
+    def rollback(self):
+        """Discard every buffered vote"""
+        self.pending.clear()
+
+    def commit(self):
+        """
+        Apply the buffered votes and save once.
+
+        Returns:
+            int: Number of votes applied
+        """
+        if self.committed:
+            return 0
+        votes = [(player_name, position, min_rating, max_rating, self.voter)
+                 for (player_name, position), (min_rating, max_rating) in self.pending.items()]
+        if votes:
+            self.team.apply_votes(votes)
+            if self.save:
+                self.team.save_players()
+        self.pending.clear()
+        self.committed = True
+        self.applied = len(votes)
+        return self.applied
@@ -0,0 +1,152 @@
+# Rating_Snapshot.py
+"""
+Read-only rating snapshots for worker processes.
+
+A snapshot is a fixed-layout binary file holding the aggregate min and max
+rating matrices and the player names. Workers open it with numpy.memmap, so
+startup costs the same for ten players as for a hundred thousand and every
+worker shares the operating system's page cache instead of parsing its own
+copy of the players file.
+
+Layout (little-endian):
+    header   64 bytes: magic, version, generation, players, positions,
+             names offset, names length, reserved
+    mins     float32 (players, positions)
+    maxs     float32 (players, positions)
+    names    UTF-8 player names separated by newlines
+
+Writers replace the file atomically, so a worker that is still mapping an old
+snapshot keeps a consistent view until it calls refresh().
+"""
+import os
+import struct
+import numpy as np
+from Formations import POSITIONS, POSITION_INDEX
+
+SNAPSHOT_MAGIC = b"LINEUPRS"
+SNAPSHOT_VERSION = 1
+# magic, version, generation, players, positions, names offset, names length
+HEADER_FORMAT = "<8sIQIIQQ"
+HEADER_SIZE = 64
+RATING_DTYPE = np.dtype('<f4')
+
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        return _parse_header(f.read(HEADER_SIZE), path)
+
+
+def _parse_header(raw, path):
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"Truncated rating snapshot: {path}")
+    magic, version, generation, n_players, n_positions, names_offset, names_length = \
+        struct.unpack_from(HEADER_FORMAT, raw)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"Not a rating snapshot: {path}")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported rating snapshot version: {version}")
+    if n_positions != len(POSITIONS):
+        raise ValueError("Rating snapshot was written with different positions")
+    return generation, n_players, names_offset, names_length
+
+
+def read_generation(path):
+    """Generation of the snapshot currently at path, or 0 if there is none"""
+    try:
+        return _read_header(path)[0]
+    except FileNotFoundError:
+        return 0
+
+
+def write_snapshot(path, names, mins, maxs, generation=None):
+    """
+    Write a snapshot and return its generation.
+
+    Args:
+        names (list): Player name of each row
+        mins, maxs (np.ndarray): (players, len(POSITIONS)) aggregate ratings
+        generation (int): Defaults to one more than the snapshot being replaced
+    """
+    if generation is None:
+        generation = read_generation(path) + 1
+    mins = np.ascontiguousarray(mins, dtype=RATING_DTYPE)
+    maxs = np.ascontiguousarray(maxs, dtype=RATING_DTYPE)
+    if mins.shape != (len(names), len(POSITIONS)) or maxs.shape != mins.shape:
+        raise ValueError("Rating matrices must have one row per name and one column per position")
+
+    encoded_names = "\n".join(names).encode('utf-8')
+    names_offset = HEADER_SIZE + mins.nbytes + maxs.nbytes
+    header = struct.pack(HEADER_FORMAT, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, generation,
+                         len(names), len(POSITIONS), names_offset, len(encoded_names))
+
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(mins.tobytes())
+        f.write(maxs.tobytes())
+        f.write(encoded_names)
+    os.replace(temp_path, path)
+    return generation
+
+
+class RatingSnapshot:
+    """
+    Zero-copy, read-only view of a snapshot file.
+
+    Attributes:
+        generation (int): Generation of the mapped snapshot
+        mins, maxs (np.memmap): (players, len(POSITIONS)) read-only ratings
+        names (list): Player name of each row
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map()
+
+    def _map(self):
+        # Header, matrices and names all come from one open file, so a writer
+        # replacing the path in between can't mix two generations
+        with open(self.path, 'rb') as f:
+            generation, n_players, names_offset, names_length = _parse_header(f.read(HEADER_SIZE), self.path)
+            shape = (n_players, len(POSITIONS))
+            if n_players:
+                mins = np.memmap(f, dtype=RATING_DTYPE, mode='r', offset=HEADER_SIZE, shape=shape)
+                maxs = np.memmap(f, dtype=RATING_DTYPE, mode='r', offset=HEADER_SIZE + mins.nbytes, shape=shape)
+            else:
+                # memmap can't map an empty region
+                mins = maxs = np.zeros(shape, dtype=RATING_DTYPE)
+            f.seek(names_offset)
+            raw = f.read(names_length)
+        self.generation = generation
+        self.n_players = n_players
+        self.mins, self.maxs = mins, maxs
+        self.names = raw.decode('utf-8').split("\n") if n_players else []
+        self._index = None
+
+    @property
+    def index(self):
+        """Player name -> row"""
+        if self._index is None:
+            self._index = {name: row for row, name in enumerate(self.names)}
+        return self._index
+
+    def is_stale(self):
+        """True if a newer snapshot has been written since this one was mapped"""
+        return read_generation(self.path) != self.generation
+
+    def refresh(self):
+        """Remap the file if a newer snapshot exists; returns True if it did"""
+        if not self.is_stale():
+            return False
+        self._map()
+        return True
+
+    def rating(self, name, position):
+        """(min, max) rating of a player at a position"""
+        row, column = self.index[name], POSITION_INDEX[position]
+        return float(self.mins[row, column]), float(self.maxs[row, column])
+
+    def rating_matrix(self, names, field='min'):
+        """Rows of the named players, in the given order, as a regular array"""
+        source = self.mins if field == 'min' else self.maxs
+        return np.asarray(source[[self.index[name] for name in names]], dtype=float)
@@ -0,0 +1,102 @@
+# Solve_Tasks.py
+import threading
+import time
+
+
+class SolveTask:
+    """
+    Run a solve on a worker thread with progress reporting and cancellation.
+
+    Cancellable functions take progress and cancel keyword arguments: they
+    call progress(done, total) as they go and return their best answer so far
+    once the cancel event is set (see search_formations, leave_one_out_values
+    and simulate_matches). Other functions simply run in the background.
+
+    A solve that reads a Team should pass its lock (Team.lock): the worker
+    holds it for the whole solve, so other threads such as the lineup
+    precomputer never touch the team at the same time.
+
+        task = SolveTask(search_formations, team, players, cancellable=True, lock=team.lock).start()
+        result = task.wait(on_progress=print)  # Ctrl-C cancels and still returns
+    """
+
+    def __init__(self, func, *args, cancellable=False, lock=None, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancellable = cancellable
+        self.lock = lock
+        self.cancel_event = threading.Event()
+        # Set when the function returns; waiting on it survives Ctrl-C, which
+        # can leave an interrupted Thread.join() reporting a live thread as dead
+        self.finished = threading.Event()
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.started = None
+        self._thread = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def _progress(self, done, total):
+        self.done, self.total = done, total
+
+    def _run(self):
+        if self.lock is not None:
+            with self.lock:
+                self._call()
+        else:
+            self._call()
+
+    def _call(self):
+        try:
+            if self.cancellable:
+                self.result = self.func(*self.args, progress=self._progress,
+                                        cancel=self.cancel_event, **self.kwargs)
+            else:
+                self.result = self.func(*self.args, **self.kwargs)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.finished.set()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"solve-{self.func.__name__}")
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_running(self):
+        return self._thread is not None and not self.finished.is_set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.started else 0.0
+
+    def wait(self, on_progress=None, interval=0.1):
+        """
+        Wait for the result, calling on_progress(task) every interval seconds.
+
+        Ctrl-C sets the cancel event and waits for the function to return its
+        best answer so far (a non-cancellable solve returns None instead).
+
+        Raises:
+            Exception: Whatever the solve raised
+        """
+        try:
+            while not self.finished.wait(interval):
+                if on_progress:
+                    on_progress(self)
+        except KeyboardInterrupt:
+            self.cancel()
+            if not self.cancellable:
+                return None
+            self.finished.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
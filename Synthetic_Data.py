@@ -0,0 +1,85 @@
+# Synthetic_Data.py
+import json
+import math
+import random
+from Formations import POSITIONS
+from Team_File import SCHEMA_VERSION
+
+# Typical rating (mean, spread) of a player who plays each position.
+# Goalkeepers are specialists, so few players get a GK rating at all.
+POSITION_RATING_PROFILES = {
+    "GK": (2.5, 1.3), "LB": (2.8, 1.0), "CB": (3.0, 1.0), "RB": (2.8, 1.0),
+    "CDM": (3.0, 1.0), "CM": (3.2, 0.9), "LM": (3.0, 1.0), "RM": (3.0, 1.0),
+    "CAM": (3.1, 1.0), "LW": (3.0, 1.1), "RW": (3.0, 1.1), "ST": (3.1, 1.1),
+}
+# Chance that a player is rated at a position at all
+POSITION_COVERAGE = {pos: (0.1 if pos == "GK" else 0.45) for pos in POSITIONS}
+
+
+def _clamp_rating(value):
+    """Round to the nearest half point inside the 0-5 rating scale"""
+    return min(5.0, max(0.0, round(value * 2) / 2))
+
+
+def generate_team_data(n_players, n_voters=None, votes_per_position=3.0, seed=0,
+                       team_name="Synthetic FC"):
+    """
+    Generate a team in the players_data.json format.
+
+    Every player gets a hidden true rating at the positions they play, drawn
+    from POSITION_RATING_PROFILES. Each rated position receives a Poisson-like
+    number of votes from random voters, each vote being the true rating plus
+    the voter's personal bias and some noise, and sometimes a range.
+
+    Args:
+        n_players (int): Number of players
+        n_voters (int): Number of distinct voters (defaults to min(n_players, 40))
+        votes_per_position (float): Average votes for each rated position
+        seed (int): Random seed, the same seed always gives the same data
+        team_name (str): Team name stored in the data
+
+    Returns:
+        dict: {'schema_version': ..., 'team_name': ..., 'players': {name: player dict}}
+    """
+    rng = random.Random(seed)
+    n_voters = n_voters or min(max(n_players, 1), 40)
+    voters = [f"Voter {i + 1}" for i in range(n_voters)]
+    # Some voters rate everyone high, some low
+    voter_bias = [rng.gauss(0, 0.4) for _ in voters]
+
+    players = {}
+    for i in range(n_players):
+        name = f"Player {i + 1}"
+        positions = {}
+        for pos in POSITIONS:
+            votes = []
+            if rng.random() < POSITION_COVERAGE[pos]:
+                mean, spread = POSITION_RATING_PROFILES[pos]
+                true_rating = rng.gauss(mean, spread)
+                # Knuth's method keeps the vote counts Poisson distributed
+                n_votes, threshold, p = 0, math.exp(-votes_per_position), rng.random()
+                while p > threshold:
+                    n_votes += 1
+                    p *= rng.random()
+                for v in rng.sample(range(n_voters), min(max(n_votes, 1), n_voters)):
+                    low = _clamp_rating(true_rating + voter_bias[v] + rng.gauss(0, 0.5))
+                    high = _clamp_rating(low + rng.choice([0, 0, 0, 0.5, 1]))
+                    votes.append({'voter': voters[v], 'min': low, 'max': high})
+
+            if votes:
+                positions[pos] = {
+                    'min': round(sum(v['min'] for v in votes) / len(votes), 1),
+                    'max': round(sum(v['max'] for v in votes) / len(votes), 1),
+                    'votes': votes
+                }
+            else:
+                positions[pos] = {'min': 0, 'max': 0, 'votes': []}
+        players[name] = {'name': name, 'positions': positions}
+
+    return {'schema_version': SCHEMA_VERSION, 'team_name': team_name, 'players': players}
+
+
+def write_team_file(path, data):
+    """Write generated data where Team(filename=path) can load it"""
+    with open(path, 'w') as f:
+        json.dump(data, f)
@@ -0,0 +1,282 @@
+# Team_File.py
+"""
+Versioned schema, streaming reader and in-place migration of players files.
+
+Version 1 is every file written before the schema was versioned: players
+may miss positions or vote lists and store ratings as strings. Version 2
+files start with a "schema_version" key and every player has exactly the
+POSITIONS, each with numeric min/max and a list of {voter, min, max} votes.
+
+TeamFileReader parses a file incrementally and hands out one upgraded,
+validated player at a time, so loading never holds the whole JSON tree
+next to the Player objects, and migrate_team_file rewrites an old file
+player by player.
+"""
+import json
+import os
+from Formations import POSITIONS
+
+SCHEMA_VERSION = 2
+# Characters read from the file at a time
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class _JsonStream:
+    """Reads JSON values one at a time from a text file"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+
+    def peek(self):
+        """Next non-whitespace character, or "" at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill(self.chunk_size)
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number or literal at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ValueError(f"Invalid JSON: {e}") from None
+            # Grow reads geometrically so a huge value is re-parsed only a few times
+            self._fill(size)
+            size = max(size, len(self.buffer))
+
+
+def _items(stream):
+    """
+    Yield ("setting", key, value) for every top-level key and ("player",
+    name, data) for every entry of a "players" object, in file order.
+    """
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        if not isinstance(key, str):
+            raise ValueError("Invalid JSON: object keys must be strings")
+        stream.expect(":")
+        if key == 'players' and stream.peek() == "{":
+            stream.expect("{")
+            if stream.peek() == "}":
+                yield 'setting', key, {}
+            while stream.peek() != "}":
+                name = stream.value()
+                stream.expect(":")
+                yield 'player', name, stream.value()
+                if stream.peek() == ",":
+                    stream.expect(",")
+            stream.expect("}")
+        else:
+            yield 'setting', key, stream.value()
+        if stream.peek() != ",":
+            break
+        stream.expect(",")
+    stream.expect("}")
+
+
+def _number(value, what):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} is not a number: {value!r}") from None
+
+
+def _upgrade_v1_player(name, data):
+    """Fill in missing positions and vote lists and turn rating strings into numbers"""
+    if not isinstance(data, dict):
+        raise ValueError(f"Player {name} is not an object")
+    positions = {}
+    for pos, rating in (data.get('positions') or {}).items():
+        pos = str(pos).strip().upper()
+        rating = rating if isinstance(rating, dict) else {}
+        positions[pos] = {
+            'min': _number(rating.get('min', 0), f"{name} {pos} min"),
+            'max': _number(rating.get('max', 0), f"{name} {pos} max"),
+            'votes': [{'voter': vote.get('voter'),
+                       'min': _number(vote.get('min'), f"{name} {pos} vote min"),
+                       'max': _number(vote.get('max'), f"{name} {pos} vote max")}
+                      for vote in rating.get('votes') or []],
+        }
+    for pos in POSITIONS:
+        positions.setdefault(pos, {'min': 0, 'max': 0, 'votes': []})
+    return {'name': data.get('name') or name, 'positions': positions}
+
+
+# Version -> function upgrading a player dict from that version to the next
+PLAYER_MIGRATIONS = {
+    1: _upgrade_v1_player,
+}
+
+
+def validate_player(name, data):
+    """
+    Check a player dict against the current schema.
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    positions = data.get('positions')
+    if not isinstance(positions, dict):
+        raise ValueError(f"Player {name} has no positions")
+    unknown = set(positions) - set(POSITIONS)
+    if unknown:
+        raise ValueError(f"Player {name} has unknown positions: {', '.join(sorted(unknown))}")
+    for pos in POSITIONS:
+        rating = positions.get(pos)
+        if not isinstance(rating, dict) or not isinstance(rating.get('votes'), list):
+            raise ValueError(f"Player {name} has no rating for {pos}")
+        for field in ('min', 'max'):
+            if not isinstance(rating.get(field), (int, float)):
+                raise ValueError(f"Player {name} {pos} {field} is not a number")
+        for vote in rating['votes']:
+            if (not isinstance(vote, dict) or not isinstance(vote.get('voter'), str)
+                    or not all(isinstance(vote.get(field), (int, float)) for field in ('min', 'max'))):
+                raise ValueError(f"Player {name} has an invalid {pos} vote: {vote!r}")
+
+
+def upgrade_player(name, data, version):
+    """Migrate a player dict from a schema version to SCHEMA_VERSION and validate it"""
+    while version < SCHEMA_VERSION:
+        data = PLAYER_MIGRATIONS[version](name, data)
+        version += 1
+    validate_player(name, data)
+    return data
+
+
+class TeamFileReader:
+    """
+    Incremental reader of a players file.
+
+    Iterating players() parses the file chunk by chunk and yields each
+    player upgraded to SCHEMA_VERSION and validated; the other top-level
+    keys are collected in settings along the way (a columnar file's vote
+    columns included, see Vote_Store).
+
+        reader = TeamFileReader(path)
+        players = {name: Player.from_dict(data) for name, data in reader.players()}
+        reader.settings['team_name'], reader.version
+
+    With skip_invalid, a player that fails validation is left out and
+    recorded in skipped instead of aborting the whole read.
+
+    Attributes:
+        version (int): Schema version the file was written with
+        settings (dict): Top-level values other than the players, once read
+        skipped (list): (name, error message) of the players left out
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, skip_invalid=False):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.skip_invalid = skip_invalid
+        self.version = None
+        self.settings = {}
+        self.skipped = []
+
+    def items(self):
+        """Yield ("setting", key, value) and upgraded ("player", name, data) in file order"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for kind, key, value in _items(_JsonStream(f, self.chunk_size)):
+                if self.version is None:
+                    # Only versioned files start with schema_version
+                    self.version = value if (kind, key) == ('setting', 'schema_version') else 1
+                    if not isinstance(self.version, int) or self.version > SCHEMA_VERSION:
+                        raise ValueError(f"Unsupported schema version: {self.version}")
+                if kind == 'player':
+                    try:
+                        value = upgrade_player(key, value, self.version)
+                    except ValueError as e:
+                        if not self.skip_invalid:
+                            raise
+                        self.skipped.append((key, str(e)))
+                        continue
+                    yield kind, key, value
+                else:
+                    self.settings[key] = value
+                    yield kind, key, value
+        if self.version is None:
+            self.version = SCHEMA_VERSION
+
+    def players(self):
+        """Yield (name, player dict) one at a time"""
+        for kind, key, value in self.items():
+            if kind == 'player':
+                yield key, value
+
+
+def migrate_team_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Upgrade a players file to SCHEMA_VERSION in place.
+
+    Players are read, upgraded and written one at a time to a temporary file
+    that then replaces the original, so a crash leaves the old file intact.
+
+    Returns:
+        int: The version the file had (SCHEMA_VERSION if nothing was done)
+
+    Raises:
+        ValueError: If the file is invalid; it is left unchanged
+    """
+    reader = TeamFileReader(path, chunk_size)
+    temp_path = f"{path}.migrate"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as out:
+            out.write('{"schema_version": %d' % SCHEMA_VERSION)
+            in_players = False
+            for kind, key, value in reader.items():
+                if reader.version == SCHEMA_VERSION:
+                    break
+                if kind == 'setting':
+                    if key == 'schema_version':
+                        continue
+                    if in_players:
+                        out.write("}")
+                        in_players = False
+                    out.write(f", {json.dumps(key)}: {json.dumps(value)}")
+                else:
+                    out.write(", " if in_players else ', "players": {')
+                    out.write(f"{json.dumps(key)}: {json.dumps(value)}")
+                    in_players = True
+            if in_players:
+                out.write("}")
+            out.write("}\n")
+        if reader.version == SCHEMA_VERSION:
+            return SCHEMA_VERSION
+        os.replace(temp_path, path)
+        return reader.version
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,162 @@
+# Vote_Import.py
+import csv
+import json
+import os
+from Player_Stats import POSITIONS
+
+# Column names accepted in CSV headers and JSONL objects
+VOTE_FIELDS = ["player", "position", "voter", "min", "max"]
+
+
+class ImportReport:
+    """Summary of a bulk vote import with a per-row error report"""
+
+    def __init__(self, max_errors=1000):
+        self.rows = 0
+        self.applied = 0
+        self.error_count = 0
+        self.errors = []  # (row number, message), capped at max_errors
+        self.max_errors = max_errors
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((row_number, message))
+
+    def __repr__(self):
+        return (f"ImportReport(rows={self.rows}, applied={self.applied}, "
+                f"errors={self.error_count})")
+
+
+def iter_vote_rows(path, fmt=None):
+    """
+    Stream vote rows from a CSV or JSONL file one at a time.
+
+    Args:
+        path (str): File to read
+        fmt (str): "csv" or "jsonl"; guessed from the file extension when omitted
+
+    Yields:
+        (row_number, row) where row is a tuple of raw values in VOTE_FIELDS order
+        (or None if the line could not be parsed)
+    """
+    if fmt is None:
+        fmt = "jsonl" if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson") else "csv"
+
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            header = [h.strip().lower() for h in next(reader, [])]
+            missing = [field for field in VOTE_FIELDS[:4] if field not in header]
+            if missing:
+                raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+            columns = [header.index(field) if field in header else None for field in VOTE_FIELDS]
+            width = len(header)
+
+            # Row 1 is the header, so data rows start at 2 like in a spreadsheet
+            for row_number, values in enumerate(reader, 2):
+                if not values:
+                    continue
+                if len(values) < width:
+                    values += [''] * (width - len(values))
+                yield row_number, tuple(values[c] if c is not None else None for c in columns)
+        elif fmt == "jsonl":
+            for row_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                if isinstance(row, dict):
+                    yield row_number, tuple(row.get(field) for field in VOTE_FIELDS)
+                else:
+                    yield row_number, None
+        else:
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _parse_ratings(min_value, max_value):
+    try:
+        min_rating = float(min_value)
+        max_rating = min_rating if max_value in (None, '') else float(max_value)
+    except (TypeError, ValueError):
+        raise ValueError("Ratings must be numbers")
+
+    if not (0 <= min_rating <= 5 and 0 <= max_rating <= 5):
+        raise ValueError(f"Ratings must be between 0 and 5 (got {min_rating}-{max_rating})")
+    return min_rating, max_rating
+
+
+def parse_vote_row(row):
+    """
+    Validate a raw row and return (player, position, voter, min, max).
+
+    A missing or empty max is treated as a fixed rating (max == min), the same
+    way a single number is handled when rating a player interactively.
+    Raises ValueError with a readable message for invalid rows.
+    """
+    if row is None:
+        raise ValueError("Malformed row")
+
+    player_name, position, voter, min_value, max_value = row
+    player_name = str(player_name or '').strip().title()
+    position = str(position or '').strip().upper()
+    voter = str(voter or '').strip().title()
+
+    if not player_name:
+        raise ValueError("Missing player name")
+    if position not in POSITIONS:
+        raise ValueError(f"Invalid position: {position or '<empty>'}")
+    if not voter:
+        raise ValueError("Missing voter name")
+
+    return (player_name, position, voter) + _parse_ratings(min_value, max_value)
+
+
+def import_votes(team, path, fmt=None, create_missing=False, save=True, max_errors=1000):
+    """
+    Bulk import rating votes from a CSV or JSONL file.
+
+    Rows are streamed and validated one at a time and the valid ones are
+    applied through Team.apply_vote_stream in fixed-size chunks, so memory
+    stays bounded for any file size. Each row replaces any earlier vote by the
+    same voter for that player and position, aggregates are recomputed once
+    per touched (player, position) and the team is saved a single time.
+
+    Args:
+        team (Team): Team to import into
+        path (str): CSV/JSONL file with player, position, voter, min, max columns
+        fmt (str): "csv" or "jsonl"; guessed from the extension when omitted
+        create_missing (bool): Add unknown players instead of reporting them as errors
+        save (bool): Persist the team once the import finishes
+        max_errors (int): Maximum number of error rows kept in the report
+
+    Returns:
+        ImportReport
+    """
+    report = ImportReport(max_errors)
+
+    def valid_votes():
+        for row_number, row in iter_vote_rows(path, fmt):
+            report.rows += 1
+            try:
+                player_name, position, voter, min_rating, max_rating = parse_vote_row(row)
+                player = team.get_player(player_name)
+                if not player and not create_missing:
+                    raise ValueError(f"Player {player_name} not found")
+            except ValueError as e:
+                report.add_error(row_number, str(e))
+                continue
+
+            if not player:
+                # Only created once a row for them is known to be valid
+                player = team.add_player(player_name)
+            yield player, position, min_rating, max_rating, voter
+
+    report.applied = team.apply_vote_stream(valid_votes())
+
+    if save and report.applied:
+        team.save_players()
+
+    return report
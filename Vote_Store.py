@@ -0,0 +1,269 @@
+# Vote_Store.py
+import base64
+import json
+import threading
+import numpy as np
+from Formations import POSITIONS
+from Aggregation import VoteColumns
+
+# Version of the columnar file layout (2 added full-precision ratings)
+STORE_VERSION = 2
+# Column dtypes, little-endian so files move between machines
+ID_DTYPE = np.dtype('<u4')
+POSITION_DTYPE = np.dtype('u1')
+# Ratings are stored as whole tenths when they all are: 0-5 fits in a byte
+RATING_DTYPE = np.dtype('u1')
+# Otherwise they are kept exactly
+FLOAT_RATING_DTYPE = np.dtype('<f8')
+RATING_ENCODINGS = {"tenths": RATING_DTYPE, "float64": FLOAT_RATING_DTYPE}
+# Serializes copying votes out of a store, which any thread may trigger by reading them
+STORE_LOCK = threading.RLock()
+
+
+def rating_dtype(*columns):
+    """RATING_DTYPE if every rating is a whole tenth in range, else FLOAT_RATING_DTYPE"""
+    for values in columns:
+        values = np.asarray(values, dtype=float)
+        tenths = np.rint(values * 10)
+        if values.size and (tenths.min() < 0 or tenths.max() > np.iinfo(RATING_DTYPE).max
+                            or not np.array_equal(tenths / 10, values)):
+            return FLOAT_RATING_DTYPE
+    return RATING_DTYPE
+
+
+def encode_ratings(values, dtype=RATING_DTYPE):
+    """
+    Ratings in a rating dtype: uint8 tenths (3.5 -> 35) or exact float64.
+
+    Raises:
+        ValueError: If a rating can't be stored as tenths without rounding
+    """
+    values = np.asarray(values, dtype=float)
+    if dtype == FLOAT_RATING_DTYPE:
+        return values.astype(FLOAT_RATING_DTYPE)
+    if rating_dtype(values) != RATING_DTYPE:
+        raise ValueError("Ratings must be whole tenths between 0 and 25.5 to be stored as tenths")
+    return np.rint(values * 10).astype(RATING_DTYPE)
+
+
+def decode_ratings(column):
+    column = np.asarray(column)
+    if column.dtype == RATING_DTYPE:
+        return column.astype(float) / 10
+    return column.astype(float)
+
+
+class StoredRating(dict):
+    """
+    A position rating whose votes are still in a VoteStore: the aggregate
+    min/max are plain keys, and the first lookup of 'votes' copies the
+    player's votes out of the store (see Player.load_votes).
+    """
+    __slots__ = ('player',)
+
+    def __init__(self, player, low, high):
+        super().__init__(min=low, max=high)
+        self.player = player
+
+    def __missing__(self, key):
+        if key == 'votes':
+            # Another thread may be copying the votes out right now
+            self.player.load_votes()
+            if dict.__contains__(self, 'votes'):
+                return dict.__getitem__(self, 'votes')
+        raise KeyError(key)
+
+
+def _pack(column):
+    return base64.b64encode(np.ascontiguousarray(column).tobytes()).decode('ascii')
+
+
+def _unpack(text, dtype):
+    return np.frombuffer(base64.b64decode(text), dtype=dtype)
+
+
+class VoteStore:
+    """
+    Every vote of a team as parallel columns with interned names.
+
+    Player and voter names are stored once and referenced by small integer
+    ids, and each vote takes 10 bytes (player id, position id, voter id, min
+    and max in tenths) instead of a dict with three keys and its own voter
+    string; ratings finer than a tenth switch the rating columns to exact
+    float64. The aggregate rating of every player and position is kept as
+    two (players, len(POSITIONS)) arrays.
+
+    A team loaded from a columnar file keeps its votes here: to_players()
+    builds Players that only hold the aggregates, and a player's votes are
+    copied out of the columns the first time they are used.
+
+    Attributes:
+        player_names (list): Player name of each player id
+        voter_names (list): Voter name of each voter id
+        player_ids, voter_ids (np.ndarray): uint32 vote owners, sorted by player
+        position_ids (np.ndarray): uint8 index into POSITIONS
+        mins, maxs (np.ndarray): Vote ratings (see rating_dtype)
+        rating_mins, rating_maxs (np.ndarray): Aggregate ratings
+        offsets (np.ndarray): Votes of player id i are rows offsets[i]:offsets[i + 1]
+    """
+
+    def __init__(self, player_names, voter_names, player_ids, position_ids, voter_ids,
+                 mins, maxs, rating_mins, rating_maxs, dtype=RATING_DTYPE):
+        self.player_names = list(player_names)
+        self.voter_names = list(voter_names)
+        self.player_ids = np.asarray(player_ids, dtype=ID_DTYPE)
+        self.position_ids = np.asarray(position_ids, dtype=POSITION_DTYPE)
+        self.voter_ids = np.asarray(voter_ids, dtype=ID_DTYPE)
+        self.mins = np.asarray(mins, dtype=dtype)
+        self.maxs = np.asarray(maxs, dtype=dtype)
+        shape = (len(self.player_names), len(POSITIONS))
+        self.rating_mins = np.asarray(rating_mins, dtype=dtype).reshape(shape)
+        self.rating_maxs = np.asarray(rating_maxs, dtype=dtype).reshape(shape)
+        if len(self.player_ids) > 1 and np.any(self.player_ids[1:] < self.player_ids[:-1]):
+            # Group votes by player, keeping each player's vote order
+            order = np.argsort(self.player_ids, kind='stable')
+            for name in ('player_ids', 'position_ids', 'voter_ids', 'mins', 'maxs'):
+                setattr(self, name, getattr(self, name)[order])
+        self.offsets = np.searchsorted(self.player_ids, np.arange(len(self.player_names) + 1))
+
+    @property
+    def dtype(self):
+        return self.mins.dtype
+
+    def __len__(self):
+        return len(self.mins)
+
+    @property
+    def nbytes(self):
+        """Memory taken by the columns"""
+        return sum(column.nbytes for column in (
+            self.player_ids, self.position_ids, self.voter_ids, self.mins, self.maxs,
+            self.rating_mins, self.rating_maxs))
+
+    @classmethod
+    def from_players(cls, players):
+        """Collect the ratings and votes of Player objects, keeping vote order"""
+        players = list(players)
+        columns = VoteColumns.from_players(players)
+        rating_mins, rating_maxs = [], []
+        for player in players:
+            rating_mins.extend(player.positions[pos]['min'] for pos in POSITIONS)
+            rating_maxs.extend(player.positions[pos]['max'] for pos in POSITIONS)
+        dtype = rating_dtype(columns.mins, columns.maxs, rating_mins, rating_maxs)
+        return cls(columns.player_names, columns.voter_names, columns.player_ids,
+                   columns.position_ids, columns.voter_ids, encode_ratings(columns.mins, dtype),
+                   encode_ratings(columns.maxs, dtype), encode_ratings(rating_mins, dtype),
+                   encode_ratings(rating_maxs, dtype), dtype)
+
+    def vote_rows(self, first, last=None):
+        """
+        (player ids, position ids, voter ids, mins, maxs) columns of the votes
+        of player ids first..last (just first by default), ratings decoded
+        """
+        start, end = self.offsets[first], self.offsets[(first if last is None else last) + 1]
+        return (self.player_ids[start:end].astype(np.int64), self.position_ids[start:end],
+                self.voter_ids[start:end].astype(np.int64),
+                decode_ratings(self.mins[start:end]), decode_ratings(self.maxs[start:end]))
+
+    def player_votes(self, player_id):
+        """Position -> list of vote dicts of one player, in vote order"""
+        votes = {pos: [] for pos in POSITIONS}
+        voters = self.voter_names
+        for position_id, voter_id, low, high in zip(*(column.tolist() for column in self.vote_rows(player_id)[1:])):
+            votes[POSITIONS[position_id]].append({'voter': voters[voter_id], 'min': low, 'max': high})
+        return votes
+
+    def to_columns(self):
+        """The votes as VoteColumns for batched aggregation, without building Players"""
+        return VoteColumns(self.player_names, self.voter_names, self.player_ids, self.position_ids,
+                           self.voter_ids, decode_ratings(self.mins), decode_ratings(self.maxs))
+
+    def player_dicts(self):
+        """
+        Players in the Player.to_dict() layout, in player id order.
+
+        Voter names are shared between votes rather than copied.
+        """
+        players = []
+        for name, min_row, max_row in zip(self.player_names, decode_ratings(self.rating_mins).tolist(),
+                                          decode_ratings(self.rating_maxs).tolist()):
+            positions = {pos: {'min': low, 'max': high, 'votes': []}
+                         for pos, low, high in zip(POSITIONS, min_row, max_row)}
+            players.append({'name': name, 'positions': positions})
+
+        voters = self.voter_names
+        for player_id, position_id, voter_id, low, high in zip(
+                self.player_ids.tolist(), self.position_ids.tolist(), self.voter_ids.tolist(),
+                decode_ratings(self.mins).tolist(), decode_ratings(self.maxs).tolist()):
+            players[player_id]['positions'][POSITIONS[position_id]]['votes'].append(
+                {'voter': voters[voter_id], 'min': low, 'max': high})
+        return players
+
+    def attach(self, players):
+        """
+        Back Player objects (in player id order, e.g. the ones this store was
+        built from) with the store, dropping their vote dicts.
+        """
+        for player_id, (player, min_row, max_row) in enumerate(zip(
+                players, decode_ratings(self.rating_mins).tolist(), decode_ratings(self.rating_maxs).tolist())):
+            player.positions = {pos: StoredRating(player, low, high)
+                                for pos, low, high in zip(POSITIONS, min_row, max_row)}
+            player.stored_votes = (self, player_id)
+
+    def to_players(self):
+        """Player objects backed by the columns, votes copied out on first use"""
+        from Player_Stats import Player
+        players = [Player(name) for name in self.player_names]
+        self.attach(players)
+        return {player.name: player for player in players}
+
+    # -----------------------------------------------------------------------
+    # On-disk format
+    # -----------------------------------------------------------------------
+
+    def to_dict(self):
+        """JSON-ready form: names as lists, columns as base64 little-endian bytes"""
+        return {
+            'format': "columnar",
+            'version': STORE_VERSION,
+            'positions': POSITIONS,
+            'encoding': "tenths" if self.dtype == RATING_DTYPE else "float64",
+            'players': self.player_names,
+            'voters': self.voter_names,
+            'ratings': {'min': _pack(self.rating_mins), 'max': _pack(self.rating_maxs)},
+            'votes': {
+                'player': _pack(self.player_ids),
+                'position': _pack(self.position_ids),
+                'voter': _pack(self.voter_ids),
+                'min': _pack(self.mins),
+                'max': _pack(self.maxs),
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('format') != "columnar":
+            raise ValueError("Not a columnar vote store")
+        if data.get('version', STORE_VERSION) > STORE_VERSION:
+            raise ValueError(f"Unsupported vote store version: {data['version']}")
+        if data.get('positions', POSITIONS) != POSITIONS:
+            raise ValueError("Vote store was written with different positions")
+        if data.get('encoding', "tenths") not in RATING_ENCODINGS:
+            raise ValueError(f"Unsupported rating encoding: {data['encoding']}")
+        dtype = RATING_ENCODINGS[data.get('encoding', "tenths")]
+        votes, ratings = data['votes'], data['ratings']
+        return cls(data['players'], data['voters'],
+                   _unpack(votes['player'], ID_DTYPE), _unpack(votes['position'], POSITION_DTYPE),
+                   _unpack(votes['voter'], ID_DTYPE), _unpack(votes['min'], dtype),
+                   _unpack(votes['max'], dtype), _unpack(ratings['min'], dtype),
+                   _unpack(ratings['max'], dtype), dtype)
+
+    def save(self, path, **metadata):
+        """Write the store as one compact JSON document, with extra top-level keys"""
+        with open(path, 'w') as f:
+            json.dump({**metadata, **self.to_dict()}, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
@@ -1,5 +1,26 @@
 import os
-from Player_Stats import Team
+import sys
+from datetime import datetime, timedelta
+from Player_Stats import Team, LINEUP_STRATEGIES
+from Lineup_Precompute import LineupPrecomputer
+from Lineup_Cache import LineupCache
+from Lineup_Analysis import lineup_sensitivity, leave_one_out_values
+from Solve_Tasks import SolveTask
+from Anytime_Solver import anytime_lineup
+from Pareto_Lineups import pareto_lineups, OBJECTIVES
+from Pitch_Render import PitchRenderer
+from Match_Simulator import LineupStrength, simulate_matches, DEFAULT_SIMULATIONS
+from Aggregation import AGGREGATORS
+from Rating_History import team_as_of
+from Rating_Session import RatingSession
+from Formations import (
+    POSITIONS, PITCH_WIDTH, PITCH_HEIGHT,
+    FORMATION_LAYOUTS, FORMATION_POSITIONS, load_formations
+)
+from Vote_Import import import_votes
+from Formation_Search import search_formations
+from Position_Compatibility import load_compatibility
+from Instrumentation import instrumented, format_report, is_enabled, enable, disable, reset
 from rich.console import Console
 from rich.table import Table
 from rich import box
@@ -7,336 +28,12 @@ from rich import print
 from tabulate import tabulate
 
 # Constants
-POSITIONS = ["GK", "LB", "CB", "RB", "CDM", "CM", "LM", "RM", "CAM", "LW", "RW", "ST"]
-WIDTH = 75
-HEIGHT = 25
+WIDTH = PITCH_WIDTH
+HEIGHT = PITCH_HEIGHT
+FORMATIONS_FILE = "formations.json"
+COMPATIBILITY_FILE = "compatibility.json"
 console = Console()
 
-# ---------------------------------------------------------------------------
-# Formation Layouts and Configurations
-# ---------------------------------------------------------------------------
-
-# Define available formations and their positions with improved spacing
-# POS: (x going down, y going right)
-FORMATION_LAYOUTS = {
-    "4-3-3 attacking": {
-        "ST": (3, 35),
-        "LW": (3, 15),
-        "RW": (3, 55),
-        "CAM": (7, 35),
-        "LCM": (11, 20),
-        "RCM": (11, 50),
-        "LB": (18, 10),
-        "LCB": (18, 28),
-        "RCB": (18, 42),
-        "RB": (18, 65),
-        "GK": (23, 36)
-    },
-    "4-3-3 defending": {
-        "ST": (3, 35),
-        "LW": (3, 15),
-        "RW": (3, 55),
-        "LCM": (9, 20),
-        "RCM": (9, 50),
-        "CDM": (11, 35),
-        "LB": (18, 10),
-        "LCB": (18, 28),
-        "RCB": (18, 42),
-        "RB": (18, 65),
-        "GK": (23, 36)
-    },
-    "4-3-1-2": {
-        "ST1": (3, 25),
-        "ST2": (3, 45),
-        "CAM": (7, 35),
-        "LCM": (11, 20),
-        "CM": (11, 35),
-        "RCM": (11, 50),
-        "LB": (18, 10),
-        "LCB": (18, 28),
-        "RCB": (18, 42),
-        "RB": (18, 65),
-        "GK": (23, 36)
-    },
-    "4-2-3-1": {
-        "ST": (3, 35),
-        "LAM": (7, 15),
-        "CAM": (7, 35),
-        "RAM": (7, 55),
-        "CDM1": (11, 25),
-        "CDM2": (11, 45),
-        "LB": (18, 10),
-        "LCB": (18, 28),
-        "RCB": (18, 42),
-        "RB": (18, 65),
-        "GK": (23, 36)
-    },
-    "5-2-1-2": {
-        "ST1": (3, 25),
-        "ST2": (3, 45),
-        "CAM": (7, 35),
-        "CM1": (11, 25),
-        "CM2": (11, 45),
-        "LWB": (18, 8),
-        "LCB": (18, 25),
-        "CB": (18, 36),
-        "RCB": (18, 48),
-        "RWB": (18, 67),
-        "GK": (23, 36)
-    },
-    "4-4-2": {
-        "ST1": (3, 25),
-        "ST2": (3, 45),
-        "LM": (9, 10),
-        "LCM": (9, 25), 
-        "RCM": (9, 45),
-        "RM": (9, 60),
-        "LB": (18, 10),
-        "LCB": (18, 28),
-        "RCB": (18, 42),
-        "RB": (18, 65),
-        "GK": (23, 36)
-    },
-    "4-4-2 diamond": {
-        "ST1": (3, 25),
-        "ST2": (3, 45),
-        "CAM": (7, 35),
-        "LCM": (10, 25),
-        "RCM": (10, 45),
-        "CDM": (13, 35),
-        "LB": (18, 10),
-        "LCB": (18, 28),
-        "RCB": (18, 42),
-        "RB": (18, 65),
-        "GK": (23, 36)
-    },
-    "3-5-2": {
-        "ST1": (3, 25),
-        "ST2": (3, 45),
-        "LM": (9, 5),
-        "LCM": (9, 25),
-        "CM": (9, 35),
-        "RCM": (9, 45),
-        "RM": (9, 65),
-        "LCB": (18, 25),
-        "CB": (18, 36),
-        "RCB": (18, 48),
-        "GK": (23, 36)
-    },
-    "5-3-2": {
-        "ST1": (3, 25),
-        "ST2": (3, 45),
-        "LCM": (9, 25),
-        "CM": (9, 35),
-        "RCM": (9, 45),
-        "LWB": (15, 8),
-        "LCB": (18, 25),
-        "CB": (18, 36),
-        "RCB": (18, 48),
-        "RWB": (15, 67),
-        "GK": (23, 36)
-    },
-    "4-1-4-1": {
-        "ST": (3, 35),
-        "LM": (7, 10),
-        "LCM": (7, 25),
-        "RCM": (7, 45),
-        "RM": (7, 60),
-        "CDM": (11, 35),
-        "LB": (18, 10),
-        "LCB": (18, 28),
-        "RCB": (18, 42),
-        "RB": (18, 65),
-        "GK": (23, 36)
-    },
-    "3-4-3": {
-        "ST": (3, 35),
-        "LW": (3, 15),
-        "RW": (3, 55),
-        "LM": (9, 10),
-        "LCM": (9, 25),
-        "RCM": (9, 45),
-        "RM": (9, 60),
-        "LCB": (18, 25),
-        "CB": (18, 36),
-        "RCB": (18, 48),
-        "GK": (23, 36)
-    },
-    "4-5-1": {
-        "ST": (3, 35),
-        "LM": (8, 10),
-        "LCM": (8, 25),
-        "CM": (8, 35),
-        "RCM": (8, 45),
-        "RM": (8, 60),
-        "LB": (18, 10),
-        "LCB": (18, 28),
-        "RCB": (18, 42),
-        "RB": (18, 65),
-        "GK": (23, 36)
-    }
-}
-
-# Update the formation mapping in Team class
-FORMATION_POSITIONS = {
-    "4-3-3 attacking": {
-        "ST": "ST",
-        "LW": "LW",
-        "RW": "RW",
-        "CAM": "CAM",
-        "LCM": "CM",
-        "RCM": "CM",
-        "LB": "LB",
-        "LCB": "CB",
-        "RCB": "CB",
-        "RB": "RB",
-        "GK": "GK"
-    },
-    "4-3-3 defending": {
-        "ST": "ST",
-        "LW": "LW",
-        "RW": "RW",
-        "LCM": "CM",
-        "RCM": "CM",
-        "CDM": "CDM",
-        "LB": "LB",
-        "LCB": "CB",
-        "RCB": "CB",
-        "RB": "RB",
-        "GK": "GK"
-    },
-    "4-3-1-2": {
-        "ST1": "ST",
-        "ST2": "ST",
-        "CAM": "CAM",
-        "LCM": "CM",
-        "CM": "CM",
-        "RCM": "CM",
-        "LB": "LB",
-        "LCB": "CB",
-        "RCB": "CB",
-        "RB": "RB",
-        "GK": "GK"
-    },
-    "4-2-3-1": {
-        "ST": "ST",
-        "LAM": "CAM",
-        "CAM": "CAM",
-        "RAM": "CAM",
-        "CDM1": "CDM",
-        "CDM2": "CDM",
-        "LB": "LB",
-        "LCB": "CB",
-        "RCB": "CB",
-        "RB": "RB",
-        "GK": "GK"
-    },
-    "5-2-1-2": {
-        "ST1": "ST",
-        "ST2": "ST",
-        "CAM": "CAM",
-        "CM1": "CM",
-        "CM2": "CM",
-        "LWB": "LB",
-        "LCB": "CB",
-        "CB": "CB",
-        "RCB": "CB",
-        "RWB": "RB",
-        "GK": "GK"
-    },
-    "4-4-2": {
-        "ST1": "ST",
-        "ST2": "ST",
-        "LM": "LM",
-        "LCM": "CM",
-        "RCM": "CM",
-        "RM": "RM",
-        "LB": "LB",
-        "LCB": "CB",
-        "RCB": "CB",
-        "RB": "RB",
-        "GK": "GK"
-    },
-    "4-4-2 diamond": {
-        "ST1": "ST",
-        "ST2": "ST",
-        "CAM": "CAM",
-        "LCM": "CM",
-        "RCM": "CM",
-        "CDM": "CDM",
-        "LB": "LB",
-        "LCB": "CB",
-        "RCB": "CB",
-        "RB": "RB",
-        "GK": "GK"
-    },
-    "3-5-2": {
-        "ST1": "ST",
-        "ST2": "ST",
-        "LM": "LM",
-        "LCM": "CM",
-        "CM": "CM",
-        "RCM": "CM",
-        "RM": "RM",
-        "LCB": "CB",
-        "CB": "CB",
-        "RCB": "CB",
-        "GK": "GK"
-    },
-    "5-3-2": {
-        "ST1": "ST",
-        "ST2": "ST",
-        "LCM": "CM",
-        "CM": "CM",
-        "RCM": "CM",
-        "LWB": "LB",
-        "LCB": "CB",
-        "CB": "CB",
-        "RCB": "CB",
-        "RWB": "RB",
-        "GK": "GK"
-    },
-    "4-1-4-1": {
-        "ST": "ST",
-        "LM": "LM",
-        "LCM": "CM",
-        "RCM": "CM",
-        "RM": "RM",
-        "CDM": "CDM",
-        "LB": "LB",
-        "LCB": "CB",
-        "RCB": "CB",
-        "RB": "RB",
-        "GK": "GK"
-    },
-    "3-4-3": {
-        "ST": "ST",
-        "LW": "LW",
-        "RW": "RW",
-        "LM": "LM",
-        "LCM": "CM",
-        "RCM": "CM",
-        "RM": "RM",
-        "LCB": "CB",
-        "CB": "CB",
-        "RCB": "CB",
-        "GK": "GK"
-    },
-    "4-5-1": {
-        "ST": "ST",
-        "LM": "LM",
-        "LCM": "CM",
-        "CM": "CM",
-        "RCM": "CM",
-        "RM": "RM",
-        "LB": "LB",
-        "LCB": "CB",
-        "RCB": "CB",
-        "RB": "RB",
-        "GK": "GK"
-    }
-}
-
 # ---------------------------------------------------------------------------
 
 # Helper Functions
@@ -351,12 +48,25 @@ def display_player_names(team):
     players = list(team.players.keys())
     print(f"Players: {players}")
 
-def safe_write(pitch, y, x, text, HEIGHT, WIDTH):
-    """Safely write text to pitch at given coordinates"""
-    if 0 <= y < HEIGHT:
-        for i, char in enumerate(text):
-            if 0 <= x + i < WIDTH:
-                pitch[y][x + i] = char
+def load_custom_formations():
+    """Register user-defined formations from FORMATIONS_FILE if it exists"""
+    if not os.path.exists(FORMATIONS_FILE):
+        return
+    try:
+        names = load_formations(FORMATIONS_FILE)
+        print(f"Loaded {len(names)} custom formations.")
+    except (OSError, ValueError) as e:
+        print(f"Error loading custom formations: {e}")
+
+def load_custom_compatibility(team):
+    """Use the position compatibility table in COMPATIBILITY_FILE if it exists"""
+    if not os.path.exists(COMPATIBILITY_FILE):
+        return
+    try:
+        team.set_out_of_position(team.out_of_position, load_compatibility(COMPATIBILITY_FILE))
+        print("Loaded custom position compatibility.")
+    except (OSError, ValueError) as e:
+        print(f"Error loading position compatibility: {e}")
 
 # ---------------------------------------------------------------------------
 # User Interface Functions
@@ -371,8 +81,16 @@ def display_menu():
         "Modify your ratings",
         "Compare players",
         "View best lineup",
+        "View lineup as of a date",
+        "Search formation shapes",
         "Show position rankings",
         "View position gaps",
+        "Import votes from file",
+        "View timing report",
+        "Rating settings",
+        "View player values",
+        "Simulate a match",
+        "Compare lineup trade-offs",
         "Save and exit"
     ]
     
@@ -407,7 +125,9 @@ def add_new_player(team):
             
     team.add_player(name)
     print(f"\nAdded player: {name}")
-    rate_player(team, name)  # Pass the name directly to rate_player
+    # Pass the name directly to rate_player; its session saves only when votes were entered
+    if not rate_player(team, name):
+        team.save_players()
 
 def view_player_ratings(team):
     """View detailed ratings for a specific player"""
@@ -424,7 +144,15 @@ def view_player_ratings(team):
         input("\nPress Enter to continue...")
 
 def rate_player(team, player_name=None):
-    """Rate a player's abilities in different positions"""
+    """
+    Rate a player's abilities in different positions.
+
+    The votes are collected in a RatingSession and applied and saved together
+    when the voter finishes; an interrupted ballot changes nothing.
+
+    Returns:
+        int: Number of votes saved
+    """
     clear_screen()
     display_player_names(team)
     if player_name is None:
@@ -433,9 +161,16 @@ def rate_player(team, player_name=None):
     player = team.get_player(player_name)
     if not player:
         print(f"Player {player_name} not found!")
-        return
+        return 0
     
     voter = input("Enter your name (for voting): ").strip().title()
+    with RatingSession(team, voter) as session:
+        _collect_ratings(team, player, session)
+    return session.applied
+
+def _collect_ratings(team, player, session):
+    """Prompt for each position and buffer the votes in session until 'done'"""
+    player_name = player.name
     
     print("\nEnter ratings (0-5) for positions:")
     print("- Single number (e.g., '3') for fixed rating")
@@ -476,7 +211,7 @@ def rate_player(team, player_name=None):
                     min_rating = max_rating = float(rating)
                     
                 if 0 <= min_rating <= 5 and 0 <= max_rating <= 5:
-                    player.add_rating_vote(position, min_rating, max_rating, voter)
+                    session.add(player.name, position, min_rating, max_rating)
                     break
             except ValueError:
                 pass
@@ -536,57 +271,63 @@ def modify_player_rating(team):
     
     console.print(table)
     
-    # Modify ratings
-    print("\nEnter the position you want to modify (or 'done' to finish):")
-    while True:
-        position = input("Position to modify: ").strip().upper()
+    # Modify ratings; nothing is saved until the voter is done
+    with RatingSession(team, voter) as session:
+        print("\nEnter the position you want to modify (or 'done' to finish):")
+        while True:
+            position = input("Position to modify: ").strip().upper()
         
-        if position.lower() == 'done':
-            break
+            if position.lower() == 'done':
+                break
             
-        if position not in POSITIONS:
-            print(f"Invalid position! Must be one of: {', '.join(POSITIONS)}")
-            continue
+            if position not in POSITIONS:
+                print(f"Invalid position! Must be one of: {', '.join(POSITIONS)}")
+                continue
         
-        # Check if user has rated this position
-        user_vote = None
-        for vote in player.positions[position]['votes']:
-            if vote['voter'] == voter:
-                user_vote = vote
-                break
+            # Check if user has rated this position
+            user_vote = None
+            for vote in player.positions[position]['votes']:
+                if vote['voter'] == voter:
+                    user_vote = vote
+                    break
         
-        if not user_vote:
-            print(f"You haven't rated {player_name} for {position} yet!")
-            continue
+            if not user_vote:
+                print(f"You haven't rated {player_name} for {position} yet!")
+                continue
         
-        # Show current rating and get new one
-        if user_vote['min'] == user_vote['max']:
-            current_rating = f"{user_vote['min']}"
-        else:
-            current_rating = f"{user_vote['min']}-{user_vote['max']}"
+            # Show current rating and get new one
+            if user_vote['min'] == user_vote['max']:
+                current_rating = f"{user_vote['min']}"
+            else:
+                current_rating = f"{user_vote['min']}-{user_vote['max']}"
             
-        print(f"Current rating for {position}: {current_rating}")
+            print(f"Current rating for {position}: {current_rating}")
+            pending = session.pending_vote(player.name, position)
+            if pending:
+                print(f"Changed this session to: {pending[0]}-{pending[1]}")
         
-        while True:
-            new_rating = input(f"Enter new rating for {position} (0-5 or range like '2-4'): ").strip().lower()
+            while True:
+                new_rating = input(f"Enter new rating for {position} (0-5 or range like '2-4'): ").strip().lower()
             
-            try:
-                if '-' in new_rating:
-                    min_rating, max_rating = map(float, new_rating.split('-'))
-                else:
-                    min_rating = max_rating = float(new_rating)
+                try:
+                    if '-' in new_rating:
+                        min_rating, max_rating = map(float, new_rating.split('-'))
+                    else:
+                        min_rating = max_rating = float(new_rating)
                     
-                if 0 <= min_rating <= 5 and 0 <= max_rating <= 5:
-                    # Update the rating
-                    player.add_rating_vote(position, min_rating, max_rating, voter)
-                    print(f"Rating updated for {position}!")
-                    break
-            except ValueError:
-                pass
-            print("Invalid input. Please enter a number (0-5) or range (e.g., '2-4')")
-    
-    print("\nRatings have been updated!")
-    team.save_players()
+                    if 0 <= min_rating <= 5 and 0 <= max_rating <= 5:
+                        # Buffer the rating; all changes are saved together when done
+                        session.add(player.name, position, min_rating, max_rating)
+                        print(f"Rating updated for {position}!")
+                        break
+                except ValueError:
+                    pass
+                print("Invalid input. Please enter a number (0-5) or range (e.g., '2-4')")
+    
+    if session.applied:
+        print("\nRatings have been updated!")
+    else:
+        print("\nNo ratings were changed.")
     input("\nPress Enter to continue...")
 
 def pick_players(team):
@@ -607,20 +348,25 @@ def pick_players(team):
             print(f"Selected all {len(players)} players")
             break
             
-        if name in players:
+        resolution = team.resolve_players([name])
+        player_name = resolution.names[0]
+        if player_name is None:
+            suggestions = resolution.missing[name]
+            hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+            print(f"Player {name} not found!{hint}")
+            continue
+
+        if player_name in players:
             print("Already chose that player!")
             continue
-            
-        if team.get_player(name):
-            players.append(name)
-        else:
-            print(f"Player {name} not found!")
+        players.append(player_name)
     
     if len(players) < 2:
         print("Need at least 2 players to compare!")
         return
     return players
 
+@instrumented
 def compare_players(team):
     """Compare players' ratings across positions"""
     clear_screen()
@@ -712,6 +458,7 @@ def compare_players(team):
     console.print(table)
     input("\nPress Enter to continue...")
 
+@instrumented
 def show_position_rankings(team):
     """Display rankings of players for a specific position"""
     clear_screen()
@@ -744,6 +491,7 @@ def show_position_rankings(team):
                   tablefmt='grid'))
     input("\nPress Enter to continue...")
 
+@instrumented
 def show_position_gaps(team):
     """Show positions with insufficient coverage or low ratings"""
     clear_screen()
@@ -769,7 +517,53 @@ def show_position_gaps(team):
     print("\nNote: Positions shown have average rating below 3.0 or no ratings")
     input("\nPress Enter to continue...")
 
-def pick_formation(team):
+def import_votes_from_file(team):
+    """Bulk import rating votes from a CSV or JSONL file"""
+    clear_screen()
+    print("\n=== Import Votes ===\n")
+    print("Rows need player, position, voter, min and max columns (max may be empty).")
+    path = input("Enter file path (or press Enter to go back): ").strip()
+    if not path:
+        return
+
+    create_missing = input("Add players that don't exist yet? (y/N): ").strip().lower() == 'y'
+
+    try:
+        report = import_votes(team, path, create_missing=create_missing)
+    except (OSError, ValueError) as e:
+        print(f"\nError importing votes: {e}")
+        input("\nPress Enter to continue...")
+        return
+
+    print(f"\nRead {report.rows} rows, applied {report.applied} votes.")
+    if report.error_count:
+        print(f"{report.error_count} rows were rejected:")
+        print(tabulate(report.errors[:20], headers=['Row', 'Error'], tablefmt='grid'))
+        if report.error_count > 20:
+            print(f"... and {report.error_count - 20} more")
+    input("\nPress Enter to continue...")
+
+def run_solve(label, func, *args, cancellable=True, lock=None, **kwargs):
+    """
+    Run a solve on a worker thread, showing progress until it finishes.
+    Ctrl-C stops it: cancellable solves return their best answer so far,
+    others return None. Solves reading the team pass lock=team.lock.
+    """
+    def show_progress(task):
+        done = f"{task.done}/{task.total} " if task.total else ""
+        hint = "Ctrl-C to stop early" if cancellable else "Ctrl-C to cancel"
+        print(f"\r{label}... {done}{task.elapsed():.1f}s ({hint})", end="", flush=True)
+
+    task = SolveTask(func, *args, cancellable=cancellable, lock=lock, **kwargs).start()
+    result = task.wait(on_progress=show_progress)
+    if task.elapsed() > 0.1 or task.cancelled:
+        print("\r" + " " * 70 + "\r", end="")
+    if task.cancelled:
+        print("Stopped early." if cancellable and result is not None else "Cancelled.")
+    return result
+
+def choose_formation():
+    """Ask for one of the known formations and return its name"""
     print("Available formations:")
     for i, form in enumerate(FORMATION_LAYOUTS.keys(), 1):
         print(f"{i}. {form}")
@@ -778,17 +572,19 @@ def pick_formation(team):
         try:
             choice = int(input("\nSelect formation (enter number): "))
             if 1 <= choice <= len(FORMATION_LAYOUTS):
-                formation = list(FORMATION_LAYOUTS.keys())[choice - 1]
-                break
+                return list(FORMATION_LAYOUTS.keys())[choice - 1]
             print("Invalid choice. Please try again.")
         except ValueError:
             print("Please enter a number.")
+
+def pick_formation(team, precomputer=None):
+    formation = choose_formation()
     
     print("Enter player names for lineup (press Enter when done, or type 'ALL' to select all players)")
     players = pick_players(team)
     
     # Select lineup type
-    lineup_types = ["Best Overall", "Balanced", "Attack-Focused"]
+    lineup_types = ["Best Overall", "Balanced", "Attack-Focused", "Quick Search"]
     print("\nLineup Types:")
     for i, lineup_type in enumerate(lineup_types, 1):
         print(f"{i}. {lineup_type}")
@@ -805,99 +601,34 @@ def pick_formation(team):
     
     clear_screen()
 
-    # Generate the appropriate lineup based on type
-    if lineup_choice == 1:  # Best Overall
-        lineup = team.get_best_lineup(players, formation, FORMATION_POSITIONS[formation])
-        lineup_title = "Best Overall Lineup"
-    elif lineup_choice == 2:  # Balanced
-        lineup = team.get_balanced_lineup(players, formation, FORMATION_POSITIONS[formation])
-        lineup_title = "Balanced Lineup"
-    else:  # Attack-Focused
-        lineup = team.get_attack_focused_lineup(players, formation, FORMATION_POSITIONS[formation])
-        lineup_title = "Attack-Focused Lineup"
-    
-    return [formation, lineup, lineup_title]
-
-def create_pitch():
-    # Create the pitch
-    pitch = [[' ' for _ in range(WIDTH)] for _ in range(HEIGHT)]
-
-    # Draw borders and lines
-    for i in range(HEIGHT):
-        pitch[i][0] = '|'
-        pitch[i][WIDTH - 1] = '|'
-    for i in range(WIDTH):
-        pitch[0][i] = '-'
-        pitch[HEIGHT - 1][i] = '-'
-        
-    # Add corners
-    pitch[0][0] = "┌"
-    pitch[0][WIDTH - 1] = "┐"
-    pitch[HEIGHT - 1][0] = "└"
-    pitch[HEIGHT - 1][WIDTH - 1] = "┘"
-    
-    # Draw penalty area
-    penalty_WIDTH = WIDTH // 2
-    penalty_HEIGHT = HEIGHT // 3
-    penalty_start_x = (WIDTH - penalty_WIDTH) // 2
-    for y in range(penalty_HEIGHT):
-        pitch[HEIGHT - 1 - y][penalty_start_x-1] = '|'
-        pitch[HEIGHT - 1 - y][penalty_start_x + penalty_WIDTH] = '|'
-    for x in range(penalty_WIDTH):
-        pitch[HEIGHT - 1 - penalty_HEIGHT][x + penalty_start_x] = '-'
-
-    # Draw goal area
-    goal_WIDTH = WIDTH // 3
-    goal_HEIGHT = HEIGHT // 6
-    goal_start_x = (WIDTH - goal_WIDTH) // 2
-    for y in range(goal_HEIGHT):
-        pitch[HEIGHT - 1 - y][goal_start_x - 1] = '|'
-        pitch[HEIGHT - 1 - y][goal_start_x + goal_WIDTH] = '|'
-    for x in range(goal_WIDTH):
-        pitch[HEIGHT - 1 - goal_HEIGHT][x + goal_start_x] = '-'
-    
-    return pitch
-
-def show_best_lineup(team):
-    """Display the best possible lineup based on player ratings"""
-    clear_screen()
-
-    formation, lineup, lineup_title = pick_formation(team)
-    
-    pitch = create_pitch()
-    
-    # Add players to the pitch
-    for pos, coords in FORMATION_LAYOUTS[formation].items():
-        y, x = coords
-        if pos in lineup:
-            player, rating = lineup[pos]
-            # Draw player icon
-            safe_write(pitch, y, x, "□", HEIGHT, WIDTH)
-            
-            # Write position
-            pos_x = max(0, x - len(pos) // 2)
-            safe_write(pitch, y - 1, pos_x, pos, HEIGHT, WIDTH)
-            
-            # Write player name
-            name = player[:7] if player != "AI" else "AI"
-            name_x = max(0, x - len(name) // 2)
-            safe_write(pitch, y + 1, name_x, name, HEIGHT, WIDTH)
-            
-            # Write rating
-            if player != "AI":
-                rating_str = f"({rating:.1f})"
-                rating_x = max(0, x - len(rating_str) // 2)
-                safe_write(pitch, y + 2, rating_x, rating_str, HEIGHT, WIDTH)
-    
-    # Print formation at top
-    formation_text = f"=== {lineup_title} ({formation}) ==="
-    x_offset = (WIDTH - len(formation_text)) // 2
-    safe_write(pitch, 0, x_offset, formation_text, HEIGHT, WIDTH)
-    
-    # Print the pitch
+    mapping = FORMATION_POSITIONS[formation]
+    lineup_title = f"{lineup_types[lineup_choice - 1]} Lineup"
+    if lineup_choice > len(LINEUP_STRATEGIES):
+        # Anytime search: improve the greedy lineups until the budget runs out
+        result = run_solve("Searching", anytime_lineup, team, players, formation, mapping, time_budget=1.0,
+                           lock=team.lock)
+        if result is None:
+            return [formation, None, lineup_title, players]
+        gap = "optimal" if result.optimal else f"gap <= {result.gap:.1f}"
+        return [formation, result.lineup, f"{lineup_title} ({gap})", players]
+
+    # Generate the appropriate lineup based on type, served from the
+    # background precomputation when it covers this selection
+    strategy = LINEUP_STRATEGIES[lineup_choice - 1]
+    if precomputer:
+        lineup = run_solve("Solving lineup", precomputer.get_lineup, strategy, players, formation,
+                           mapping, cancellable=False, lock=team.lock)
+    else:
+        lineup = run_solve("Solving lineup", getattr(team, strategy), players, formation,
+                           mapping, cancellable=False, lock=team.lock)
+    
+    return [formation, lineup, lineup_title, players]
+
+@instrumented
+def display_lineup(layout, lineup, lineup_title, formation):
+    """Draw a lineup on the pitch followed by the detailed player list"""
     print("\nPitch Layout:")
-    for row in pitch:
-        print(''.join(row))
+    PitchRenderer(WIDTH, HEIGHT).draw(layout, lineup, f"=== {lineup_title} ({formation}) ===")
     
     # Print detailed player list
     print("\nDetailed Player List:")
@@ -911,9 +642,270 @@ def show_best_lineup(team):
         table.add_row(pos, player, rating_str)
     
     console.print(table)
+
+@instrumented
+def show_best_lineup(team, precomputer=None):
+    """Display the best possible lineup based on player ratings"""
+    clear_screen()
+
+    formation, lineup, lineup_title, players = pick_formation(team, precomputer)
+    if lineup is None:
+        input("\nPress Enter to continue...")
+        return
+    display_lineup(FORMATION_LAYOUTS[formation], lineup, lineup_title, formation)
     
+    if input("\nShow how close other players were to each slot? (y/N): ").strip().lower() == 'y':
+        show_lineup_margins(team, players, formation)
+    if input("\nTry substitutions on this lineup? (y/N): ").strip().lower() == 'y':
+        try_substitutions(team, formation, lineup, lineup_title)
+    input("\nPress Enter to continue...")
+
+def try_substitutions(team, formation, lineup, lineup_title):
+    """Swap players in and out of a lineup, redrawing only the pitch cells that change"""
+    layout = FORMATION_LAYOUTS[formation]
+    mapping = FORMATION_POSITIONS[formation]
+    title = f"=== {lineup_title} ({formation}) ==="
+    lineup = dict(lineup)
+
+    def slot_rating(player_name, slot):
+        if player_name == "AI":
+            return ("AI", 0.0)
+        return (player_name, team.lineup_rating(team.players[player_name], mapping[slot])[0])
+
+    renderer = PitchRenderer(WIDTH, HEIGHT, live=True)
+    renderer.draw(layout, lineup, title)
+    message = ""
+    while True:
+        # Clear everything below the pitch before prompting again
+        sys.stdout.write(f"\033[{HEIGHT + 1};1H\033[J")
+        sys.stdout.flush()
+        total = sum(rating for player, rating in lineup.values() if player != "AI")
+        print(f"{message}\nTotal rating: {total:.1f}")
+        slot = input("Slot to change (Enter to finish): ").strip().upper()
+        if not slot:
+            break
+        if slot not in lineup:
+            message = f"Unknown slot {slot}. Slots: {', '.join(lineup)}"
+            continue
+        name = input("Player to bring in (or AI): ").strip()
+        player = team.get_player(name)
+        if not player and name.upper() != "AI":
+            message = f"Player {name} not found."
+            continue
+        incoming = player.name if player else "AI"
+
+        updated = dict(lineup)
+        # A starter moved into another slot swaps places with whoever was there
+        for other, (starter, _) in lineup.items():
+            if starter == incoming and incoming != "AI":
+                updated[other] = slot_rating(lineup[slot][0], other)
+        updated[slot] = slot_rating(incoming, slot)
+        renderer.update(layout, updated, title)
+        message = f"{incoming} in at {slot} for {lineup[slot][0]}."
+        lineup = updated
+
+def show_lineup_margins(team, players, formation):
+    """Print the slot x player margin table of the best overall lineup"""
+    try:
+        sensitivity = lineup_sensitivity(team, players, formation, FORMATION_POSITIONS[formation])
+    except ValueError as e:
+        print(f"\nCan't analyse this lineup: {e}")
+        return
+    print("\nCushion: how far the starter's rating can drop before losing the slot.")
+    print("Challengers: rating rise each player needs to take the slot (best overall lineup).\n")
+    print(tabulate(sensitivity.margin_table(),
+                   headers=['Slot', 'Starter', 'Cushion', 'Closest', 'Second', 'Third'],
+                   tablefmt='grid'))
+
+def show_lineup_as_of(team):
+    """Display the lineup that the ratings of an earlier date would have picked"""
+    clear_screen()
+    date_text = input("Enter date (YYYY-MM-DD, or press Enter to go back): ").strip()
+    if not date_text:
+        return
+    try:
+        # Include every vote cast on that day
+        as_of = datetime.strptime(date_text, "%Y-%m-%d") + timedelta(days=1) - timedelta(milliseconds=1)
+        past_team = team_as_of(team, as_of)
+    except ValueError as e:
+        print(f"\n{e}")
+        input("\nPress Enter to continue...")
+        return
+
+    print(f"\nRatings as of {date_text}: {len(past_team.players)} rated players")
+    formation, lineup, lineup_title, _ = pick_formation(past_team)
+    if lineup is None:
+        input("\nPress Enter to continue...")
+        return
+    display_lineup(FORMATION_LAYOUTS[formation], lineup, f"{lineup_title} as of {date_text}", formation)
+    input("\nPress Enter to continue...")
+
+@instrumented
+def search_formation_shapes(team):
+    """Search non-standard formations that suit the selected players"""
+    clear_screen()
+    print("Enter player names for the search (press Enter when done, or type 'ALL' to select all players)")
+    players = pick_players(team)
+    if not players:
+        input("\nPress Enter to continue...")
+        return
+
+    result = run_solve("Searching formations", search_formations, team, players, top_n=5, time_budget=10.0,
+                       lock=team.lock)
+    if not result.top:
+        print("\nNo formations could be scored.")
+        input("\nPress Enter to continue...")
+        return
+
+    clear_screen()
+    print("\n=== Top Formation Shapes ===\n")
+    rows = [[i, formation.name, f"{score:.1f}"] for i, (formation, _, score) in enumerate(result.top, 1)]
+    print(tabulate(rows, headers=['Rank', 'Formation', 'Total Rating'], tablefmt='grid'))
+    note = "" if result.complete else " (search stopped early, results may be incomplete)"
+    print(f"\nScored {result.evaluated} shapes, pruned {result.pruned}{note}")
+
+    choice = input("\nEnter a rank to view its lineup (or press Enter to go back): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(result.top):
+        formation, lineup, _ = result.top[int(choice) - 1]
+        clear_screen()
+        display_lineup(formation.layout, lineup, "Formation Search", formation.name)
+        input("\nPress Enter to continue...")
+
+def show_timing_report():
+    """Show where time has gone in this session and toggle instrumentation"""
+    clear_screen()
+    print("\n=== Timing Report ===\n")
+    print(format_report())
+
+    state = "on" if is_enabled() else "off"
+    choice = input(f"\nInstrumentation is {state}. [t]oggle, [r]eset or Enter to go back: ").strip().lower()
+    if choice == 't':
+        disable() if is_enabled() else enable()
+    elif choice == 'r':
+        reset()
+
+@instrumented
+def show_player_values(team):
+    """Show how much each formation's best lineup loses without each player"""
+    clear_screen()
+    print("\n=== Player Values ===\n")
+    print("Enter player names to evaluate (press Enter when done, or type 'ALL' to select all players)")
+    players = pick_players(team)
+    if not players:
+        return
+
+    values = run_solve("Evaluating formations", leave_one_out_values, team, players, lock=team.lock)
+    if not values.formations:
+        input("\nPress Enter to continue...")
+        return
+    print("\nDrop in each formation's best lineup score without the player (0 = not starting):\n")
+    print(tabulate(values.table(), headers=['Player'] + values.formations + ['Mean'], tablefmt='grid'))
     input("\nPress Enter to continue...")
 
+def show_lineup_tradeoffs(team):
+    """List the Pareto-optimal lineups of a formation and draw the chosen one"""
+    clear_screen()
+    print("\n=== Lineup Trade-offs ===\n")
+    formation = choose_formation()
+    print("Enter player names for lineup (press Enter when done, or type 'ALL' to select all players)")
+    players = pick_players(team)
+    if not players:
+        return
+
+    front = run_solve("Solving trade-offs", pareto_lineups, team, players, formation,
+                      FORMATION_POSITIONS[formation], lock=team.lock)
+    if not front:
+        input("\nPress Enter to continue...")
+        return
+    print("\nNo lineup below beats another on every column (balance: weakest line / strongest line):\n")
+    rows = [[i] + [f"{lineup.objectives[name]:.2f}" for name in OBJECTIVES] + [lineup.source]
+            for i, lineup in enumerate(front, 1)]
+    print(tabulate(rows, headers=['#'] + [name.title() for name in OBJECTIVES] + ['Found by'], tablefmt='grid'))
+
+    choice = input("\nEnter a number to view that lineup (Enter to go back): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(front):
+        chosen = front[int(choice) - 1]
+        display_lineup(FORMATION_LAYOUTS[formation], chosen.lineup, f"Trade-off {choice} Lineup", formation)
+    input("\nPress Enter to continue...")
+
+def simulate_match(team, precomputer=None):
+    """Simulate one of our lineups against an opponent formation"""
+    clear_screen()
+    print("\n=== Simulate a Match ===\n")
+    formation, lineup, lineup_title, _ = pick_formation(team, precomputer)
+    if lineup is None:
+        input("\nPress Enter to continue...")
+        return
+    display_lineup(FORMATION_LAYOUTS[formation], lineup, lineup_title, formation)
+
+    formations = list(FORMATION_POSITIONS)
+    print("\nOpponent formations:")
+    for i, name in enumerate(formations, 1):
+        print(f"{i}. {name}")
+    try:
+        opponent_formation = formations[int(input("\nSelect opponent formation (enter number): ")) - 1]
+        opponent_rating = float(input("Opponent average rating (0-5): ") or 3)
+        matches = int(input(f"Number of matches (Enter for {DEFAULT_SIMULATIONS}): ") or DEFAULT_SIMULATIONS)
+    except (ValueError, IndexError):
+        print("Invalid input.")
+        input("\nPress Enter to continue...")
+        return
+
+    home = LineupStrength.from_lineup(lineup, formation, team=team)
+    away = LineupStrength.uniform(opponent_formation, min(max(opponent_rating, 0.0), 5.0), spread=0.5)
+    result = run_solve("Simulating", simulate_matches, home, away, max(matches, 1))
+    print(tabulate([[f"{result.win:.1%}", f"{result.draw:.1%}", f"{result.loss:.1%}",
+                     f"{result.home_goals:.2f}", f"{result.away_goals:.2f}"]],
+                   headers=['Win', 'Draw', 'Loss', 'Goals for', 'Goals against'], tablefmt='grid'))
+    print(f"\n{result.matches} simulated matches vs {opponent_formation} rated {opponent_rating:.1f}")
+    input("\nPress Enter to continue...")
+
+def rating_settings(team):
+    """Choose how votes are combined into a player's rating"""
+    clear_screen()
+    print("\n=== Rating Settings ===\n")
+    descriptions = {
+        "mean": "Plain average of all votes",
+        "median": "Middle vote, ignores outliers",
+        "trimmed": "Average without the highest and lowest 20% of votes",
+        "weighted": "Average weighted by how much each voter agrees with the others"
+    }
+    for i, aggregator in enumerate(AGGREGATORS, 1):
+        current = " (current)" if aggregator == team.aggregator else ""
+        print(f"{i}. {aggregator}: {descriptions[aggregator]}{current}")
+    normalization_option = len(AGGREGATORS) + 1
+    state = "on" if team.normalized else "off"
+    print(f"{normalization_option}. Toggle voter bias normalization for rankings and lineups (currently {state})")
+    storage_option = normalization_option + 1
+    print(f"{storage_option}. Toggle compact columnar storage of the players file (currently {team.storage})")
+    position_option = storage_option + 1
+    state = "on" if team.out_of_position else "off"
+    print(f"{position_option}. Toggle out-of-position players in lineups instead of AI (currently {state})")
+
+    choice = input("\nSelect option (or press Enter to go back): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(AGGREGATORS):
+        team.set_aggregator(AGGREGATORS[int(choice) - 1])
+        team.save_players()
+        print(f"Ratings recomputed using {team.aggregator}.")
+        input("\nPress Enter to continue...")
+    elif choice == str(normalization_option):
+        team.set_normalization(not team.normalized)
+        team.save_players()
+        state = "on" if team.normalized else "off"
+        print(f"Voter bias normalization is now {state}.")
+        input("\nPress Enter to continue...")
+    elif choice == str(storage_option):
+        team.set_storage("json" if team.storage == "columnar" else "columnar")
+        team.save_players()
+        print(f"Players are now saved in {team.storage} format.")
+        input("\nPress Enter to continue...")
+    elif choice == str(position_option):
+        team.set_out_of_position(not team.out_of_position)
+        team.save_players()
+        state = "on" if team.out_of_position else "off"
+        print(f"Out-of-position players are now {state}.")
+        input("\nPress Enter to continue...")
+
 # ---------------------------------------------------------------------------
 # Main Function
 # ---------------------------------------------------------------------------
@@ -921,32 +913,55 @@ def show_best_lineup(team):
 def main():
     """Main function that runs the application"""
     team = Team("Pro Clubs FC")
+    team.enable_history()
+    team.enable_change_log()
+    load_custom_formations()
+    load_custom_compatibility(team)
+    precomputer = LineupPrecomputer(team, LineupCache.for_data_file(team.filename))
 
     while True:
+        # Refresh the precomputed lineups if the last action changed any rating
+        precomputer.schedule()
+        # Let tailers of the change stream see the last action's changes
+        team.change_log.flush()
         clear_screen()
         choice = display_menu()
         
         if choice == 1:
             add_new_player(team)
-            team.save_players()
         elif choice == 2:
             view_player_ratings(team)
         elif choice == 3:
             rate_player(team)
-            team.save_players()
         elif choice == 4:
             modify_player_rating(team)
         elif choice == 5:
             compare_players(team)
         elif choice == 6:
-            show_best_lineup(team)
+            show_best_lineup(team, precomputer)
             # Add explicit clear_screen call after returning from show_best_lineup
             clear_screen()
         elif choice == 7:
-            show_position_rankings(team)
+            show_lineup_as_of(team)
         elif choice == 8:
-            show_position_gaps(team)
+            search_formation_shapes(team)
         elif choice == 9:
+            show_position_rankings(team)
+        elif choice == 10:
+            show_position_gaps(team)
+        elif choice == 11:
+            import_votes_from_file(team)
+        elif choice == 12:
+            show_timing_report()
+        elif choice == 13:
+            rating_settings(team)
+        elif choice == 14:
+            show_player_values(team)
+        elif choice == 15:
+            simulate_match(team, precomputer)
+        elif choice == 16:
+            show_lineup_tradeoffs(team)
+        elif choice == 17:
             team.save_players()
             print("Goodbye!")
             break